@@ -1,16 +1,127 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-import folium
 import webbrowser
 import os
 import tempfile
 import threading
+import queue
 from database import init_database
 from store_manager import StoreManager
+from database import get_store_page, get_store_summary
 # locations モジュールは不要になったため削除
 from map_selector import select_coordinates_from_map
 
+class BackgroundJob:
+    """バックグラウンドで実行する処理"""
+    
+    def __init__(self, func, args, label, on_done, on_error, cancellable):
+        self.func = func
+        self.args = args
+        self.label = label
+        self.on_done = on_done
+        self.on_error = on_error
+        self.cancellable = cancellable
+        self.cancelled = threading.Event()
+
+class BackgroundWorker:
+    """
+    データベース処理や地図の生成を1つのバックグラウンドスレッドで順番に実行し、
+    結果を root.after で Tk のメインスレッドに返す（画面が固まらないようにする）
+    """
+    
+    # 結果を確認する間隔（ミリ秒、約60fps）
+    POLL_INTERVAL_MS = 16
+    
+    def __init__(self, root, on_state_changed=None):
+        """
+        Args:
+            on_state_changed: 状態が変わったときに呼ばれる関数 on_state_changed(実行待ちの件数, 実行中の処理名)
+        """
+        self.root = root
+        self.on_state_changed = on_state_changed
+        self.jobs = queue.Queue()
+        self.results = queue.Queue()
+        # メインスレッドのみで扱う（実行待ち・実行中の処理）
+        self.pending_jobs = []
+        self.current_label = None
+        
+        threading.Thread(target=self._run, name="admin-worker", daemon=True).start()
+        self.root.after(self.POLL_INTERVAL_MS, self._poll)
+    
+    def submit(self, func, *args, label="処理中", on_done=None, on_error=None, cancellable=True):
+        """
+        処理を実行待ちに追加（メインスレッドから呼ぶ）
+        on_done(結果) / on_error(例外) はメインスレッドで呼ばれる
+        データベースへの書き込みは cancellable=False とし、キャンセルせず必ず結果を反映する
+        """
+        job = BackgroundJob(func, args, label, on_done, on_error, cancellable)
+        self.pending_jobs.append(job)
+        self.jobs.put(job)
+        self._notify()
+        return job
+    
+    def cancel_all(self):
+        """
+        実行待ちの読み込み・地図の作成を取り消し、実行中であれば結果を破棄する
+        書き込み（cancellable=False）は取り消さない
+        """
+        for job in self.pending_jobs:
+            if job.cancellable:
+                job.cancelled.set()
+    
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            if job.cancelled.is_set():
+                self.results.put(('done', job, None))
+                continue
+            self.results.put(('start', job, None))
+            try:
+                self.results.put(('done', job, job.func(*job.args)))
+            except Exception as e:
+                self.results.put(('error', job, e))
+    
+    def _poll(self):
+        """バックグラウンドスレッドからの結果をメインスレッドで処理"""
+        try:
+            while True:
+                event, job, value = self.results.get_nowait()
+                if event == 'start':
+                    self.current_label = job.label
+                    self._notify()
+                    continue
+                
+                self.pending_jobs.remove(job)
+                self.current_label = None
+                self._notify()
+                # キャンセルされた処理の結果は反映しない
+                if job.cancelled.is_set():
+                    continue
+                if event == 'done' and job.on_done:
+                    job.on_done(value)
+                elif event == 'error':
+                    if job.on_error:
+                        job.on_error(value)
+                    else:
+                        messagebox.showerror("エラー", f"{job.label}にエラーが発生しました: {value}")
+        except queue.Empty:
+            pass
+        finally:
+            # 結果の反映でエラーが発生しても確認を続ける
+            self.root.after(self.POLL_INTERVAL_MS, self._poll)
+    
+    def _notify(self):
+        if self.on_state_changed:
+            self.on_state_changed(len(self.pending_jobs), self.current_label)
+
 class AdminApp:
+    # 店舗一覧の1ページに表示する件数（表示する行だけを読み込む）
+    STORE_PAGE_SIZE = 100
+    # 並べ替えできる列（見出し -> get_store_page の sort）
+    STORE_SORT_COLUMNS = {"ID": 'id', "店舗名": 'name', "商品数": 'product_count'}
+    # 検索欄の入力が止まってから検索するまでの時間（ミリ秒）
+    SEARCH_DELAY_MS = 200
+    
     def __init__(self, root):
         self.root = root
         self.root.title("学園祭店舗管理システム - 運営者画面")
@@ -23,8 +134,22 @@ class AdminApp:
         # 選択された座標
         self.selected_lat = None
         self.selected_lng = None
+        self.progress_running = False
+        # 店舗一覧に表示中の行（iid: 店舗ID の文字列 -> (表示内容, タグ)）
+        self.store_rows = {}
+        # 店舗一覧の表示中のページ・並べ替え・絞り込み
+        self.page_offset = 0
+        self.sort_column = 'id'
+        self.sort_descending = False
+        self.filter_query = None
+        self.filter_bbox = None
+        self.search_after_id = None
+        self.page_job = None
         
         self.create_widgets()
+        
+        # データベース処理・地図の生成はバックグラウンドで実行
+        self.worker = BackgroundWorker(self.root, self._on_worker_state_changed)
         self.load_stores()
     
     def create_widgets(self):
@@ -69,6 +194,10 @@ class AdminApp:
         # プレビュー地図ボタン
         ttk.Button(button_coord_frame, text="👁️ 地図プレビュー", command=self.show_preview_map).pack(side=tk.LEFT)
         
+        # 店舗マーカーをまとめて表示（店舗数が多いときに地図を軽くする）
+        self.cluster_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(button_coord_frame, text="マーカーをまとめる", variable=self.cluster_var).pack(side=tk.LEFT, padx=(10, 0))
+        
         # 店舗情報入力セクション
         self.input_frame = ttk.LabelFrame(main_frame, text="店舗情報入力", padding="10")
         self.input_frame.grid(row=1, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 15))
@@ -136,29 +265,78 @@ class AdminApp:
         list_frame = ttk.LabelFrame(main_frame, text="📋 登録済み店舗一覧", padding="10")
         list_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S))
         
-        # Treeview for store list
+        # 絞り込み（検索・範囲）
+        filter_frame = ttk.Frame(list_frame)
+        filter_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        
+        # 店舗名・説明・商品名を入力中に検索（全文検索インデックスを使用）
+        ttk.Label(filter_frame, text="🔍 検索:").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', self.schedule_search)
+        search_entry = ttk.Entry(filter_frame, textvariable=self.search_var, width=20)
+        search_entry.pack(side=tk.LEFT, padx=(5, 10))
+        search_entry.bind('<Return>', self.apply_store_filter)
+        
+        ttk.Label(filter_frame, text="範囲（南,西,北,東）:").pack(side=tk.LEFT)
+        self.filter_bbox_var = tk.StringVar()
+        filter_bbox_entry = ttk.Entry(filter_frame, textvariable=self.filter_bbox_var, width=30)
+        filter_bbox_entry.pack(side=tk.LEFT, padx=(5, 10))
+        filter_bbox_entry.bind('<Return>', self.apply_store_filter)
+        
+        ttk.Button(filter_frame, text="絞り込み", command=self.apply_store_filter).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(filter_frame, text="解除", command=self.clear_store_filter).pack(side=tk.LEFT)
+        
+        # Treeview for store list（表示中のページの店舗のみ）
         columns = ("ID", "店舗名", "座標", "商品数")
         self.store_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=8)
         
         for col in columns:
-            self.store_tree.heading(col, text=col)
+            if col in self.STORE_SORT_COLUMNS:
+                # 見出しのクリックでデータベース側で並べ替え
+                self.store_tree.heading(col, text=col, command=lambda key=self.STORE_SORT_COLUMNS[col]: self.sort_stores_by(key))
+            else:
+                self.store_tree.heading(col, text=col)
             self.store_tree.column(col, width=100)
+        self.store_tree.heading("ID", text="ID▲")
+        # 検索語が店舗名に含まれる行・説明や商品名に含まれる行を色分け
+        self.store_tree.tag_configure('name_match', background='#fff3b0')
+        self.store_tree.tag_configure('content_match', background='#eef6ff')
         
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.store_tree.yview)
         self.store_tree.configure(yscrollcommand=scrollbar.set)
         
-        self.store_tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.store_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        
+        # ページ切り替え
+        page_frame = ttk.Frame(list_frame)
+        page_frame.grid(row=2, column=0, columnspan=2, pady=(5, 0))
+        self.prev_page_btn = ttk.Button(page_frame, text="◀ 前へ", command=self.show_previous_page, state=tk.DISABLED)
+        self.prev_page_btn.pack(side=tk.LEFT)
+        self.page_label = ttk.Label(page_frame, text="", font=("", 9))
+        self.page_label.pack(side=tk.LEFT, padx=10)
+        self.next_page_btn = ttk.Button(page_frame, text="次へ ▶", command=self.show_next_page, state=tk.DISABLED)
+        self.next_page_btn.pack(side=tk.LEFT)
         
         # 店舗操作ボタン
         store_button_frame = ttk.Frame(list_frame)
-        store_button_frame.grid(row=1, column=0, columnspan=2, pady=(10, 0))
+        store_button_frame.grid(row=3, column=0, columnspan=2, pady=(10, 0))
         
         ttk.Button(store_button_frame, text="📝 詳細編集", command=self.edit_store_details).grid(row=0, column=0, padx=(0, 10))
         ttk.Button(store_button_frame, text="📍 位置編集", command=self.edit_store_coordinates).grid(row=0, column=1, padx=(0, 10))
         ttk.Button(store_button_frame, text="🗑️ 削除", command=self.delete_selected_store).grid(row=0, column=2, padx=(0, 10))
         ttk.Button(store_button_frame, text="🌐 来場者用マップを開く", command=self.open_visitor_map).grid(row=0, column=3)
         
+        # 処理状況（バックグラウンド処理の進捗とキャンセル）
+        status_frame = ttk.Frame(main_frame)
+        status_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(10, 0))
+        self.progress_bar = ttk.Progressbar(status_frame, mode='indeterminate', length=150)
+        self.progress_bar.pack(side=tk.LEFT)
+        self.status_label = ttk.Label(status_frame, text="待機中", font=("", 9))
+        self.status_label.pack(side=tk.LEFT, padx=(10, 0))
+        self.cancel_job_btn = ttk.Button(status_frame, text="処理をキャンセル", command=self.cancel_background_jobs, state=tk.DISABLED)
+        self.cancel_job_btn.pack(side=tk.RIGHT)
+        
         # グリッド設定
         self.root.columnconfigure(0, weight=1)
         self.root.rowconfigure(0, weight=1)
@@ -166,7 +344,27 @@ class AdminApp:
         main_frame.rowconfigure(2, weight=1)
         self.input_frame.columnconfigure(1, weight=1)
         list_frame.columnconfigure(0, weight=1)
-        list_frame.rowconfigure(0, weight=1)
+        list_frame.rowconfigure(1, weight=1)
+    
+    def _on_worker_state_changed(self, pending_count, current_label):
+        """バックグラウンド処理の状態を画面に表示"""
+        if pending_count:
+            if not self.progress_running:
+                self.progress_bar.start(15)
+                self.progress_running = True
+            waiting = f"（ほか{pending_count - 1}件待機中）" if pending_count > 1 else ""
+            self.status_label.config(text=f"{current_label or '処理待ち'}...{waiting}")
+            self.cancel_job_btn.config(state=tk.NORMAL)
+        else:
+            self.progress_bar.stop()
+            self.progress_running = False
+            self.status_label.config(text="待機中")
+            self.cancel_job_btn.config(state=tk.DISABLED)
+    
+    def cancel_background_jobs(self):
+        """実行待ちの読み込み・地図の作成を取り消す（登録・更新・削除は取り消さない）"""
+        self.worker.cancel_all()
+        self.status_label.config(text="キャンセルしています...")
     
     def confirm_manual_coordinates(self):
         """手動入力座標を確定"""
@@ -215,17 +413,35 @@ class AdminApp:
         self.open_preview_map()
     
     def open_preview_map(self):
-        """プレビュー用の地図を開く"""
+        """プレビュー用の地図を開く（地図の作成はバックグラウンドで実行）"""
+        self.worker.submit(
+            self._build_preview_map, self.cluster_var.get(),
+            label="プレビュー地図を作成中",
+            on_done=lambda temp_file: webbrowser.open(f'file:///{temp_file}')
+        )
+    
+    def _build_preview_map(self, cluster):
+        """プレビュー用の地図を作成して一時ファイルのパスを返す（バックグラウンドスレッドで実行）"""
+        import folium  # 起動を速くするためプレビュー時に読み込む
+        from tile_cache import tile_layer_url, OSM_ATTRIBUTION
+        
         # 盛岡市大通を中心とした地図を作成
         center_lat, center_lng = 39.7033, 141.1436
         
+        # 地図タイルはキャッシュがあればキャッシュから読み込む
         m = folium.Map(
             location=[center_lat, center_lng],
             zoom_start=17,
-            tiles='OpenStreetMap'
+            tiles=tile_layer_url(),
+            attr=OSM_ATTRIBUTION
         )
         
-        # 既存の店舗をドラッグ可能マーカーで表示
+        # 既存の店舗をドラッグ可能マーカーで表示（クラスタ表示の場合はクラスタレイヤーに追加）
+        store_layer = m
+        if cluster:
+            from visitor_map import create_marker_cluster
+            store_layer = create_marker_cluster().add_to(m)
+        
         stores = self.store_manager.get_stores_for_display()
         for store in stores:
             # ドラッグ可能マーカーを作成
@@ -244,7 +460,7 @@ class AdminApp:
                 icon=folium.Icon(color='red', icon='info-sign'),
                 draggable=True
             )
-            marker.add_to(m)
+            marker.add_to(store_layer)
         
         # プリセット場所をマーカーで表示
         from locations import PRESET_LOCATIONS
@@ -424,7 +640,7 @@ class AdminApp:
             f.write(html_template)
             temp_file = f.name
         
-        webbrowser.open(f'file:///{temp_file}')
+        return temp_file
     
     
     def register_store(self):
@@ -446,17 +662,38 @@ class AdminApp:
         
         description = self.description_var.get().strip()
         
-        # 店舗を登録
-        store_id, message = self.store_manager.create_store_with_products(
-            store_name, self.selected_lat, self.selected_lng, products, description
-        )
+        latitude, longitude = self.selected_lat, self.selected_lng
         
-        if store_id:
-            messagebox.showinfo("成功", message)
-            self.clear_form()
-            self.load_stores()
-        else:
-            messagebox.showerror("エラー", message)
+        def create_store():
+            store_id, message = self.store_manager.create_store_with_products(
+                store_name, latitude, longitude, products, description
+            )
+            return store_id, message
+        
+        def on_registered(result):
+            store_id, message = result
+            if store_id:
+                self.register_btn.config(state=tk.NORMAL)
+                messagebox.showinfo("成功", message)
+                # 登録した店舗が表示中のページに入る場合は行を追加
+                self.load_stores()
+            else:
+                on_failed(message)
+        
+        def on_failed(error):
+            self.register_btn.config(state=tk.NORMAL)
+            # 登録中に次の店舗の入力が始まっていなければ、送信した内容を戻す
+            if not self.store_name_var.get().strip():
+                self.fill_form({'name': store_name, 'description': description,
+                                'latitude': latitude, 'longitude': longitude, 'products': products})
+            messagebox.showerror("エラー", str(error))
+        
+        # 登録中に入力された内容を消さないよう、送信した時点でフォームをクリアする
+        self.clear_form()
+        self.register_btn.config(state=tk.DISABLED)
+        
+        # 店舗を登録
+        self.worker.submit(create_store, label="店舗を登録中", on_done=on_registered, on_error=on_failed, cancellable=False)
     
     def add_product_row(self, name="", price=""):
         """商品行を追加"""
@@ -564,21 +801,168 @@ class AdminApp:
         self.coord_label.config(text="座標を入力してください")
     
     def load_stores(self):
-        """店舗一覧を読み込み"""
-        for item in self.store_tree.get_children():
-            self.store_tree.delete(item)
+        """表示中のページの店舗一覧を読み込み（データベースの読み込みはバックグラウンドで実行）"""
+        # まだ表示していない前回の読み込みは不要
+        if self.page_job:
+            self.page_job.cancelled.set()
+        self.page_job = self.worker.submit(
+            get_store_page, self.page_offset, self.STORE_PAGE_SIZE,
+            self.sort_column, self.sort_descending, self.filter_query, self.filter_bbox,
+            label="店舗一覧を読み込み中", on_done=self.show_store_page
+        )
+    
+    def show_store_page(self, page):
+        """読み込んだページを表示"""
+        total = page['total']
+        # 削除などで表示中のページがなくなった場合は最後のページを表示
+        if not page['stores'] and total and self.page_offset:
+            self.page_offset = (total - 1) // self.STORE_PAGE_SIZE * self.STORE_PAGE_SIZE
+            self.load_stores()
+            return
         
-        stores = self.store_manager.get_stores_for_display()
-        for store in stores:
-            coord_text = f"({store['latitude']:.6f}, {store['longitude']:.6f})"
-            product_count = len(store['products'])
-            
-            self.store_tree.insert('', 'end', values=(
-                store['id'],
-                store['name'],
-                coord_text,
-                f"{product_count}個"
-            ))
+        self.show_stores(page['stores'])
+        
+        if total:
+            end = self.page_offset + len(page['stores'])
+            # 検索の一致が多すぎる場合は上限で打ち切られている
+            shown_total = f"{total}件以上" if page['truncated'] else f"{total}件"
+            self.page_label.config(text=f"{self.page_offset + 1}〜{end}件 / 全{shown_total}")
+        else:
+            self.page_label.config(text="該当する店舗はありません")
+        self.prev_page_btn.config(state=tk.NORMAL if self.page_offset > 0 else tk.DISABLED)
+        self.next_page_btn.config(state=tk.NORMAL if self.page_offset + self.STORE_PAGE_SIZE < total else tk.DISABLED)
+    
+    def show_previous_page(self):
+        """前のページを表示"""
+        self.page_offset = max(self.page_offset - self.STORE_PAGE_SIZE, 0)
+        self.load_stores()
+    
+    def show_next_page(self):
+        """次のページを表示"""
+        self.page_offset += self.STORE_PAGE_SIZE
+        self.load_stores()
+    
+    def sort_stores_by(self, column):
+        """見出しをクリックした列で並べ替える（同じ列をもう一度クリックすると逆順）"""
+        if self.sort_column == column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        
+        for heading, key in self.STORE_SORT_COLUMNS.items():
+            arrow = ("▼" if self.sort_descending else "▲") if key == self.sort_column else ""
+            self.store_tree.heading(heading, text=heading + arrow)
+        
+        self.page_offset = 0
+        self.load_stores()
+    
+    def schedule_search(self, *args):
+        """検索欄の入力が SEARCH_DELAY_MS 止まったら検索する（1文字ごとに検索しない）"""
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+        self.search_after_id = self.root.after(self.SEARCH_DELAY_MS, self._apply_search)
+    
+    def _apply_search(self):
+        """検索欄の内容で検索（範囲の絞り込みはそのまま）"""
+        self.search_after_id = None
+        self.filter_query = self.search_var.get().strip() or None
+        self.page_offset = 0
+        self.load_stores()
+    
+    def apply_store_filter(self, event=None):
+        """検索語・範囲で絞り込む"""
+        if self.search_after_id:
+            self.root.after_cancel(self.search_after_id)
+            self.search_after_id = None
+        
+        bbox_text = self.filter_bbox_var.get().strip()
+        bbox = None
+        if bbox_text:
+            try:
+                south, west, north, east = (float(value) for value in bbox_text.split(","))
+            except ValueError:
+                messagebox.showerror("エラー", "範囲は「南,西,北,東」の形式で入力してください")
+                return
+            if south >= north or west >= east:
+                messagebox.showerror("エラー", "範囲は 南 < 北、西 < 東 となるように入力してください")
+                return
+            bbox = (south, west, north, east)
+        
+        self.filter_query = self.search_var.get().strip() or None
+        self.filter_bbox = bbox
+        self.page_offset = 0
+        self.load_stores()
+    
+    def clear_store_filter(self):
+        """絞り込みを解除"""
+        self.filter_bbox_var.set("")
+        self.search_var.set("")
+        self.apply_store_filter()
+    
+    def show_stores(self, stores):
+        """
+        店舗一覧を表示
+        表示中の行と店舗IDで突き合わせ、追加・変更・削除された店舗の行だけを更新する
+        """
+        order = [self._upsert_store_row(store) for store in stores]
+        
+        for iid in set(self.store_rows) - set(order):
+            self._remove_store_row(iid)
+        
+        # 並び順が変わった場合のみ並べ替える
+        if list(self.store_tree.get_children()) != order:
+            self.store_tree.set_children('', *order)
+    
+    def _store_row_values(self, store):
+        """店舗一覧の1行分の表示内容"""
+        coord_text = f"({store['latitude']:.6f}, {store['longitude']:.6f})"
+        return (store['id'], store['name'], coord_text, f"{store['product_count']}個")
+    
+    def _store_row_tags(self, store):
+        """検索中は検索語が店舗名に含まれるかで行を色分けする"""
+        if not self.filter_query:
+            return ()
+        name = store['name'].lower()
+        if any(term in name for term in self.filter_query.lower().split()):
+            return ('name_match',)
+        return ('content_match',)
+    
+    def _upsert_store_row(self, store):
+        """店舗の行を追加、または内容が変わっていれば更新して iid を返す"""
+        iid = str(store['id'])
+        row = (self._store_row_values(store), self._store_row_tags(store))
+        if iid not in self.store_rows:
+            self.store_tree.insert('', 'end', iid=iid, values=row[0], tags=row[1])
+        elif self.store_rows[iid] != row:
+            self.store_tree.item(iid, values=row[0], tags=row[1])
+        self.store_rows[iid] = row
+        return iid
+    
+    def _refresh_store_row(self, store):
+        """
+        編集した店舗を店舗一覧に反映
+        並べ替え・絞り込みの結果が変わる可能性がある場合は表示中のページを読み込み直し、
+        それ以外は表示中の行だけを更新する
+        """
+        iid = str(store['id'])
+        row = self.store_rows.get(iid)
+        values = self._store_row_values(store)
+        # 並べ替えに使う列（_store_row_values の何番目か）
+        sort_index = {'name': 1, 'product_count': 3}.get(self.sort_column)
+        sort_changed = sort_index is not None and (row is None or row[0][sort_index] != values[sort_index])
+        
+        # 検索・範囲の絞り込み中は編集で一致しなくなる（一致するようになる）ことがある
+        if self.filter_query or self.filter_bbox or sort_changed:
+            self.load_stores()
+        elif row is not None:
+            self._upsert_store_row(store)
+    
+    def _remove_store_row(self, store_id):
+        """店舗の行を削除"""
+        iid = str(store_id)
+        if self.store_rows.pop(iid, None) is not None:
+            self.store_tree.delete(iid)
     
     def delete_selected_store(self):
         """選択された店舗を削除"""
@@ -591,13 +975,21 @@ class AdminApp:
         store_id = item['values'][0]
         store_name = item['values'][1]
         
-        if messagebox.askyesno("確認", f"店舗 '{store_name}' を削除しますか？"):
-            success, message = self.store_manager.remove_store(store_id)
+        def on_removed(result):
+            success, message = result
             if success:
                 messagebox.showinfo("成功", message)
+                self._remove_store_row(store_id)
+                # 次のページの店舗を繰り上げて表示
                 self.load_stores()
             else:
                 messagebox.showerror("エラー", message)
+        
+        if messagebox.askyesno("確認", f"店舗 '{store_name}' を削除しますか？"):
+            self.worker.submit(
+                self.store_manager.remove_store, store_id,
+                label="店舗を削除中", on_done=on_removed, cancellable=False
+            )
     
     def edit_store_coordinates(self):
         """選択された店舗の座標を編集"""
@@ -675,19 +1067,29 @@ class AdminApp:
                 if not (-180 <= new_lng <= 180):
                     messagebox.showerror("エラー", "経度は-180から180の間で入力してください")
                     return
-                
-                # データベースを更新
+            except ValueError:
+                messagebox.showerror("エラー", "有効な数値を入力してください")
+                return
+            
+            def update_coordinates():
                 from database import update_store_coordinates
                 if update_store_coordinates(store_id, new_lat, new_lng):
+                    return get_store_summary(store_id)
+                return None
+            
+            def on_updated(store):
+                if store:
                     messagebox.showinfo("成功", f"店舗の座標を更新しました\\n新しい座標: ({new_lat:.6f}, {new_lng:.6f})")
-                    dialog.destroy()
-                    self.load_stores()  # 店舗一覧を更新
+                    if dialog.winfo_exists():
+                        dialog.destroy()
+                    self._refresh_store_row(store)  # 店舗一覧に反映
                     # 地図プレビューがある場合は自動更新
                     self.refresh_preview_if_open()
                 else:
                     messagebox.showerror("エラー", "座標の更新に失敗しました")
-            except ValueError:
-                messagebox.showerror("エラー", "有効な数値を入力してください")
+            
+            # データベースを更新
+            self.worker.submit(update_coordinates, label="座標を更新中", on_done=on_updated, cancellable=False)
         
         ttk.Button(button_frame, text="保存", command=save_coordinates).grid(row=0, column=0, padx=(0, 10))
         ttk.Button(button_frame, text="キャンセル", command=dialog.destroy).grid(row=0, column=1)
@@ -727,15 +1129,15 @@ class AdminApp:
         store_data = self.store_tree.item(item)['values']
         store_id = store_data[0]
 
+        def on_loaded(store):
+            if not store:
+                messagebox.showerror("エラー", "店舗データが見つかりません")
+                return
+            self.load_store_for_editing(store)
+
         # データベースから店舗の詳細情報を取得
         from database import get_store_by_id
-        store = get_store_by_id(store_id)
-
-        if not store:
-            messagebox.showerror("エラー", "店舗データが見つかりません")
-            return
-
-        self.load_store_for_editing(store)
+        self.worker.submit(get_store_by_id, store_id, label="店舗情報を読み込み中", on_done=on_loaded)
 
     def load_store_for_editing(self, store):
         """メイン画面で店舗を編集モードに切り替え"""
@@ -753,6 +1155,10 @@ class AdminApp:
         self.cancel_btn.grid()
 
         # フォームに既存データを読み込み
+        self.fill_form(store)
+
+    def fill_form(self, store):
+        """フォームに店舗の内容を入力"""
         self.store_name_var.set(store['name'])
         self.description_var.set(store['description'] or "")
         self.manual_lat_var.set(f"{store['latitude']:.6f}")
@@ -814,34 +1220,41 @@ class AdminApp:
 
         description = self.description_var.get().strip()
 
-        try:
-            # データベースを更新
-            from database import update_store, delete_products_by_store, add_product
-
-            # 店舗情報を更新
-            if update_store(self.editing_store_id, store_name, self.selected_lat, self.selected_lng, description):
-                # 既存商品を削除
-                delete_products_by_store(self.editing_store_id)
+        store_id = self.editing_store_id
+        latitude, longitude = self.selected_lat, self.selected_lng
 
-                # 新しい商品を追加
-                for product in products:
-                    add_product(self.editing_store_id, product['name'], product['price'])
+        def update():
+            # 店舗情報と商品を1トランザクションで更新
+            success, message = self.store_manager.update_store_with_products(
+                store_id, store_name, latitude, longitude, products, description
+            )
+            return (get_store_summary(store_id) if success else None), message
 
-                messagebox.showinfo("成功", f"店舗「{store_name}」の情報を更新しました")
+        def on_updated(result):
+            store, message = result
+            if store:
+                messagebox.showinfo("成功", message)
                 self.cancel_edit()  # 編集モードを終了
-                self.load_stores()  # 店舗一覧を更新
+                self._refresh_store_row(store)  # 店舗一覧に反映
             else:
-                messagebox.showerror("エラー", "店舗情報の更新に失敗しました")
+                messagebox.showerror("エラー", message)
 
-        except Exception as e:
-            messagebox.showerror("エラー", f"更新中にエラーが発生しました: {e}")
+        self.worker.submit(update, label="店舗を更新中", on_done=on_updated, cancellable=False)
 
     def open_visitor_map(self):
         """来場者用マップを開く"""
         from visitor_map import create_visitor_map
-        map_file = create_visitor_map()
-        if map_file:
-            webbrowser.open(f'file:///{os.path.abspath(map_file)}')
+        from tile_cache import has_tiles, DEFAULT_TILE_DIR
+
+        def create_map():
+            # 地図タイルのキャッシュがあれば使う
+            return create_visitor_map(tile_dir=DEFAULT_TILE_DIR if has_tiles() else None)
+
+        def on_created(map_file):
+            if map_file:
+                webbrowser.open(f'file:///{os.path.abspath(map_file)}')
+
+        self.worker.submit(create_map, label="来場者用マップを作成中", on_done=on_created)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,536 @@
+"""
+学園祭店舗管理システム ベンチマーク
+
+一時データベースにダミー店舗を作成し、処理時間を計測します。
+
+使用方法:
+  python benchmark.py stores    # 店舗一覧取得（N+1方式 と 一括取得方式）の比較
+  python benchmark.py register  # 店舗登録時の接続コスト（呼び出しごとの接続 と 永続接続）の比較
+  python benchmark.py edit      # 商品の価格変更（全件置き換え と 差分更新）の処理時間と商品IDの変化
+  python benchmark.py migrate   # 起動時のマイグレーション確認にかかる時間
+  python benchmark.py spatial   # 範囲検索（全件取得 と R-tree）の比較
+  python benchmark.py search    # 全文検索（FTS5 trigram）・運営者画面の検索の応答時間
+  python benchmark.py startup   # 起動時の import 時間（python -X importtime）
+  python benchmark.py build     # 来場者向けマップの生成時間と HTML サイズ
+  python benchmark.py cluster   # クラスタ表示の HTML サイズとズームごとの表示マーカー数
+  python benchmark.py popups    # 商品数ごとの HTML サイズ（ポップアップ埋め込み と 遅延読み込み）
+  python benchmark.py serve     # 配信サーバーへの同時アクセス時の応答時間
+  python benchmark.py changes   # 変更フィードの取得時間とデータ量（全店舗データとの比較）
+  python benchmark.py variants  # 複数バリエーションのマップ生成時間（プロセス数ごと）
+  python benchmark.py stream    # マップ生成時の最大メモリ使用量（通常出力 と ストリーミング出力）
+"""
+
+import sys
+import os
+import time
+import tempfile
+import contextlib
+import subprocess
+import math
+import database
+
+
+def _timeit(func, repeat=3):
+    """関数を複数回実行し、最短の実行時間（秒）と結果を返す"""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def _seed_stores(store_count, products_per_store=3):
+    """ダミー店舗と商品を現在のデータベースに一括投入（約 10m 間隔の格子状に配置）"""
+    with database.transaction(write=True) as cursor:
+        cursor.executemany(
+            'INSERT INTO stores (id, name, latitude, longitude, description) VALUES (?, ?, ?, ?, ?)',
+            (
+                (i, f"店舗{i}", 39.7000 + (i % 250) * 0.0001, 141.1400 + (i // 250) * 0.0001, f"説明{i}")
+                for i in range(1, store_count + 1)
+            )
+        )
+        cursor.executemany(
+            'INSERT INTO products (store_id, product_name, price, position) VALUES (?, ?, ?, ?)',
+            (
+                (i, f"商品{i}-{j}", 100 + j * 50, j)
+                for i in range(1, store_count + 1)
+                for j in range(products_per_store)
+            )
+        )
+
+
+class _TemporaryDatabase:
+    """ベンチマーク用の一時データベースに DATABASE_FILE を切り替える"""
+
+    def __init__(self, store_count, products_per_store=3):
+        self.store_count = store_count
+        self.products_per_store = products_per_store
+
+    def __enter__(self):
+        self.original_file = database.DATABASE_FILE
+        self.temp_dir = tempfile.TemporaryDirectory()
+        database.DATABASE_FILE = os.path.join(self.temp_dir.name, 'benchmark.db')
+        with contextlib.redirect_stdout(None):
+            database.init_database()
+        _seed_stores(self.store_count, self.products_per_store)
+        return self
+
+    def __exit__(self, *exc_info):
+        database.close_connection()
+        database.DATABASE_FILE = self.original_file
+        self.temp_dir.cleanup()
+
+
+def _get_all_stores_n_plus_one():
+    """旧実装: 店舗ごとに商品を個別に問い合わせる（比較用）"""
+    conn = database.get_connection()
+    cursor = conn.cursor()
+    cursor.execute('SELECT id, name, latitude, longitude, description FROM stores')
+
+    stores = []
+    for row in cursor.fetchall():
+        store = {
+            'id': row[0],
+            'name': row[1],
+            'latitude': row[2],
+            'longitude': row[3],
+            'description': row[4],
+            'products': []
+        }
+        cursor.execute('SELECT product_name, price FROM products WHERE store_id = ?', (store['id'],))
+        for product_row in cursor.fetchall():
+            store['products'].append({'name': product_row[0], 'price': product_row[1]})
+        stores.append(store)
+
+    return stores
+
+
+def bench_stores(sizes=(10, 1000, 50000)):
+    """get_all_stores の N+1 方式と一括取得方式を比較"""
+    print(f"{'stores':>8} {'N+1 (ms)':>12} {'JOIN (ms)':>12} {'speedup':>8}")
+    for size in sizes:
+        with _TemporaryDatabase(size):
+            # N+1 方式は店舗数の2乗で遅くなるため、大規模時は1回だけ計測
+            repeat = 3 if size <= 1000 else 1
+            legacy_time, legacy_result = _timeit(_get_all_stores_n_plus_one, repeat)
+            joined_time, joined_result = _timeit(database.get_all_stores)
+
+            if legacy_result != joined_result:
+                raise AssertionError(f"Result mismatch at {size} stores")
+
+            print(f"{size:>8} {legacy_time * 1000:>12.1f} {joined_time * 1000:>12.1f} "
+                  f"{legacy_time / joined_time:>7.1f}x")
+
+
+def _register_store_with_products(product_count, reconnect):
+    """店舗1件と商品を1件ずつ登録（reconnect=True で呼び出しごとに接続を開き直す）"""
+    store_id = database.add_store("ベンチマーク店舗", 39.7033, 141.1436, "説明")
+    if reconnect:
+        database.close_connection()
+    for i in range(product_count):
+        database.add_product(store_id, f"商品{i}", 100 + i)
+        if reconnect:
+            database.close_connection()
+
+
+def bench_register(product_count=20, store_count=50):
+    """店舗登録時の接続コスト（呼び出しごとの接続 と 永続接続）を比較"""
+    print(f"{'mode':>12} {'per store (ms)':>16}")
+    for label, reconnect in (("reconnect", True), ("persistent", False)):
+        with _TemporaryDatabase(0):
+            elapsed, _ = _timeit(
+                lambda: [_register_store_with_products(product_count, reconnect) for _ in range(store_count)],
+                repeat=1
+            )
+            print(f"{label:>12} {elapsed * 1000 / store_count:>16.2f}")
+
+
+def _replace_products_per_call(store_id, products):
+    """旧実装: 商品をすべて削除して1件ずつ登録し直す（呼び出しごとにコミット、比較用）"""
+    database.delete_products_by_store(store_id)
+    for product in products:
+        database.add_product(store_id, product['name'], product['price'])
+
+
+def _replace_products_in_transaction(store_id, products):
+    """旧実装: 1トランザクションで商品をすべて削除して登録し直す（比較用）"""
+    with database.transaction(write=True) as cursor:
+        cursor.execute('DELETE FROM products WHERE store_id = ?', (store_id,))
+        database._insert_products(cursor, store_id, products)
+
+
+def bench_edit(products_per_store=30, edits=50):
+    """商品の価格を1件だけ変更する編集の処理時間と商品IDの変化を比較（全件置き換え と 差分更新）"""
+    modes = (
+        ("per call", _replace_products_per_call),
+        ("replace", _replace_products_in_transaction),
+        ("diff", database.sync_store_products),
+    )
+    print(f"{products_per_store} products per store, {edits} edits")
+    print(f"{'mode':>10} {'per edit (ms)':>14} {'ids kept':>9} {'sequence +':>11} {'revision +':>11}")
+    for label, apply_products in modes:
+        with _TemporaryDatabase(1, products_per_store):
+            conn = database.get_connection()
+
+            def product_ids():
+                return {row[0] for row in conn.execute('SELECT id FROM products WHERE store_id = 1')}
+
+            def sequence():
+                return conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'products'").fetchone()[0]
+
+            products = database.get_store_by_id(1)['products']
+            ids_before, sequence_before = product_ids(), sequence()
+            revision_before = database.get_current_revision()
+
+            start = time.perf_counter()
+            for i in range(edits):
+                products[0] = dict(products[0], price=products[0]['price'] + 1)
+                apply_products(1, products)
+            elapsed = time.perf_counter() - start
+
+            if database.get_store_by_id(1)['products'] != products:
+                raise AssertionError(f"Result mismatch in {label}")
+
+            print(f"{label:>10} {elapsed * 1000 / edits:>14.2f} {len(ids_before & product_ids()):>9} "
+                  f"{sequence() - sequence_before:>11} {database.get_current_revision() - revision_before:>11}")
+
+
+def bench_migrate(store_count=1000, budget_ms=50):
+    """マイグレーション適用済みデータベースでの起動時チェック時間を計測"""
+    with _TemporaryDatabase(store_count):
+        def startup():
+            database.close_connection()
+            with contextlib.redirect_stdout(None):
+                return database.migrate_database()
+
+        elapsed, applied = _timeit(startup, repeat=10)
+        status = "OK" if elapsed * 1000 < budget_ms and applied == 0 else "OVER BUDGET"
+        print(f"schema version {database.get_schema_version()}: "
+              f"{elapsed * 1000:.2f} ms (budget {budget_ms} ms) {status}")
+
+
+def bench_spatial(sizes=(1000, 50000)):
+    """範囲検索（全件取得して Python で絞り込み と R-tree）を比較"""
+    # ダミー店舗の格子の南西付近、約 100m 四方
+    south, west, north, east = 39.7030, 141.1400, 39.7039, 141.1412
+    print(f"{'stores':>8} {'hits':>6} {'scan (ms)':>10} {'bbox (ms)':>10} {'near (ms)':>10}")
+    for size in sizes:
+        with _TemporaryDatabase(size):
+            def scan():
+                return [
+                    store for store in database.get_all_stores()
+                    if south <= store['latitude'] <= north and west <= store['longitude'] <= east
+                ]
+
+            scan_time, scanned = _timeit(scan)
+            bbox_time, found = _timeit(lambda: database.get_stores_in_bbox(south, west, north, east))
+            near_time, _ = _timeit(lambda: database.get_stores_near(39.7035, 141.1402, 50, limit=10))
+
+            if [store['id'] for store in scanned] != [store['id'] for store in found]:
+                raise AssertionError(f"Result mismatch at {size} stores")
+
+            print(f"{size:>8} {len(found):>6} {scan_time * 1000:>10.1f} "
+                  f"{bbox_time * 1000:>10.2f} {near_time * 1000:>10.2f}")
+
+
+def bench_search(store_count=33334, products_per_store=3, budget_ms=20):
+    """全文検索（FTS5 trigram）と運営者画面の検索（1ページ分＋件数）の応答時間を約10万商品で計測"""
+    queries = ("店舗1234", "商品2000-1", "説明", "12", "店舗 12", "存在しない商品")
+    with _TemporaryDatabase(store_count, products_per_store):
+        print(f"{store_count} stores / {store_count * products_per_store} products")
+        print(f"{'query':>16} {'hits':>6} {'search (ms)':>12} {'admin list (ms)':>16} {'status':>8}")
+        for query in queries:
+            elapsed, found = _timeit(lambda: database.search_stores(query, limit=20), repeat=5)
+            page_elapsed, page = _timeit(lambda: database.get_store_page(limit=100, query=query), repeat=5)
+            status = "ok" if page_elapsed * 1000 < budget_ms else "SLOW"
+            hits = f"{page['total']}+" if page['truncated'] else page['total']
+            print(f"{query:>16} {hits:>6} {elapsed * 1000:>12.2f} {page_elapsed * 1000:>16.2f} {status:>8}")
+
+
+# 起動時に読み込まれてはいけない重いモジュール
+HEAVY_MODULES = ('folium', 'branca', 'jinja2', 'numpy', 'requests')
+
+
+def _import_profile(args):
+    """python -X importtime で実行し、(実行時間, {トップレベルモジュール: 累積読み込み時間µs}) を返す"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', *args],
+        capture_output=True, text=True, encoding='utf-8',
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    elapsed = time.perf_counter() - start
+
+    modules = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # インデントなし（先頭の空白1つ）がトップレベルの import
+        modules[name[1:]] = int(cumulative)
+    return elapsed, modules
+
+
+def bench_startup(budget_ms=100):
+    """コマンドごとの起動時 import 時間を計測し、重いモジュールが読み込まれないことを確認"""
+    baseline_time, baseline_modules = min(
+        (_import_profile(['-c', 'pass']) for _ in range(5)), key=lambda result: result[0]
+    )
+    print(f"interpreter baseline: {baseline_time * 1000:.1f} ms")
+    print(f"{'command':>28} {'wall (ms)':>10} {'imports (ms)':>13} {'status':>8}")
+
+    commands = (
+        ['main.py', 'help'],
+        ['-c', 'import visitor_map'],
+        ['-c', 'import store_importer'],
+        ['-c', 'import admin_app'],
+    )
+    failed = False
+    for command in commands:
+        elapsed, modules = min((_import_profile(command) for _ in range(5)), key=lambda result: result[0])
+        import_us = sum(
+            cumulative for name, cumulative in modules.items()
+            if name.strip() == name and name not in baseline_modules
+        )
+        heavy = [name for name in modules if name.strip().split('.')[0] in HEAVY_MODULES]
+        status = "OK"
+        if heavy:
+            status = "HEAVY"
+        elif command[0] == 'main.py' and import_us / 1000 > budget_ms:
+            status = "SLOW"
+        failed = failed or status != "OK"
+        print(f"{' '.join(command):>28} {elapsed * 1000:>10.1f} {import_us / 1000:>13.1f} {status:>8}")
+        if heavy:
+            print(f"    heavy modules imported: {', '.join(sorted(set(name.strip().split('.')[0] for name in heavy)))}")
+
+    if failed:
+        raise SystemExit(1)
+
+
+def bench_build(sizes=(100, 1000), modes=("markers", "data")):
+    """来場者向けマップの生成時間と HTML サイズを出力方式ごとに計測"""
+    from visitor_map import create_visitor_map
+
+    print(f"{'stores':>8} {'mode':>8} {'time (ms)':>10} {'size (KB)':>10}")
+    for size in sizes:
+        with _TemporaryDatabase(size) as temp_db:
+            for mode in modes:
+                output_file = os.path.join(temp_db.temp_dir.name, f'map_{mode}.html')
+                with contextlib.redirect_stdout(None):
+                    elapsed, _ = _timeit(lambda: create_visitor_map(output_file, mode=mode, force=True), repeat=1)
+                print(f"{size:>8} {mode:>8} {elapsed * 1000:>10.0f} {os.path.getsize(output_file) / 1024:>10.0f}")
+
+
+def _cluster_count(points, zoom, radius_px=80):
+    """
+    Leaflet.markercluster と同様に、半径 radius_px 以内の点を貪欲にまとめたときの
+    表示マーカー数（クラスタ + 単独マーカー）を計算
+    """
+    scale = 256 * 2 ** zoom
+    grid = {}
+    count = 0
+    for lat, lng in points:
+        # Web メルカトル図法のピクセル座標
+        x = (lng + 180) / 360 * scale
+        sin_lat = math.sin(math.radians(lat))
+        y = (0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * scale
+        cell = (int(x // radius_px), int(y // radius_px))
+
+        joined = any(
+            (cx - x) ** 2 + (cy - y) ** 2 <= radius_px ** 2
+            for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+            for cx, cy in grid.get((cell[0] + dx, cell[1] + dy), ())
+        )
+        if not joined:
+            grid.setdefault(cell, []).append((x, y))
+            count += 1
+    return count
+
+
+def bench_cluster(store_count=1000, zooms=range(15, 20)):
+    """クラスタ表示の HTML サイズとズームレベルごとの表示マーカー数を計測"""
+    from visitor_map import create_visitor_map
+
+    with _TemporaryDatabase(store_count) as temp_db:
+        print(f"{store_count} stores")
+        print(f"{'mode':>8} {'cluster':>8} {'size (KB)':>10}")
+        for mode in ("markers", "data"):
+            for cluster in (False, True):
+                output_file = os.path.join(temp_db.temp_dir.name, 'map.html')
+                with contextlib.redirect_stdout(None):
+                    create_visitor_map(output_file, mode=mode, cluster=cluster, force=True)
+                print(f"{mode:>8} {str(cluster):>8} {os.path.getsize(output_file) / 1024:>10.0f}")
+
+        points = [(store['latitude'], store['longitude']) for store in database.get_all_stores()]
+        print(f"{'zoom':>8} {'markers':>8} {'clustered':>10}")
+        for zoom in zooms:
+            print(f"{zoom:>8} {len(points):>8} {_cluster_count(points, zoom):>10}")
+
+
+def bench_popups(store_count=1000, product_counts=(3, 10, 30)):
+    """商品数を変えたときの HTML サイズ（商品を埋め込む場合 と 遅延読み込みの場合）を計測"""
+    from visitor_map import create_visitor_map, products_file_path
+
+    print(f"{store_count} stores")
+    print(f"{'products':>8} {'lazy':>6} {'html (KB)':>10} {'json (KB)':>10}")
+    for products_per_store in product_counts:
+        with _TemporaryDatabase(store_count, products_per_store) as temp_db:
+            for lazy_popups in (False, True):
+                output_file = os.path.join(temp_db.temp_dir.name, 'map.html')
+                with contextlib.redirect_stdout(None):
+                    create_visitor_map(output_file, mode="data", lazy_popups=lazy_popups, force=True)
+                json_size = os.path.getsize(products_file_path(output_file)) if lazy_popups else 0
+                print(f"{products_per_store:>8} {str(lazy_popups):>6} "
+                      f"{os.path.getsize(output_file) / 1024:>10.0f} {json_size / 1024:>10.0f}")
+
+
+def _request(url, etag=None):
+    """GET リクエストを送り (ステータス, 受信バイト数, ETag, 応答時間) を返す"""
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+
+    headers = {'Accept-Encoding': 'gzip'}
+    if etag:
+        headers['If-None-Match'] = etag
+    start = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers), timeout=30) as response:
+            return response.status, len(response.read()), response.headers['ETag'], time.perf_counter() - start
+    except HTTPError as e:
+        return e.code, 0, e.headers['ETag'], time.perf_counter() - start
+
+
+def bench_serve(store_count=1000, clients=300, requests_per_client=5):
+    """配信サーバーに多数のクライアントから同時にアクセスしたときの応答時間を計測"""
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from map_server import MapServer
+
+    with _TemporaryDatabase(store_count) as temp_db:
+        site_dir = os.path.join(temp_db.temp_dir.name, 'public')
+        server = MapServer(('127.0.0.1', 0), site_dir, {'mode': 'data'})
+        with contextlib.redirect_stdout(None):
+            server.start_watching()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        try:
+            etag = _request(url)[2]
+            print(f"{store_count} stores, {clients} concurrent clients x {requests_per_client} requests")
+            print(f"{'request':>12} {'total (s)':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'KB/req':>7} {'errors':>7}")
+            for label, request_etag in (("full", None), ("conditional", etag)):
+                def client(_):
+                    return [_request(url, request_etag) for _ in range(requests_per_client)]
+
+                start = time.perf_counter()
+                with ThreadPoolExecutor(clients) as executor:
+                    results = [result for batch in executor.map(client, range(clients)) for result in batch]
+                total = time.perf_counter() - start
+
+                times = sorted(result[3] for result in results)
+                errors = sum(1 for result in results if result[0] not in (200, 304))
+                size = sum(result[1] for result in results) / len(results) / 1024
+                print(f"{label:>12} {total:>10.2f} {times[len(times) // 2] * 1000:>9.1f} "
+                      f"{times[int(len(times) * 0.99)] * 1000:>9.1f} {size:>7.1f} {errors:>7}")
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+def bench_changes(store_count=50000, changed_counts=(1, 10, 100)):
+    """数店舗を変更したときの変更フィードの取得時間とデータ量を計測"""
+    import json
+    from visitor_map import store_records
+
+    with _TemporaryDatabase(store_count):
+        full_size = len(json.dumps(store_records(database.get_all_stores()), ensure_ascii=False).encode('utf-8'))
+        print(f"{store_count} stores, full store data {full_size / 1024:.0f} KB")
+        print(f"{'changed':>8} {'time (ms)':>10} {'size (KB)':>10}")
+        for changed_count in changed_counts:
+            revision = database.get_current_revision()
+            with contextlib.redirect_stdout(None):
+                for store_id in range(1, changed_count + 1):
+                    database.update_store_coordinates(store_id, 39.7035, 141.1440)
+            elapsed, changes = _timeit(lambda: database.get_changes_since(revision))
+            size = len(json.dumps(store_records(changes['stores']), ensure_ascii=False).encode('utf-8'))
+            print(f"{changed_count:>8} {elapsed * 1000:>10.2f} {size / 1024:>10.1f}")
+
+
+def bench_variants(store_count=500, variant_count=8, worker_counts=(1, 2, 4, 8)):
+    """複数バリエーションのマップをプロセス数を変えて生成し、所要時間を比較"""
+    from visitor_map import create_map_variants
+
+    with _TemporaryDatabase(store_count) as temp_db:
+        stores = database.get_all_stores()
+        print(f"{store_count} stores, {variant_count} variants, {os.cpu_count()} CPU cores")
+        print(f"{'workers':>8} {'time (s)':>9} {'speedup':>8}")
+        baseline = None
+        for workers in worker_counts:
+            variants = [
+                {'output': os.path.join(temp_db.temp_dir.name, f'variant_{index}.html'),
+                 'zoom_start': 15 + index % 5, 'force': True}
+                for index in range(variant_count)
+            ]
+            with contextlib.redirect_stdout(None):
+                elapsed, _ = _timeit(lambda: create_map_variants(variants, stores=stores, max_workers=workers), repeat=1)
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>9.2f} {baseline / elapsed:>7.2f}x")
+
+
+def bench_stream(sizes=(10000, 100000)):
+    """来場者向けマップ（data モード）の生成時の最大メモリ使用量を tracemalloc で計測"""
+    import tracemalloc
+    from visitor_map import create_visitor_map
+
+    print(f"{'stores':>8} {'stream':>7} {'time (s)':>9} {'peak (MB)':>10} {'size (MB)':>10}")
+    for size in sizes:
+        with _TemporaryDatabase(size) as temp_db:
+            output_file = os.path.join(temp_db.temp_dir.name, 'map.html')
+            for stream in (False, True):
+                tracemalloc.start()
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(None):
+                    create_visitor_map(output_file, mode="data", stream=stream, force=True)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(f"{size:>8} {str(stream):>7} {elapsed:>9.2f} {peak / 1024 / 1024:>10.1f} "
+                      f"{os.path.getsize(output_file) / 1024 / 1024:>10.1f}")
+
+
+BENCHMARKS = {
+    'stores': bench_stores,
+    'register': bench_register,
+    'edit': bench_edit,
+    'migrate': bench_migrate,
+    'spatial': bench_spatial,
+    'search': bench_search,
+    'startup': bench_startup,
+    'build': bench_build,
+    'cluster': bench_cluster,
+    'popups': bench_popups,
+    'serve': bench_serve,
+    'changes': bench_changes,
+    'variants': bench_variants,
+    'stream': bench_stream,
+}
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name}")
+            print(__doc__)
+            return 1
+        print(f"=== {name} ===")
+        BENCHMARKS[name]()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,22 @@
 import sqlite3
 import os
+import math
+import threading
+from contextlib import contextmanager
 
 DATABASE_FILE = 'festival_stores.db'
 
-def init_database():
-    """データベースを初期化し、テーブルを作成"""
-    conn = sqlite3.connect(DATABASE_FILE)
-    cursor = conn.cursor()
-    
+# 接続ごとに適用する PRAGMA（新しい接続から反映される）
+CONNECTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+# スレッドごとに保持する永続接続
+_local = threading.local()
+
+def _migration_create_tables(cursor):
+    """店舗・商品テーブルとインデックスを作成し、孤立商品を削除"""
     # stores テーブル作成
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS stores (
@@ -30,193 +39,873 @@ def init_database():
         )
     ''')
     
-    conn.commit()
-    conn.close()
+    # 店舗ごとの商品検索・削除用インデックス
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_products_store_id
+        ON products (store_id)
+    ''')
+    
+    # 外部キー無効時代に残った孤立商品を削除
+    cursor.execute('''
+        DELETE FROM products
+        WHERE store_id NOT IN (SELECT id FROM stores)
+    ''')
+    if cursor.rowcount > 0:
+        print(f"Removed {cursor.rowcount} orphaned products")
+
+def _migration_spatial_index(cursor):
+    """店舗座標の R-tree 空間インデックスを作成"""
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS stores_rtree USING rtree (
+            id,
+            min_lat, max_lat,
+            min_lng, max_lng
+        )
+    ''')
+    
+    # stores の変更に合わせて R-tree を更新するトリガー
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stores_rtree_insert AFTER INSERT ON stores
+        BEGIN
+            INSERT OR REPLACE INTO stores_rtree (id, min_lat, max_lat, min_lng, max_lng)
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stores_rtree_update AFTER UPDATE OF latitude, longitude ON stores
+        BEGIN
+            UPDATE stores_rtree
+            SET min_lat = new.latitude, max_lat = new.latitude,
+                min_lng = new.longitude, max_lng = new.longitude
+            WHERE id = new.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS stores_rtree_delete AFTER DELETE ON stores
+        BEGIN
+            DELETE FROM stores_rtree WHERE id = old.id;
+        END
+    ''')
+    
+    # 既存の店舗を登録
+    cursor.execute('''
+        INSERT OR REPLACE INTO stores_rtree (id, min_lat, max_lat, min_lng, max_lng)
+        SELECT id, latitude, latitude, longitude, longitude FROM stores
+    ''')
+
+def _migration_search_index(cursor):
+    """店舗名・説明・商品名の FTS5 全文検索インデックスを作成"""
+    # trigram トークナイザは分かち書き不要のため日本語でも部分一致で検索できる
+    # rowid は stores.id と一致させる
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS store_search USING fts5 (
+            name, description, products,
+            tokenize = 'trigram'
+        )
+    ''')
+    
+    # stores / products の変更に合わせて検索インデックスを更新するトリガー
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS store_search_store_insert AFTER INSERT ON stores
+        BEGIN
+            INSERT INTO store_search (rowid, name, description, products)
+            VALUES (
+                new.id, new.name, new.description,
+                (SELECT group_concat(product_name, ' ') FROM products WHERE store_id = new.id)
+            );
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS store_search_store_update AFTER UPDATE OF name, description ON stores
+        BEGIN
+            UPDATE store_search SET name = new.name, description = new.description
+            WHERE rowid = new.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS store_search_store_delete AFTER DELETE ON stores
+        BEGIN
+            DELETE FROM store_search WHERE rowid = old.id;
+        END
+    ''')
+    for event, store_id in (('INSERT', 'new.store_id'), ('UPDATE', 'new.store_id'), ('DELETE', 'old.store_id')):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS store_search_product_{event.lower()} AFTER {event} ON products
+            BEGIN
+                UPDATE store_search
+                SET products = (SELECT group_concat(product_name, ' ') FROM products WHERE store_id = {store_id})
+                WHERE rowid = {store_id};
+            END
+        ''')
+    
+    # 既存の店舗を登録
+    cursor.execute('DELETE FROM store_search')
+    cursor.execute('''
+        INSERT INTO store_search (rowid, name, description, products)
+        SELECT s.id, s.name, s.description,
+               (SELECT group_concat(product_name, ' ') FROM products WHERE store_id = s.id)
+        FROM stores s
+    ''')
+
+def _migration_change_log(cursor):
+    """店舗ごとの最終変更リビジョンを記録する変更履歴テーブルを作成"""
+    # 店舗1件につき1行（削除された店舗も残す）、revision は変更のたびに全体の最大値 + 1
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS store_changes (
+            store_id INTEGER PRIMARY KEY,
+            revision INTEGER NOT NULL
+        )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_store_changes_revision ON store_changes (revision)')
+    
+    triggers = (
+        ('store_insert', 'INSERT ON stores', 'new.id'),
+        ('store_update', 'UPDATE ON stores', 'new.id'),
+        ('store_delete', 'DELETE ON stores', 'old.id'),
+        ('product_insert', 'INSERT ON products', 'new.store_id'),
+        ('product_update', 'UPDATE ON products', 'new.store_id'),
+        ('product_delete', 'DELETE ON products', 'old.store_id'),
+    )
+    for name, event, store_id in triggers:
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS store_changes_{name} AFTER {event}
+            BEGIN
+                INSERT INTO store_changes (store_id, revision)
+                VALUES ({store_id}, (SELECT IFNULL(MAX(revision), 0) + 1 FROM store_changes))
+                ON CONFLICT (store_id) DO UPDATE SET revision = excluded.revision;
+            END
+        ''')
+
+def _migration_store_list_index(cursor):
+    """運営者画面の店舗一覧を店舗名順に並べ替えるためのインデックスを作成"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_stores_name ON stores (name)')
+
+def _migration_search_text(cursor):
+    """全文検索の内容を store_search_text テーブルに移し、store_search をその外部コンテンツ FTS5 に作り直す"""
+    # 2文字以下の語の部分一致検索はこのテーブルを直接走査する
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS store_search_text (
+            store_id INTEGER PRIMARY KEY,
+            name TEXT,
+            description TEXT,
+            products TEXT
+        )
+    ''')
+    
+    # 旧トリガーと、内容を自前で保存していた検索インデックスを削除
+    for name in ('store_insert', 'store_update', 'store_delete', 'product_insert', 'product_update', 'product_delete'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS store_search_{name}')
+    cursor.execute('DROP TABLE IF EXISTS store_search')
+    cursor.execute('''
+        CREATE VIRTUAL TABLE store_search USING fts5 (
+            name, description, products,
+            content = 'store_search_text', content_rowid = 'store_id',
+            tokenize = 'trigram'
+        )
+    ''')
+    
+    # 既存の店舗を登録
+    cursor.execute('DELETE FROM store_search_text')
+    cursor.execute('''
+        INSERT INTO store_search_text (store_id, name, description, products)
+        SELECT s.id, s.name, s.description,
+               (SELECT group_concat(product_name, ' ') FROM products WHERE store_id = s.id)
+        FROM stores s
+    ''')
+    cursor.execute("INSERT INTO store_search (store_search) VALUES ('rebuild')")
+    
+    # store_search_text の変更を検索インデックスに反映するトリガー
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS store_search_text_insert AFTER INSERT ON store_search_text
+        BEGIN
+            INSERT INTO store_search (rowid, name, description, products)
+            VALUES (new.store_id, new.name, new.description, new.products);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS store_search_text_delete AFTER DELETE ON store_search_text
+        BEGIN
+            INSERT INTO store_search (store_search, rowid, name, description, products)
+            VALUES ('delete', old.store_id, old.name, old.description, old.products);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS store_search_text_update AFTER UPDATE ON store_search_text
+        BEGIN
+            INSERT INTO store_search (store_search, rowid, name, description, products)
+            VALUES ('delete', old.store_id, old.name, old.description, old.products);
+            INSERT INTO store_search (rowid, name, description, products)
+            VALUES (new.store_id, new.name, new.description, new.products);
+        END
+    ''')
+    
+    # stores / products の変更を store_search_text に反映するトリガー
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS store_search_store_insert AFTER INSERT ON stores
+        BEGIN
+            INSERT INTO store_search_text (store_id, name, description, products)
+            VALUES (
+                new.id, new.name, new.description,
+                (SELECT group_concat(product_name, ' ') FROM products WHERE store_id = new.id)
+            );
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS store_search_store_update AFTER UPDATE OF name, description ON stores
+        BEGIN
+            UPDATE store_search_text SET name = new.name, description = new.description
+            WHERE store_id = new.id;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS store_search_store_delete AFTER DELETE ON stores
+        BEGIN
+            DELETE FROM store_search_text WHERE store_id = old.id;
+        END
+    ''')
+    # 価格だけの変更では検索インデックスを書き換えない
+    for event, store_id in (('INSERT', 'new.store_id'), ('UPDATE OF product_name', 'new.store_id'), ('DELETE', 'old.store_id')):
+        name = event.split()[0].lower()
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS store_search_product_{name} AFTER {event} ON products
+            BEGIN
+                UPDATE store_search_text
+                SET products = (SELECT group_concat(product_name, ' ') FROM products WHERE store_id = {store_id})
+                WHERE store_id = {store_id};
+            END
+        ''')
+
+def _migration_product_position(cursor):
+    """店舗内の商品の並び順を保存する position 列と、店舗ごとに並び順で読むためのインデックスを作成"""
+    # 既存の商品は 0 のまま（同じ position の商品は商品ID順）にして、全店舗の変更履歴を進めない
+    # ADD COLUMN には IF NOT EXISTS がないため、列の有無を確認してから追加する
+    cursor.execute('PRAGMA table_info(products)')
+    if 'position' not in [row[1] for row in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE products ADD COLUMN position INTEGER NOT NULL DEFAULT 0')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_products_store_position ON products (store_id, position)')
+    # 店舗ごとの検索・削除は上のインデックスで行える
+    cursor.execute('DROP INDEX IF EXISTS idx_products_store_id')
+
+# スキーマのマイグレーション（順番に適用、PRAGMA user_version = 適用済みの数）
+# 各ステップは途中で中断されても再実行できるように冪等に書くこと
+MIGRATIONS = [
+    _migration_create_tables,
+    _migration_spatial_index,
+    _migration_search_index,
+    _migration_change_log,
+    _migration_store_list_index,
+    _migration_search_text,
+    _migration_product_position,
+]
+
+def get_schema_version():
+    """データベースに適用済みのスキーマバージョンを取得"""
+    return get_connection().execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_database():
+    """
+    未適用のマイグレーションを順に実行
+    各ステップは1トランザクションで実行し、成功するごとに user_version を進める
+    適用したステップ数を返す
+    """
+    current_version = get_schema_version()
+    target_version = len(MIGRATIONS)
+
+    if current_version > target_version:
+        print(f"Warning: database schema version {current_version} is newer than this application ({target_version})")
+        return 0
+
+    applied = 0
+    for version in range(current_version + 1, target_version + 1):
+        migration = MIGRATIONS[version - 1]
+        with transaction(write=True) as cursor:
+            # 書き込みロックを待つ間に他のプロセスが適用していれば何もしない
+            if cursor.execute('PRAGMA user_version').fetchone()[0] >= version:
+                continue
+            migration(cursor)
+            cursor.execute(f'PRAGMA user_version = {version}')
+        applied += 1
+        print(f"Applied migration {version}: {migration.__doc__}")
+
+    return applied
+
+def init_database():
+    """データベースを初期化し、未適用のマイグレーションを実行"""
+    migrate_database()
     print(f"Database '{DATABASE_FILE}' has been initialized")
 
+def _open_connection(database_file):
+    """新しい接続を開き、PRAGMA を適用"""
+    # sqlite3 モジュールの暗黙のトランザクションは DDL（CREATE など）を含まないため使わず、
+    # transaction() で明示的に BEGIN する（それ以外の文は自動コミット）
+    conn = sqlite3.connect(database_file, isolation_level=None)
+    # ON DELETE CASCADE を有効にするため外部キー制約は常に有効化
+    conn.execute('PRAGMA foreign_keys = ON')
+    for name, value in CONNECTION_PRAGMAS.items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
 def get_connection():
-    """データベース接続を取得"""
-    return sqlite3.connect(DATABASE_FILE)
+    """
+    データベース接続を取得
+    接続はスレッドごとに再利用され、DATABASE_FILE が変わると開き直す
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.database_file != DATABASE_FILE:
+        close_connection()
+        conn = _open_connection(DATABASE_FILE)
+        _local.conn = conn
+        _local.database_file = DATABASE_FILE
+    return conn
 
-def add_store(name, latitude, longitude, description=""):
-    """店舗を追加"""
+def close_connection():
+    """現在のスレッドの接続を閉じる"""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        _local.conn = None
+        _local.database_file = None
+
+@contextmanager
+def transaction(write=False):
+    """
+    1つのトランザクション内で処理を実行するカーソルを返す
+    CREATE などの DDL や PRAGMA user_version も含めて、正常終了でコミット、例外発生時はロールバック
+    write=True の場合は BEGIN IMMEDIATE で開始時に書き込みロックを取得する
+    （読み込んでから書き込む処理が、途中で他の接続の書き込みと競合して SQLITE_BUSY にならず、開始時に待つ）
+    """
     conn = get_connection()
     cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO stores (name, latitude, longitude, description)
-        VALUES (?, ?, ?, ?)
-    ''', (name, latitude, longitude, description))
-    
-    store_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    cursor.execute('BEGIN IMMEDIATE' if write else 'BEGIN')
+    try:
+        yield cursor
+        cursor.execute('COMMIT')
+    except BaseException:
+        # エラーの種類によっては SQLite が既にロールバックしている
+        if conn.in_transaction:
+            cursor.execute('ROLLBACK')
+        raise
+    finally:
+        cursor.close()
+
+def add_store(name, latitude, longitude, description=""):
+    """店舗を追加"""
+    with transaction(write=True) as cursor:
+        cursor.execute('''
+            INSERT INTO stores (name, latitude, longitude, description)
+            VALUES (?, ?, ?, ?)
+        ''', (name, latitude, longitude, description))
+        
+        store_id = cursor.lastrowid
     return store_id
 
 def add_product(store_id, product_name, price):
-    """商品を追加"""
+    """商品を店舗の商品リストの末尾に追加"""
+    with transaction(write=True) as cursor:
+        cursor.execute('''
+            INSERT INTO products (store_id, product_name, price, position)
+            VALUES (?, ?, ?, (SELECT IFNULL(MAX(position), -1) + 1 FROM products WHERE store_id = ?))
+        ''', (store_id, product_name, price, store_id))
+
+def _insert_products(cursor, store_id, products, positions=None):
+    """
+    商品リストを executemany で一括挿入
+    positions: 各商品の並び順（省略時はリスト内の順番）
+    """
+    if positions is None:
+        positions = range(len(products))
+    cursor.executemany('''
+        INSERT INTO products (store_id, product_name, price, position)
+        VALUES (?, ?, ?, ?)
+    ''', [(store_id, product['name'], product['price'], position) for product, position in zip(products, positions)])
+
+def add_store_with_products(name, latitude, longitude, products, description=""):
+    """
+    店舗と商品を1トランザクションで追加
+    products: [{"name": "商品名", "price": 価格}, ...]
+    途中でエラーが発生した場合は店舗ごとロールバックされる
+    """
+    with transaction(write=True) as cursor:
+        cursor.execute('''
+            INSERT INTO stores (name, latitude, longitude, description)
+            VALUES (?, ?, ?, ?)
+        ''', (name, latitude, longitude, description))
+        
+        store_id = cursor.lastrowid
+        _insert_products(cursor, store_id, products)
+    return store_id
+
+def add_stores_bulk(stores):
+    """
+    複数の店舗と商品を1トランザクションで追加
+    stores: [{"name", "latitude", "longitude", "description", "products"}, ...]
+    追加した店舗IDのリストを返す（エラー時は全件ロールバック）
+    """
+    store_ids = []
+    with transaction(write=True) as cursor:
+        for store in stores:
+            cursor.execute('''
+                INSERT INTO stores (name, latitude, longitude, description)
+                VALUES (?, ?, ?, ?)
+            ''', (store['name'], store['latitude'], store['longitude'], store.get('description', "")))
+            
+            store_id = cursor.lastrowid
+            _insert_products(cursor, store_id, store['products'])
+            store_ids.append(store_id)
+    return store_ids
+
+def _iter_store_rows(rows):
+    """店舗と商品のJOIN結果（店舗ID順）を店舗ごとの辞書にまとめて順に返す"""
+    current = None
+    for row in rows:
+        if current is None or current['id'] != row[0]:
+            if current is not None:
+                yield current
+            current = {
+                'id': row[0],
+                'name': row[1],
+                'latitude': row[2],
+                'longitude': row[3],
+                'description': row[4],
+                'products': []
+            }
+
+        # LEFT JOIN のため商品のない店舗は商品列が NULL になる
+        if row[5] is not None:
+            current['products'].append({
+                'name': row[5],
+                'price': row[6]
+            })
+    if current is not None:
+        yield current
+
+def _group_store_rows(rows):
+    """店舗と商品のJOIN結果を店舗ごとの辞書にまとめる"""
+    return list(_iter_store_rows(rows))
+
+def get_all_stores():
+    """すべての店舗とその商品を取得（1回のJOINで一括取得）"""
     conn = get_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
-        INSERT INTO products (store_id, product_name, price)
-        VALUES (?, ?, ?)
-    ''', (store_id, product_name, price))
+        SELECT s.id, s.name, s.latitude, s.longitude, s.description,
+               p.product_name, p.price
+        FROM stores s
+        LEFT JOIN products p ON p.store_id = s.id
+        ORDER BY s.id, p.position, p.id
+    ''')
     
-    conn.commit()
-    conn.close()
-
-def get_all_stores():
-    """すべての店舗とその商品を取得"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    stores = _group_store_rows(cursor.fetchall())
     
+    return stores
+
+def iter_stores():
+    """
+    すべての店舗とその商品を店舗ID順に1件ずつ返す
+    カーソルから順に読み込むため、店舗数が多くても全件をメモリに保持しない
+    """
+    cursor = get_connection().cursor()
     cursor.execute('''
-        SELECT s.id, s.name, s.latitude, s.longitude, s.description
+        SELECT s.id, s.name, s.latitude, s.longitude, s.description,
+               p.product_name, p.price
         FROM stores s
+        LEFT JOIN products p ON p.store_id = s.id
+        ORDER BY s.id, p.position, p.id
     ''')
+    yield from _iter_store_rows(cursor)
+
+def _get_stores_where(condition, params=()):
+    """条件に一致する店舗とその商品を1回のJOINで取得"""
+    cursor = get_connection().cursor()
+    cursor.execute(f'''
+        SELECT s.id, s.name, s.latitude, s.longitude, s.description,
+               p.product_name, p.price
+        FROM stores s
+        LEFT JOIN products p ON p.store_id = s.id
+        WHERE {condition}
+        ORDER BY s.id, p.position, p.id
+    ''', params)
+    return _group_store_rows(cursor.fetchall())
+
+def get_stores_in_bbox(south, west, north, east):
+    """指定した範囲（緯度 south〜north、経度 west〜east）内の店舗とその商品を取得"""
+    return _get_stores_where('''
+        s.id IN (
+            SELECT id FROM stores_rtree
+            WHERE max_lat >= ? AND min_lat <= ?
+              AND max_lng >= ? AND min_lng <= ?
+        )
+        AND s.latitude BETWEEN ? AND ?
+        AND s.longitude BETWEEN ? AND ?
+    ''', (south, north, west, east, south, north, west, east))
+
+# 店舗一覧の並べ替えに使える列
+STORE_PAGE_SORT_COLUMNS = {
+    'id': 's.id',
+    'name': 's.name',
+    'product_count': 'product_count',
+}
+
+def _like_pattern(term):
+    """部分一致検索用の LIKE パターン（ESCAPE '!' と組み合わせて使う）"""
+    return '%' + term.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+
+def _store_summary(row):
+    return {'id': row[0], 'name': row[1], 'latitude': row[2], 'longitude': row[3], 'product_count': row[4]}
+
+def _store_page_query(where, order):
+    """店舗一覧の行（店舗ID・店舗名・座標・商品数）を order の順に返す SELECT 文"""
+    return f'''
+        SELECT s.id, s.name, s.latitude, s.longitude,
+               (SELECT COUNT(*) FROM products p WHERE p.store_id = s.id) AS product_count
+        FROM stores s
+        {where}
+        ORDER BY {order}
+    '''
+
+def get_store_page(offset=0, limit=100, sort='id', descending=False, query=None, bbox=None):
+    """
+    店舗一覧の1ページ分（店舗ID・店舗名・座標・商品数）を取得
+    並べ替え・絞り込みはデータベース側で行い、表示する件数だけを読み込む
     
-    stores = []
-    for row in cursor.fetchall():
-        store = {
-            'id': row[0],
-            'name': row[1],
-            'latitude': row[2],
-            'longitude': row[3],
-            'description': row[4],
-            'products': []
-        }
-        
-        # 各店舗の商品を取得
-        cursor.execute('''
-            SELECT product_name, price
-            FROM products
-            WHERE store_id = ?
-        ''', (store['id'],))
+    Args:
+        sort: 並べ替える列（'id' / 'name' / 'product_count'）
+        query: 店舗名・説明・商品名の全文検索で絞り込む（空白区切りの複数語はすべてを含む店舗）
+        bbox: (south, west, north, east) の範囲内の店舗に絞り込む
+    
+    Returns:
+        dict: {'stores': [{'id', 'name', 'latitude', 'longitude', 'product_count'}, ...],
+               'total': 条件に一致する店舗数,
+               'truncated': 検索の一致が SEARCH_MAX_HITS 件を超えたか（True の場合 total は下限）}
+    """
+    if sort not in STORE_PAGE_SORT_COLUMNS:
+        raise ValueError(f"Unknown sort column: {sort}")
+    
+    # 同じ値の店舗は店舗ID順（ページをまたいでも順番が変わらない）
+    direction = 'DESC' if descending else 'ASC'
+    order = f"{STORE_PAGE_SORT_COLUMNS[sort]} {direction}, s.id {direction}"
+    
+    # transaction() が BEGIN を発行するため、件数とページは同じ時点のデータから取得される
+    with transaction() as cursor:
+        conditions = []
+        params = []
+        total = None
+        truncated = False
+        if bbox:
+            south, west, north, east = bbox
+            conditions.append('''
+                s.id IN (
+                    SELECT id FROM stores_rtree
+                    WHERE max_lat >= ? AND min_lat <= ?
+                      AND max_lng >= ? AND min_lng <= ?
+                )
+            ''')
+            params.extend([south, north, west, east])
+        terms = query.split() if query else []
+        if terms:
+            ids_query, search_params, _ = _search_ids_query(terms)
+            conditions.append(f's.id IN ({ids_query})')
+            params.extend(search_params)
+            
+            # 検索は全件の走査になる場合があるため、一致した店舗IDを一時テーブルに1回だけ書き出し、
+            # 件数とページの取得で使い回す
+            # 多くの店舗に一致する語で全件を書き出さないよう、表示する順に並べた先頭 SEARCH_MAX_HITS 件で打ち切る
+            cursor.execute('CREATE TEMP TABLE IF NOT EXISTS store_page_hits (id INTEGER PRIMARY KEY)')
+            cursor.execute('DELETE FROM temp.store_page_hits')
+            if sort == 'id' and not bbox:
+                # 店舗ID順は検索結果の順番のまま読み、上限に達した時点で検索を打ち切る
+                hits_query = f'{ids_query} ORDER BY 1 {direction}'
+            else:
+                where = f"WHERE {' AND '.join(conditions)}"
+                hits_query = f'SELECT id FROM ({_store_page_query(where, order)})'
+            cursor.execute(f'INSERT INTO temp.store_page_hits (id) {hits_query} LIMIT ?', (*params, SEARCH_MAX_HITS + 1))
+            total = cursor.rowcount
+            conditions = ['s.id IN (SELECT id FROM temp.store_page_hits)']
+            params = []
+            if total > SEARCH_MAX_HITS:
+                # 超過した1件（並び順で最後の店舗）を除く
+                last_query = _store_page_query(f'WHERE {conditions[0]}', order)
+                cursor.execute(f'DELETE FROM temp.store_page_hits WHERE id = (SELECT id FROM ({last_query} LIMIT 1 OFFSET ?))', (SEARCH_MAX_HITS,))
+                total = SEARCH_MAX_HITS
+                truncated = True
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
         
-        for product_row in cursor.fetchall():
-            store['products'].append({
-                'name': product_row[0],
-                'price': product_row[1]
-            })
+        # 検索した場合は書き出した件数がそのまま一致件数
+        if total is None:
+            cursor.execute(f'SELECT COUNT(*) FROM stores s {where}', params)
+            total = cursor.fetchone()[0]
         
-        stores.append(store)
+        cursor.execute(f'{_store_page_query(where, order)} LIMIT ? OFFSET ?', (*params, limit, offset))
+        stores = [_store_summary(row) for row in cursor.fetchall()]
+    
+    return {'stores': stores, 'total': total, 'truncated': truncated}
+
+def get_store_summary(store_id):
+    """店舗一覧の1行分（店舗ID・店舗名・座標・商品数）を取得（存在しない場合は None）"""
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT s.id, s.name, s.latitude, s.longitude,
+               (SELECT COUNT(*) FROM products p WHERE p.store_id = s.id)
+        FROM stores s
+        WHERE s.id = ?
+    ''', (store_id,))
+    row = cursor.fetchone()
+    return _store_summary(row) if row else None
+
+# trigram トークナイザで MATCH 検索できる最短の文字数
+SEARCH_MIN_TERM_LENGTH = 3
+
+# 店舗一覧の検索で一致を数える上限
+SEARCH_MAX_HITS = 1000
+
+def _search_ids_query(terms):
+    """
+    検索語をすべて含む店舗の ID（rowid）を返す SELECT 文とパラメータ
+    3文字以上の語は MATCH（インデックス）、2文字以下の語は trigram で MATCH できないため LIKE で部分一致
+    
+    Returns:
+        tuple: (SELECT 文, パラメータのリスト, MATCH を使うか)
+    """
+    long_terms = [term for term in terms if len(term) >= SEARCH_MIN_TERM_LENGTH]
+    short_terms = [term for term in terms if len(term) < SEARCH_MIN_TERM_LENGTH]
+    like = "(name LIKE ? ESCAPE '!' OR description LIKE ? ESCAPE '!' OR products LIKE ? ESCAPE '!')"
+    
+    if long_terms:
+        # 各語をフレーズとして MATCH し、2文字以下の語は候補の中から LIKE で絞り込む
+        conditions = ['store_search MATCH ?'] + [like] * len(short_terms)
+        params = [' '.join('"' + term.replace('"', '""') + '"' for term in long_terms)]
+        for term in short_terms:
+            params.extend([_like_pattern(term)] * 3)
+        return f"SELECT rowid FROM store_search WHERE {' AND '.join(conditions)}", params, True
     
-    conn.close()
+    # 2文字以下の語のみの場合は全件の走査になるため、仮想テーブルを経由せず
+    # 検索インデックスの内容を保存している store_search_text を直接走査する
+    conditions = [like] * len(short_terms)
+    params = []
+    for term in short_terms:
+        params.extend([_like_pattern(term)] * 3)
+    return f"SELECT store_id FROM store_search_text WHERE {' AND '.join(conditions)}", params, False
+
+def search_stores(query, limit=20):
+    """
+    店舗名・説明・商品名から店舗を全文検索し、関連度順に最大 limit 件取得
+    空白区切りの複数語はすべてを含む店舗に絞り込む（例: "たこ焼き ソース"）
+    """
+    terms = query.split()
+    if not terms:
+        return []
+
+    ids_query, params, use_match = _search_ids_query(terms)
+    if use_match:
+        # 店舗名の一致を最も重視
+        order = 'bm25(store_search, 10.0, 1.0, 5.0)'
+    else:
+        order = "name LIKE ? ESCAPE '!' DESC, store_id"
+        params.append(_like_pattern(terms[0]))
+
+    cursor = get_connection().cursor()
+    cursor.execute(f'{ids_query} ORDER BY {order} LIMIT ?', (*params, limit))
+
+    store_ids = [row[0] for row in cursor.fetchall()]
+    if not store_ids:
+        return []
+
+    # 検索順位を保ったまま商品を含めて取得
+    placeholders = ', '.join('?' * len(store_ids))
+    stores = {store['id']: store for store in _get_stores_where(f's.id IN ({placeholders})', tuple(store_ids))}
+    return [stores[store_id] for store_id in store_ids if store_id in stores]
+
+# 地球の平均半径（メートル）
+EARTH_RADIUS_M = 6371008.8
+
+def _distance_m(lat1, lng1, lat2, lng2):
+    """2点間の距離（メートル、ハーバサイン公式）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+def get_stores_near(latitude, longitude, radius_m, limit=10):
+    """
+    指定地点から半径 radius_m メートル以内の店舗を近い順に最大 limit 件取得
+    各店舗には距離（メートル）が 'distance' として付与される
+    """
+    # 半径を囲む範囲で R-tree から候補を絞り込む
+    d_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    d_lng = d_lat / max(math.cos(math.radians(latitude)), 1e-6)
+
+    cursor = get_connection().cursor()
+    cursor.execute('''
+        SELECT s.id, s.latitude, s.longitude
+        FROM stores_rtree r
+        JOIN stores s ON s.id = r.id
+        WHERE r.max_lat >= ? AND r.min_lat <= ?
+          AND r.max_lng >= ? AND r.min_lng <= ?
+    ''', (latitude - d_lat, latitude + d_lat, longitude - d_lng, longitude + d_lng))
+
+    candidates = []
+    for store_id, store_lat, store_lng in cursor.fetchall():
+        distance = _distance_m(latitude, longitude, store_lat, store_lng)
+        if distance <= radius_m:
+            candidates.append((distance, store_id))
+    candidates.sort()
+    candidates = candidates[:limit]
+    if not candidates:
+        return []
+
+    # 上位の店舗だけ商品を含めて取得
+    distances = {store_id: distance for distance, store_id in candidates}
+    placeholders = ', '.join('?' * len(distances))
+    stores = _get_stores_where(f's.id IN ({placeholders})', tuple(distances))
+    for store in stores:
+        store['distance'] = distances[store['id']]
+    stores.sort(key=lambda store: store['distance'])
     return stores
 
-def delete_store(store_id):
-    """店舗を削除（関連する商品も自動削除）"""
-    conn = get_connection()
-    cursor = conn.cursor()
+def get_current_revision():
+    """店舗データの最新リビジョン（変更がなければ 0）"""
+    return get_connection().execute('SELECT IFNULL(MAX(revision), 0) FROM store_changes').fetchone()[0]
+
+def get_changes_since(revision):
+    """
+    指定したリビジョンより後に追加・変更・削除された店舗を取得
     
-    cursor.execute('DELETE FROM stores WHERE id = ?', (store_id,))
+    Returns:
+        dict: {'revision': 最新リビジョン, 'stores': [追加・変更された店舗], 'deleted': [削除された店舗ID]}
+    """
+    # 最新リビジョンを先に取得（この後の変更は次回も返されるため取りこぼさない）
+    latest = get_current_revision()
+    cursor = get_connection().cursor()
+    cursor.execute('SELECT store_id FROM store_changes WHERE revision > ?', (revision,))
+    changed_ids = [row[0] for row in cursor.fetchall()]
+    if not changed_ids:
+        return {'revision': latest, 'stores': [], 'deleted': []}
     
-    conn.commit()
-    conn.close()
+    stores = _get_stores_where('s.id IN (SELECT store_id FROM store_changes WHERE revision > ?)', (revision,))
+    existing_ids = {store['id'] for store in stores}
+    return {
+        'revision': latest,
+        'stores': stores,
+        'deleted': [store_id for store_id in changed_ids if store_id not in existing_ids]
+    }
+
+def delete_store(store_id):
+    """店舗を削除（関連する商品も自動削除）"""
+    with transaction(write=True) as cursor:
+        cursor.execute('DELETE FROM stores WHERE id = ?', (store_id,))
 
 def delete_all_stores():
     """すべての店舗を削除（関連する商品も自動削除）"""
-    conn = get_connection()
-    cursor = conn.cursor()
-    
-    # 外部キー制約により、商品も自動削除される
-    cursor.execute('DELETE FROM stores')
+    with transaction(write=True) as cursor:
+        # 外部キー制約により、商品も自動削除される
+        cursor.execute('DELETE FROM stores')
     
-    conn.commit()
-    conn.close()
     print("All stores have been deleted from the database")
 
 def update_store_coordinates(store_id, new_latitude, new_longitude):
     """店舗の座標を更新"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        UPDATE stores
-        SET latitude = ?, longitude = ?
-        WHERE id = ?
-    ''', (new_latitude, new_longitude, store_id))
+    with transaction(write=True) as cursor:
+        cursor.execute('''
+            UPDATE stores
+            SET latitude = ?, longitude = ?
+            WHERE id = ?
+        ''', (new_latitude, new_longitude, store_id))
+        updated = cursor.rowcount > 0
 
-    if cursor.rowcount > 0:
-        conn.commit()
-        conn.close()
+    if updated:
         print(f"Store ID {store_id} coordinates updated to ({new_latitude}, {new_longitude})")
         return True
     else:
-        conn.close()
         print(f"Store ID {store_id} not found")
         return False
 
 def update_store(store_id, name, latitude, longitude, description=""):
     """店舗情報を更新"""
-    conn = get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute('''
-        UPDATE stores
-        SET name = ?, latitude = ?, longitude = ?, description = ?
-        WHERE id = ?
-    ''', (name, latitude, longitude, description, store_id))
+    with transaction(write=True) as cursor:
+        cursor.execute('''
+            UPDATE stores
+            SET name = ?, latitude = ?, longitude = ?, description = ?
+            WHERE id = ?
+        ''', (name, latitude, longitude, description, store_id))
 
-    if cursor.rowcount > 0:
-        conn.commit()
-        conn.close()
-        return True
-    else:
-        conn.close()
-        return False
+        return cursor.rowcount > 0
 
 def delete_products_by_store(store_id):
     """特定店舗の商品をすべて削除"""
-    conn = get_connection()
-    cursor = conn.cursor()
+    with transaction(write=True) as cursor:
+        cursor.execute('DELETE FROM products WHERE store_id = ?', (store_id,))
 
-    cursor.execute('DELETE FROM products WHERE store_id = ?', (store_id,))
-
-    conn.commit()
-    conn.close()
-
-def get_store_by_id(store_id):
-    """IDで店舗を取得"""
-    conn = get_connection()
-    cursor = conn.cursor()
+def _sync_products(cursor, store_id, products):
+    """
+    店舗の商品を products と同じ内容・並び順にする（変更のない商品には触れない）
+    商品名で突き合わせ、価格か並び順が変わった商品は更新、新しい商品は追加、なくなった商品は削除する
+    残った商品の ID は変わらない
+    
+    Returns:
+        dict: {'inserted': 件数, 'updated': 件数, 'deleted': 件数}
+    """
+    # 同じ名前の商品が複数ある場合は現在の並び順に対応させる
+    existing = {}
+    cursor.execute('SELECT id, product_name, price, position FROM products WHERE store_id = ? ORDER BY position, id', (store_id,))
+    for product_id, product_name, price, position in cursor.fetchall():
+        existing.setdefault(product_name, []).append((product_id, price, position))
+    
+    # 並び順は products 内の順番
+    inserts = []
+    insert_positions = []
+    updates = []
+    for index, product in enumerate(products):
+        matches = existing.get(product['name'])
+        if matches:
+            product_id, price, position = matches.pop(0)
+            if price != product['price'] or position != index:
+                updates.append((product['price'], index, product_id))
+        else:
+            inserts.append(product)
+            insert_positions.append(index)
+    deletes = [(product_id,) for matches in existing.values() for product_id, _, _ in matches]
+    
+    if deletes:
+        cursor.executemany('DELETE FROM products WHERE id = ?', deletes)
+    if updates:
+        cursor.executemany('UPDATE products SET price = ?, position = ? WHERE id = ?', updates)
+    if inserts:
+        _insert_products(cursor, store_id, inserts, insert_positions)
+    return {'inserted': len(inserts), 'updated': len(updates), 'deleted': len(deletes)}
 
-    cursor.execute('''
-        SELECT id, name, latitude, longitude, description
-        FROM stores
-        WHERE id = ?
-    ''', (store_id,))
+def sync_store_products(store_id, products):
+    """
+    店舗の商品リストを1トランザクションで差分更新（追加・価格や並び順の更新・削除のみ実行）
+    products: [{"name": "商品名", "price": 価格}, ...]
+    """
+    with transaction(write=True) as cursor:
+        return _sync_products(cursor, store_id, products)
 
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return None
-
-    store = {
-        'id': row[0],
-        'name': row[1],
-        'latitude': row[2],
-        'longitude': row[3],
-        'description': row[4],
-        'products': []
-    }
+def update_store_with_products(store_id, name, latitude, longitude, products, description=""):
+    """
+    店舗情報と商品リストを1トランザクションで更新
+    商品は差分のみ反映するため、変更のない商品の ID はそのまま残る
+    店舗が存在しない場合は何も変更せず False を返す
+    """
+    with transaction(write=True) as cursor:
+        cursor.execute('''
+            UPDATE stores
+            SET name = ?, latitude = ?, longitude = ?, description = ?
+            WHERE id = ?
+        ''', (name, latitude, longitude, description, store_id))
 
-    # 商品を取得
-    cursor.execute('''
-        SELECT product_name, price
-        FROM products
-        WHERE store_id = ?
-    ''', (store_id,))
+        if cursor.rowcount == 0:
+            return False
 
-    for product_row in cursor.fetchall():
-        store['products'].append({
-            'name': product_row[0],
-            'price': product_row[1]
-        })
+        _sync_products(cursor, store_id, products)
+    return True
 
-    conn.close()
-    return store
+def get_store_by_id(store_id):
+    """IDで店舗を取得"""
+    stores = _get_stores_where('s.id = ?', (store_id,))
+    return stores[0] if stores else None
 
 if __name__ == "__main__":
     init_database()
\ No newline at end of file
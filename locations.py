@@ -4,6 +4,10 @@
 盛岡市大通を中心とした校内主要場所の座標定義
 """
 
+# 会場（盛岡市大通）の中心と地図の初期ズームレベル
+DEFAULT_CENTER = (39.703483, 141.144167)
+DEFAULT_ZOOM = 19
+
 PRESET_LOCATIONS = {
     
     # 大通り北側の等間隔店舗位置（5店舗）
@@ -7,7 +7,11 @@
 使用方法:
 1. 運営者画面を開く場合: python main.py admin
 2. 来場者向けマップを作成・表示する場合: python main.py visitor  
-3. 引数なしの場合: 運営者画面がデフォルトで開きます
+3. 店舗をCSV/JSONファイルから一括登録する場合: python main.py import <file>
+4. 来場者向けマップをブラウザを開かずに生成する場合: python main.py build
+5. 会場周辺の地図タイルを事前に保存する場合: python main.py tiles
+6. 来場者向けマップをHTTPで配信する場合: python main.py serve
+7. 引数なしの場合: 運営者画面がデフォルトで開きます
 """
 
 import sys
@@ -18,6 +22,16 @@ def show_usage():
     print("使用例:")
     print("  python main.py admin    # 運営者画面を開く")
     print("  python main.py visitor  # 来場者向けマップを作成・表示")
+    print("  python main.py import stores.csv [--batch-size 500] [--encoding cp932] [--error-log errors.tsv]")
+    print("                          # CSV/JSON/JSON Linesファイルから店舗を一括登録")
+    print("  python main.py build [--output map.html] [--center 39.7035,141.1442] [--zoom 19] [--db festival_stores.db] [--force] [--mode data] [--cluster] [--lazy-popups] [--assets static] [--tiles tiles] [--stream]")
+    print("                          # 来場者向けマップを生成のみ（ブラウザは開かない）")
+    print("  python main.py build --variants variants.json [--workers 4]")
+    print("                          # 複数のマップ（エリア別・キーワード別など）を並列に生成")
+    print("  python main.py tiles [--bbox 39.700,141.141,39.706,141.147] [--zooms 15-19] [--dir tiles] [--url URL] [--mbtiles area.mbtiles]")
+    print("                          # 会場周辺の地図タイルをダウンロード（または MBTiles から取り込み）して保存")
+    print("  python main.py serve [--host 0.0.0.0] [--port 8000] [--site public] [--db festival_stores.db] [--mode data] [--cluster] [--lazy-popups] [--assets]")
+    print("                          # 来場者向けマップをHTTPで配信（データベースの変更時に自動で再生成）")
     print("  python main.py          # 運営者画面を開く（デフォルト）")
 
 def run_admin_app():
@@ -65,6 +79,313 @@ def run_visitor_map():
     
     return True
 
+def run_import(args):
+    """CSV/JSONファイルから店舗を一括登録"""
+    import argparse
+    import csv
+    import time
+    import sqlite3
+    from database import init_database
+    from store_importer import import_stores, write_error_log, DEFAULT_BATCH_SIZE
+
+    parser = argparse.ArgumentParser(prog="python main.py import", description="店舗データの一括インポート")
+    parser.add_argument("file", help="CSV / JSON / JSON Lines ファイル")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="1トランザクションで登録する店舗数")
+    parser.add_argument("--encoding", default="utf-8-sig", help="ファイルの文字コード（Excel形式のCSVは cp932）")
+    parser.add_argument("--error-log", help="不正な行を書き出すログファイル")
+    options = parser.parse_args(args)
+
+    print("=== Festival Store Management System - Bulk Import ===")
+    try:
+        init_database()
+        start = time.perf_counter()
+        result = import_stores(
+            options.file,
+            batch_size=options.batch_size,
+            encoding=options.encoding,
+            progress=lambda processed, imported, errors: print(
+                f"  {processed} rows processed, {imported} imported, {errors} errors"
+            )
+        )
+        elapsed = time.perf_counter() - start
+    except (OSError, ValueError, csv.Error, sqlite3.Error) as e:
+        print(f"Error occurred while importing stores: {e}")
+        return False
+
+    print(f"Imported {result['imported']} of {result['processed']} rows in {elapsed:.2f}s")
+
+    if result['errors']:
+        print(f"{len(result['errors'])} rows were skipped:")
+        for row_number, message in result['errors'][:20]:
+            print(f"  Row {row_number}: {message}")
+        if len(result['errors']) > 20:
+            print(f"  ... and {len(result['errors']) - 20} more")
+        if options.error_log:
+            try:
+                write_error_log(result['errors'], options.error_log)
+            except OSError as e:
+                print(f"Error: could not write error log '{options.error_log}' - {e}")
+                return False
+            print(f"Error log written to '{options.error_log}'")
+        return False
+
+    return True
+
+def _parse_center(text):
+    """「緯度,経度」形式の文字列を座標に変換"""
+    import argparse
+    try:
+        lat_str, lng_str = text.split(',')
+        return float(lat_str), float(lng_str)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'緯度,経度' の形式で指定してください: {text}")
+
+class _CountingIterator:
+    """読み出した件数を数えるイテレータ（ストリーミング出力時の店舗数の表示用）"""
+
+    def __init__(self, iterable):
+        self.iterator = iter(iterable)
+        self.count = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self.iterator)
+        self.count += 1
+        return item
+
+    def __len__(self):
+        return self.count
+
+def run_build(args):
+    """来場者向けマップをブラウザを開かずに生成"""
+    import argparse
+    import time
+    import database
+    from visitor_map import DEFAULT_CENTER, DEFAULT_ZOOM, MAP_MODES
+
+    parser = argparse.ArgumentParser(prog="python main.py build", description="来場者向けマップの生成")
+    parser.add_argument("--output", default="festival_visitor_map.html", help="出力するHTMLファイル")
+    parser.add_argument("--center", type=_parse_center, default=DEFAULT_CENTER, help="地図の中心（緯度,経度）")
+    parser.add_argument("--zoom", type=int, default=DEFAULT_ZOOM, help="初期ズームレベル")
+    parser.add_argument("--db", default=database.DATABASE_FILE, help="店舗データを読み込むデータベースファイル")
+    parser.add_argument("--force", action="store_true", help="データに変更がなくても再生成する")
+    parser.add_argument("--mode", choices=MAP_MODES, default="markers",
+                        help="markers: 店舗ごとにマーカーを出力 / data: 店舗データを1つの配列で出力（大規模向け）")
+    parser.add_argument("--cluster", action="store_true", help="近くの店舗マーカーをズームに応じてまとめて表示")
+    parser.add_argument("--lazy-popups", action="store_true",
+                        help="商品データを別ファイルに出力し、ポップアップを開いたときに読み込む（--mode data のみ）")
+    parser.add_argument("--assets", metavar="DIR",
+                        help="CDN の JS/CSS をこのフォルダに保存して読み込む（会場のLAN内で配信する場合）")
+    parser.add_argument("--tiles", metavar="DIR",
+                        help="地図タイルをこのフォルダのキャッシュから読み込む（python main.py tiles で作成）")
+    parser.add_argument("--stream", action="store_true",
+                        help="店舗データを1件ずつ読み込んで書き出し、メモリ使用量を一定に保つ（--mode data のみ、毎回生成）")
+    parser.add_argument("--variants", metavar="FILE",
+                        help="複数のマップをまとめて生成する設定ファイル（JSON、他の生成設定は無視）")
+    parser.add_argument("--workers", type=int, help="--variants の並列生成に使うプロセス数（既定: CPUコア数）")
+    options = parser.parse_args(args)
+
+    if options.lazy_popups and options.mode != "data":
+        parser.error("--lazy-popups は --mode data と一緒に指定してください")
+    if options.stream and options.mode != "data":
+        parser.error("--stream は --mode data と一緒に指定してください")
+
+    if not os.path.exists(options.db):
+        print(f"Error: database '{options.db}' not found")
+        return False
+
+    if options.variants:
+        return _build_variants(options)
+
+    try:
+        from visitor_map import create_visitor_map, visitor_map_fingerprint, is_map_up_to_date
+        from store_manager import StoreManager
+
+        database.DATABASE_FILE = options.db
+        database.migrate_database()
+
+        map_options = dict(center=options.center, zoom_start=options.zoom, mode=options.mode, cluster=options.cluster,
+                           lazy_popups=options.lazy_popups, asset_dir=options.assets, tile_dir=options.tiles)
+        start = time.perf_counter()
+        if options.stream:
+            # 店舗データは書き出しながら読み込む
+            stores = _CountingIterator(StoreManager().iter_stores_for_display())
+        else:
+            stores = StoreManager().get_stores_for_display()
+        loaded = time.perf_counter()
+        # 前回の生成から変わっていなければ生成しない（ストリーミング出力は毎回生成）
+        skipped = (not options.force and not options.stream
+                   and is_map_up_to_date(options.output, visitor_map_fingerprint(stores, **map_options)))
+        if not skipped:
+            create_visitor_map(options.output, stores=stores, force=True, stream=options.stream, **map_options)
+        finished = time.perf_counter()
+    except ImportError as e:
+        print(f"Error: Required library not found - {e}")
+        return False
+    except Exception as e:
+        print(f"Error occurred while building map: {e}")
+        return False
+
+    if skipped:
+        print(f"'{options.output}' is up to date with {len(stores)} stores, skipped "
+              f"(checked in {(finished - start) * 1000:.0f} ms, use --force to rebuild)")
+        return True
+    print(f"Built '{options.output}' with {len(stores)} stores in {(finished - start) * 1000:.0f} ms "
+          f"(load {(loaded - start) * 1000:.0f} ms, render {(finished - loaded) * 1000:.0f} ms)")
+    return True
+
+def _build_variants(options):
+    """設定ファイルに記述した複数のマップをまとめて生成"""
+    import json
+    import time
+    import database
+
+    try:
+        with open(options.variants, encoding='utf-8') as f:
+            variants = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Error: could not read variants file '{options.variants}' - {e}")
+        return False
+    if options.force:
+        variants = [dict(variant, force=True) for variant in variants]
+
+    try:
+        from visitor_map import create_map_variants
+        from store_manager import StoreManager
+
+        database.DATABASE_FILE = options.db
+        database.migrate_database()
+
+        start = time.perf_counter()
+        stores = StoreManager().get_stores_for_display()
+        loaded = time.perf_counter()
+        results = create_map_variants(variants, stores=stores, max_workers=options.workers)
+        finished = time.perf_counter()
+    except ImportError as e:
+        print(f"Error: Required library not found - {e}")
+        return False
+    except Exception as e:
+        print(f"Error occurred while building maps: {e}")
+        return False
+
+    for output_file, store_count, elapsed in results:
+        print(f"  {output_file}: {store_count} stores, {elapsed * 1000:.0f} ms")
+    print(f"Built {len(results)} maps from {len(stores)} stores in {(finished - start) * 1000:.0f} ms "
+          f"(load {(loaded - start) * 1000:.0f} ms, render {(finished - loaded) * 1000:.0f} ms)")
+    return True
+
+def _parse_bbox(text):
+    """'南,西,北,東' 形式の範囲を (south, west, north, east) に変換"""
+    import argparse
+    try:
+        south, west, north, east = (float(value) for value in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'南,西,北,東' の形式で指定してください: {text}")
+    if south >= north or west >= east:
+        raise argparse.ArgumentTypeError(f"南 < 北、西 < 東 となるように指定してください: {text}")
+    return south, west, north, east
+
+def _parse_zooms(text):
+    """'15-19' または '17' 形式のズームレベルを range に変換"""
+    import argparse
+    try:
+        first, _, last = text.partition("-")
+        zooms = range(int(first), int(last or first) + 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'15-19' の形式で指定してください: {text}")
+    if not zooms:
+        raise argparse.ArgumentTypeError(f"'最小-最大' の順に指定してください: {text}")
+    if zooms.start < 0 or zooms.stop > 23:
+        raise argparse.ArgumentTypeError(f"ズームレベルは0から22の間で指定してください: {text}")
+    return zooms
+
+def run_tiles(args):
+    """会場周辺の地図タイルをキャッシュに保存"""
+    import argparse
+    from tile_cache import (seed_tiles, import_mbtiles, tiles_in_bbox,
+                            VENUE_BBOX, SEED_ZOOMS, DEFAULT_TILE_DIR, OSM_TILE_URL, REQUEST_INTERVAL)
+
+    parser = argparse.ArgumentParser(prog="python main.py tiles", description="地図タイルの事前保存")
+    parser.add_argument("--bbox", type=_parse_bbox, default=VENUE_BBOX, help="保存する範囲（南,西,北,東）")
+    parser.add_argument("--zooms", type=_parse_zooms, default=SEED_ZOOMS, help="保存するズームレベル（例: 15-19）")
+    parser.add_argument("--dir", default=DEFAULT_TILE_DIR, help="タイルを保存するフォルダ")
+    parser.add_argument("--url", default=OSM_TILE_URL, help="タイルサーバーのURL（{z} {x} {y} を含む）")
+    parser.add_argument("--delay", type=float, default=REQUEST_INTERVAL, help="ダウンロードの間隔（秒）")
+    parser.add_argument("--mbtiles", help="ダウンロードの代わりにこの MBTiles ファイルから取り込む")
+    options = parser.parse_args(args)
+    if options.delay < 0:
+        parser.error("--delay は0以上で指定してください")
+    try:
+        options.url.format(z=0, x=0, y=0)
+    except (KeyError, IndexError, ValueError) as e:
+        parser.error(f"--url に使えるのは {{z}} {{x}} {{y}} だけです: {options.url} ({e!r})")
+
+    if options.mbtiles:
+        if not os.path.exists(options.mbtiles):
+            print(f"Error: MBTiles file '{options.mbtiles}' not found")
+            return False
+        try:
+            count = import_mbtiles(options.mbtiles, options.dir, options.bbox, options.zooms)
+        except Exception as e:
+            print(f"Error occurred while importing tiles: {e}")
+            return False
+        print(f"Imported {count} tiles into '{options.dir}'")
+        return count > 0
+
+    total = len(list(tiles_in_bbox(*options.bbox, zooms=options.zooms)))
+    print(f"Seeding {total} tiles (zoom {options.zooms.start}-{options.zooms.stop - 1}) into '{options.dir}'...")
+    result = seed_tiles(
+        options.bbox, options.zooms, options.dir, options.url, delay=options.delay,
+        progress=lambda done, total: print(f"\r{done}/{total} tiles", end="", flush=True)
+    )
+    print()
+    for zoom, x, y, message in result['errors'][:10]:
+        print(f"Tile {zoom}/{x}/{y}: {message}")
+    print(f"{result['downloaded']} downloaded, {result['skipped']} already cached, {len(result['errors'])} errors")
+    return not result['errors']
+
+def run_serve(args):
+    """来場者向けマップをHTTPで配信"""
+    import argparse
+    import sqlite3
+    import database
+    from visitor_map import MAP_MODES
+    from map_server import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_SITE_DIR
+
+    parser = argparse.ArgumentParser(prog="python main.py serve", description="来場者向けマップの配信")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="待ち受けるアドレス")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="待ち受けるポート")
+    parser.add_argument("--site", default=DEFAULT_SITE_DIR, help="マップを生成して配信するフォルダ")
+    parser.add_argument("--db", default=database.DATABASE_FILE, help="店舗データを読み込むデータベースファイル")
+    parser.add_argument("--mode", choices=MAP_MODES, default="data",
+                        help="markers: 店舗ごとにマーカーを出力 / data: 店舗データを1つの配列で出力（大規模向け）")
+    parser.add_argument("--cluster", action="store_true", help="近くの店舗マーカーをズームに応じてまとめて表示")
+    parser.add_argument("--lazy-popups", action="store_true",
+                        help="商品データを別ファイルで配信し、ポップアップを開いたときに読み込む（--mode data のみ）")
+    parser.add_argument("--assets", action="store_true", help="CDN の JS/CSS を公開用フォルダの static/ から配信する")
+    options = parser.parse_args(args)
+
+    if options.lazy_popups and options.mode != "data":
+        parser.error("--lazy-popups は --mode data と一緒に指定してください")
+    if not os.path.exists(options.db):
+        print(f"Error: database '{options.db}' not found")
+        return False
+
+    try:
+        from map_server import serve
+
+        database.DATABASE_FILE = options.db
+        database.migrate_database()
+
+        print("=== Festival Store Map - Server ===")
+        return serve(options.host, options.port, options.site, assets=options.assets,
+                     mode=options.mode, cluster=options.cluster, lazy_popups=options.lazy_popups)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: could not start server - {e}")
+        return False
+
 def main():
     # 引数をチェック
     if len(sys.argv) > 1:
@@ -77,6 +398,14 @@ def main():
             run_admin_app()
         elif mode == "visitor":
             run_visitor_map()
+        elif mode == "build":
+            sys.exit(0 if run_build(sys.argv[2:]) else 1)
+        elif mode == "import":
+            sys.exit(0 if run_import(sys.argv[2:]) else 1)
+        elif mode == "tiles":
+            sys.exit(0 if run_tiles(sys.argv[2:]) else 1)
+        elif mode == "serve":
+            sys.exit(0 if run_serve(sys.argv[2:]) else 1)
         else:
             print(f"Unknown option: {mode}")
             show_usage()
@@ -0,0 +1,166 @@
+"""
+地図ページのスクリプト・スタイルシートのローカル配信
+
+Folium が CDN から読み込む JS/CSS のうち、地図で使うものだけをダウンロードし、
+内容のハッシュ値を付けたファイル名（例: leaflet.3f2a9c1b7d4e.js）で静的ファイル用フォルダに保存します。
+ファイル名が内容ごとに変わるため、配信側で長期間キャッシュさせても古いファイルが使われることはありません。
+
+一度ダウンロードしたファイルはフォルダ内の manifest.json に記録され、
+次回以降はネットワークに接続できない会場でもそのまま利用できます。
+"""
+
+import os
+import re
+import json
+import hashlib
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_ASSET_DIR = "static"
+MANIFEST_FILE = "manifest.json"
+
+# 生成するマップでは使わないライブラリ（ポップアップは独自のスタイルで表示）
+UNUSED_ASSETS = {'bootstrap', 'bootstrap_css'}
+
+# CSS 内の url(...) 参照（フォント・画像）
+CSS_URL_PATTERN = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)')
+
+
+def _iter_elements(element):
+    """要素とその子要素をすべて順に返す"""
+    yield element
+    for child in element._children.values():
+        yield from _iter_elements(child)
+
+
+def _unused_asset_names(m):
+    """地図の内容から読み込み不要なライブラリ名を判定"""
+    import folium
+
+    unused = set(UNUSED_ASSETS)
+    elements = list(_iter_elements(m))
+    # folium のポップアップは jQuery で HTML を組み立てる
+    if not any(isinstance(element, folium.Popup) for element in elements):
+        unused.add('jquery')
+    if not any(isinstance(element, folium.Icon) and element.options.get('prefix') == 'glyphicon'
+               for element in elements):
+        unused.add('glyphicons_css')
+    return unused
+
+
+def collect_assets(m):
+    """
+    地図が読み込む JS/CSS を [(名前, URL), ...] で返す（使わないライブラリは除く）
+
+    Returns:
+        tuple: (JSのリスト, CSSのリスト)
+    """
+    unused = _unused_asset_names(m)
+    js, css = {}, {}
+    for element in _iter_elements(m):
+        for name, url in getattr(element, 'default_js', ()):
+            if name not in unused:
+                js.setdefault(name, url)
+        for name, url in getattr(element, 'default_css', ()):
+            if name not in unused:
+                css.setdefault(name, url)
+    return list(js.items()), list(css.items())
+
+
+def _fetch(url):
+    """URL の内容をダウンロード"""
+    from urllib.request import urlopen
+    with urlopen(url, timeout=30) as response:
+        return response.read()
+
+
+def load_manifest(asset_dir):
+    """ダウンロード済みファイルの対応表 {URL: ファイル名} を読み込む"""
+    try:
+        with open(os.path.join(asset_dir, MANIFEST_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(asset_dir, manifest):
+    with open(os.path.join(asset_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _hashed_name(url, data):
+    """URL のファイル名に内容のハッシュ値を付けたファイル名"""
+    basename = os.path.basename(urlsplit(url).path) or 'asset'
+    stem, extension = os.path.splitext(basename)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{extension}"
+
+
+def _rewrite_css_urls(css, base_url, asset_dir, manifest, fetch):
+    """CSS が参照するフォント・画像も保存し、参照先を保存したファイル名に置き換える"""
+    def replace(match):
+        reference = match.group(2).strip()
+        if reference.startswith(('data:', '#')):
+            return match.group(0)
+        # 'font.woff2?v=6.2.0#iefix' のようなクエリ・フラグメントは取り除いて保存
+        parts = urlsplit(urljoin(base_url, reference))
+        suffix = f"#{parts.fragment}" if parts.fragment else ""
+        filename = vendor_asset(parts._replace(query='', fragment='').geturl(), asset_dir, manifest, fetch)
+        return f'url("{filename}{suffix}")'
+
+    return CSS_URL_PATTERN.sub(replace, css)
+
+
+def vendor_asset(url, asset_dir, manifest, fetch=_fetch):
+    """
+    URL のファイルを asset_dir に保存してファイル名を返す（保存済みならダウンロードしない）
+    CSS の場合は参照しているフォント・画像も同じフォルダに保存する
+    """
+    filename = manifest.get(url)
+    if filename and os.path.exists(os.path.join(asset_dir, filename)):
+        return filename
+
+    data = fetch(url)
+    if urlsplit(url).path.endswith('.css'):
+        css = data.decode('utf-8')
+        data = _rewrite_css_urls(css, url, asset_dir, manifest, fetch).encode('utf-8')
+
+    filename = _hashed_name(url, data)
+    with open(os.path.join(asset_dir, filename), 'wb') as f:
+        f.write(data)
+    manifest[url] = filename
+    return filename
+
+
+def bundle_map_assets(m, asset_dir, asset_url, fetch=None):
+    """
+    地図が読み込む JS/CSS をローカルのファイルに置き換える（使わないライブラリは読み込まない）
+
+    Args:
+        m: folium.Map
+        asset_dir: ファイルを保存するフォルダ
+        asset_url: HTML から asset_dir を参照するURL（相対パス可）
+        fetch: URL の内容を返す関数（省略時は urllib でダウンロード）
+
+    Returns:
+        list: 保存したファイル名
+    """
+    fetch = fetch or _fetch
+    os.makedirs(asset_dir, exist_ok=True)
+    manifest = load_manifest(asset_dir)
+    js, css = collect_assets(m)
+
+    local_urls = {}
+    try:
+        for name, url in js + css:
+            local_urls[name] = f"{asset_url.rstrip('/')}/{vendor_asset(url, asset_dir, manifest, fetch)}"
+    finally:
+        # 途中で失敗してもダウンロード済みのファイルは次回に再利用する
+        _save_manifest(asset_dir, manifest)
+
+    # folium はクラス変数の一覧を使うため、要素ごとに上書きする
+    for element in _iter_elements(m):
+        if hasattr(element, 'default_js'):
+            element.default_js = [(name, local_urls[name]) for name, _ in element.default_js if name in local_urls]
+        if hasattr(element, 'default_css'):
+            element.default_css = [(name, local_urls[name]) for name, _ in element.default_css if name in local_urls]
+
+    return sorted(set(manifest[url] for _, url in js + css))
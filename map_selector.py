@@ -137,11 +137,15 @@ class MapSelector:
             temp_fd, self.temp_coords_path = tempfile.mkstemp(suffix='.json')
             os.close(temp_fd)
             
-            # ユニークIDを生成（キャッシュ回避）
+            # ユニークIDを生成（画面ごとのファイル名に使用。Leaflet はブラウザのキャッシュを利用する）
             import time
             unique_id = str(int(time.time() * 1000))
             print(f"生成されたユニークID: {unique_id}")
             
+            # 地図タイルはキャッシュがあればキャッシュから読み込む
+            from tile_cache import tile_layer_url
+            tile_url = tile_layer_url()
+            
             # HTMLテンプレートを作成
             html_content = f'''<!DOCTYPE html>
 <html>
@@ -149,7 +153,7 @@ class MapSelector:
     <meta charset="utf-8" />
     <title>店舗位置選択 - {unique_id}</title>
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css?v={unique_id}" />
+    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
     <style>
         body {{ margin: 0; padding: 0; font-family: Arial, sans-serif; }}
         #map {{ height: 100vh; width: 100%; }}
@@ -183,7 +187,7 @@ class MapSelector:
         <div class="status" id="status">マップをクリックして位置を選択...</div>
     </div>
 
-    <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js?v={unique_id}"></script>
+    <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
     <script>
         console.log('地図選択画面が読み込まれました - {unique_id}');
         
@@ -191,8 +195,8 @@ class MapSelector:
         var morioka = [39.7033, 141.1436];
         var map = L.map('map').setView(morioka, 17);
         
-        // OpenStreetMapタイルレイヤーを追加
-        L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{
+        // OpenStreetMapタイルレイヤーを追加（キャッシュがあればキャッシュから読み込む）
+        L.tileLayer('{tile_url}', {{
             attribution: '© OpenStreetMap contributors',
             maxZoom: 19,
             maxNativeZoom: 18
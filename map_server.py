@@ -0,0 +1,356 @@
+"""
+来場者向けマップの配信サーバー
+
+公開用フォルダ（既定: public/）に来場者向けマップを生成し、HTTP で配信します。
+
+  public/index.html             来場者向けマップ
+  public/index.products.json    ポップアップ用の商品データ（lazy_popups の場合）
+  public/static/                JS/CSS（assets を指定した場合）
+  public/tiles/                 地図タイル（python main.py tiles --dir public/tiles で保存した場合）
+  /changes?since=<revision>     変更フィード（"data" モードのマップが定期的に取得してマーカーを更新）
+
+- ファイルの内容は圧縮済み（gzip、brotli がインストールされていれば brotli も）のものをメモリに保持
+- 内容のハッシュ値による ETag を付け、変更がなければ 304 を返す
+- データベースの変更を監視し、変更があったときだけマップを再生成
+- 1リクエスト1スレッドで処理し、複数の来場者からの同時アクセスに対応
+"""
+
+import os
+import json
+import gzip
+import time
+import hashlib
+import threading
+import mimetypes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, unquote, parse_qs
+import database
+
+try:
+    import brotli  # 任意（pip install brotli）
+except ImportError:
+    brotli = None
+
+DEFAULT_SITE_DIR = "public"
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 8000
+INDEX_FILE = "index.html"
+CHANGES_PATH = "changes"
+
+# データベースの変更を確認する間隔（秒）
+WATCH_INTERVAL = 1.0
+
+# 圧縮して配信するファイルの種類と最小サイズ
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 1024
+
+# Cache-Control（マップ本体は毎回 ETag で確認、ハッシュ値付きのファイル名は長期間キャッシュ）
+CACHE_REVALIDATE = "no-cache"
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+CACHE_TILES = "public, max-age=86400"
+
+# 配信しないファイル
+HIDDEN_SUFFIXES = ('.fingerprint', '.tmp')
+
+
+class _CachedResponse:
+    """配信用にメモリに保持した応答の内容（圧縮済みのものを含む）"""
+
+    def __init__(self, body, content_type, key=None):
+        self.key = key
+        self.content_type = content_type
+        if self.content_type.startswith('text/') or self.content_type == 'application/javascript':
+            self.content_type += '; charset=utf-8'
+
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        # 強い ETag はエンコーディングごとに別の値にする
+        self.variants = {'identity': (body, f'"{digest}"')}
+        if len(body) >= MIN_COMPRESS_SIZE and self.content_type.startswith(COMPRESSIBLE_TYPES):
+            self.variants['gzip'] = (gzip.compress(body, 6), f'"{digest}-gzip"')
+            if brotli is not None:
+                self.variants['br'] = (brotli.compress(body), f'"{digest}-br"')
+
+    def choose(self, accept_encoding):
+        """Accept-Encoding に応じて (エンコーディング, 内容, ETag) を返す"""
+        accepted = {part.split(';')[0].strip().lower() for part in accept_encoding.split(',')}
+        for encoding in ('br', 'gzip'):
+            if encoding in accepted and encoding in self.variants:
+                return (encoding,) + self.variants[encoding]
+        return ('identity',) + self.variants['identity']
+
+
+def _load_file(path, stat):
+    """ファイルを読み込んで配信用の内容を作成（更新の判定に inode・更新時刻・サイズを使う）"""
+    with open(path, 'rb') as f:
+        body = f.read()
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    return _CachedResponse(body, content_type, key=(stat.st_ino, stat.st_mtime_ns, stat.st_size))
+
+
+class MapServer(ThreadingHTTPServer):
+    """来場者向けマップを生成・配信する HTTP サーバー"""
+
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, address, site_dir=DEFAULT_SITE_DIR, map_options=None, watch_interval=WATCH_INTERVAL):
+        """
+        Args:
+            address: (ホスト, ポート)
+            site_dir: 公開用フォルダ
+            map_options: create_visitor_map に渡す設定（mode, cluster, lazy_popups など）
+        """
+        super().__init__(address, MapRequestHandler)
+        # リクエストのパスは realpath で解決するため、公開用フォルダもシンボリックリンクを解決しておく
+        self.site_dir = os.path.realpath(site_dir)
+        self.map_options = dict(map_options or {})
+        self.watch_interval = watch_interval
+        self.build_lock = threading.Lock()
+        self.cache_lock = threading.Lock()
+        self.cache = {}
+        self.revision = 0
+        self.changes_cache = (None, {})
+        self.stop_event = threading.Event()
+        self.ready = threading.Event()
+        self.watcher = None
+
+    @property
+    def map_file(self):
+        return os.path.join(self.site_dir, INDEX_FILE)
+
+    def build(self):
+        """マップを生成（店舗データと設定に変更がなければ create_visitor_map がスキップする）"""
+        from visitor_map import create_visitor_map
+        from store_manager import StoreManager
+
+        with self.build_lock:
+            os.makedirs(self.site_dir, exist_ok=True)
+            # 店舗データより先にリビジョンを取得（この間の変更は変更フィードで反映される）
+            revision = database.get_current_revision()
+            stores = StoreManager().get_stores_for_display()
+            options = dict(self.map_options)
+            if options.get('mode') == 'data':
+                options.update(changes_url=CHANGES_PATH, revision=revision)
+            create_visitor_map(self.map_file, stores=stores, **options)
+
+    def _data_version(self):
+        # 他の接続（運営者画面など）がコミットするたびに値が変わる
+        return database.get_connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def _watch(self):
+        """マップを生成し、以降はデータベースの変更を監視して変更があれば再生成"""
+        version = None
+        while True:
+            try:
+                current = self._data_version()
+                if current != version:
+                    self.revision = database.get_current_revision()
+                    self.build()
+                    # 生成に失敗した場合は次の確認時に再度生成する
+                    version = current
+            except Exception as e:
+                print(f"Error occurred while building map: {e}")
+            self.ready.set()
+            if self.stop_event.wait(self.watch_interval):
+                break
+        database.close_connection()
+
+    def start_watching(self):
+        """監視スレッドを開始し、最初のマップ生成が終わるまで待つ"""
+        self.watcher = threading.Thread(target=self._watch, name="map-watcher", daemon=True)
+        self.watcher.start()
+        self.ready.wait()
+        return os.path.exists(self.map_file)
+
+    def server_close(self):
+        self.stop_event.set()
+        if self.watcher:
+            self.watcher.join()
+        super().server_close()
+
+    def resolve(self, url_path):
+        """URL のパスを公開用フォルダ内のファイルパスに変換（フォルダ外・非公開のファイルは None）"""
+        relative = unquote(url_path).lstrip('/') or INDEX_FILE
+        try:
+            path = os.path.realpath(os.path.join(self.site_dir, relative))
+            # Windows では別のドライブのパスを比較すると ValueError になる
+            inside = os.path.commonpath([path, self.site_dir]) == self.site_dir
+        except ValueError:
+            # "%00" などファイル名に使えない文字を含む場合
+            return None
+        if not inside or path.endswith(HIDDEN_SUFFIXES):
+            return None
+        return path
+
+    def get_file(self, path):
+        """ファイルの内容を返す（更新されていなければメモリに保持した内容を使う）"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not os.path.isfile(path):
+            return None
+
+        with self.cache_lock:
+            cached = self.cache.get(path)
+        if cached and cached.key == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return cached
+
+        cached = _load_file(path, stat)
+        with self.cache_lock:
+            self.cache[path] = cached
+        return cached
+
+    def get_changes(self, since):
+        """
+        リビジョン since より後の変更を JSON で返す
+        同じ since への応答は次の変更まで使い回す（同じページを開いている来場者は同じ since で問い合わせる）
+        """
+        from visitor_map import store_records
+
+        revision = self.revision
+        if since >= revision:
+            return _CachedResponse(
+                json.dumps({'revision': revision, 'stores': [], 'deleted': []}).encode('utf-8'), 'application/json'
+            )
+
+        with self.cache_lock:
+            cached_revision, responses = self.changes_cache
+            cached = responses.get(since) if cached_revision == revision else None
+        if cached:
+            return cached
+
+        try:
+            changes = database.get_changes_since(since)
+        finally:
+            # 処理スレッドはリクエストごとに作られるため接続を残さない
+            database.close_connection()
+        body = json.dumps({
+            'revision': changes['revision'],
+            'stores': store_records(changes['stores']),
+            'deleted': changes['deleted'],
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        cached = _CachedResponse(body, 'application/json')
+
+        with self.cache_lock:
+            if self.changes_cache[0] != revision:
+                self.changes_cache = (revision, {})
+            self.changes_cache[1][since] = cached
+        return cached
+
+    def cache_control(self, path):
+        relative = os.path.relpath(path, self.site_dir).replace(os.sep, '/')
+        if relative.startswith('static/'):
+            return CACHE_IMMUTABLE
+        if relative.startswith('tiles/'):
+            return CACHE_TILES
+        return CACHE_REVALIDATE
+
+
+class MapRequestHandler(BaseHTTPRequestHandler):
+    """公開用フォルダのファイルを ETag・圧縮付きで返す"""
+
+    protocol_version = "HTTP/1.1"
+    server_version = "FestivalMap/1.0"
+
+    def do_GET(self):
+        self._dispatch(include_body=True)
+
+    def do_HEAD(self):
+        self._dispatch(include_body=False)
+
+    def _dispatch(self, include_body):
+        url = urlsplit(self.path)
+        if url.path == '/' + CHANGES_PATH:
+            self._send_changes(parse_qs(url.query), include_body)
+            return
+
+        path = self.server.resolve(url.path)
+        cached = self.server.get_file(path) if path else None
+        if cached is None:
+            self.send_error(404)
+            return
+        self._send_cached(cached, self.server.cache_control(path), include_body)
+
+    def _send_changes(self, query, include_body):
+        try:
+            since = int(query.get('since', ['0'])[0])
+        except ValueError:
+            self.send_error(400, "since must be an integer")
+            return
+        try:
+            cached = self.server.get_changes(since)
+        except Exception as e:
+            self.send_error(500, str(e))
+            return
+        self._send_cached(cached, "no-store", include_body)
+
+    def _send_cached(self, cached, cache_control, include_body):
+        encoding, body, etag = cached.choose(self.headers.get('Accept-Encoding', ''))
+        if_none_match = self.headers.get('If-None-Match', '')
+        not_modified = if_none_match.strip() == '*' or etag in (tag.strip() for tag in if_none_match.split(','))
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', cache_control)
+        if len(cached.variants) > 1:
+            self.send_header('Vary', 'Accept-Encoding')
+        if not_modified:
+            self.end_headers()
+            return
+
+        self.send_header('Content-Type', cached.content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if encoding != 'identity':
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        if include_body:
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 大量のアクセスで出力が埋まらないよう、エラーのみ表示
+        pass
+
+    def log_error(self, format, *args):
+        super().log_message(format, *args)
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, site_dir=DEFAULT_SITE_DIR, assets=False, **map_options):
+    """
+    マップを生成して配信を開始（Ctrl+C で終了）
+
+    Args:
+        assets: True の場合は JS/CSS を公開用フォルダの static/ に保存して配信
+        map_options: create_visitor_map に渡す設定（mode, cluster, lazy_popups など）
+
+    Returns:
+        bool: 最初のマップ生成に失敗した場合は False
+    """
+    from tile_cache import has_tiles
+
+    if assets:
+        map_options['asset_dir'] = os.path.join(site_dir, 'static')
+    if has_tiles(os.path.join(site_dir, 'tiles')):
+        map_options['tile_dir'] = os.path.join(site_dir, 'tiles')
+
+    server = MapServer((host, port), site_dir, map_options)
+    start = time.perf_counter()
+    if not server.start_watching():
+        server.server_close()
+        return False
+    print(f"Map ready in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    print(f"Serving '{server.site_dir}' at http://{host}:{server.server_address[1]}/ (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping server...")
+    finally:
+        server.server_close()
+    return True
+
+
+if __name__ == "__main__":
+    from database import init_database
+    init_database()
+    serve(mode="data")
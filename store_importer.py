@@ -0,0 +1,226 @@
+"""
+店舗データ一括インポート
+
+CSV / JSON / JSON Lines ファイルから店舗と商品を読み込み、
+一定件数ごとに1トランザクションでデータベースへ登録します。
+
+CSVの列（1行目はヘッダー、日本語の列名も可）:
+  name(店舗名), latitude(緯度), longitude(経度), description(説明), products(商品)
+  products は「商品名:価格」を改行または ; で区切って記述
+  例: たこ焼き屋台,39.7035,141.1438,大阪風,たこ焼き:400;イカ焼き:300
+
+JSON は店舗オブジェクトの配列、JSON Lines は1行に1店舗のオブジェクト
+  products は [{"name": "たこ焼き", "price": 400}, ...] または CSV と同じ文字列
+"""
+
+import csv
+import json
+import os
+import sqlite3
+from database import add_stores_bulk, add_store_with_products
+from store_manager import StoreManager
+
+DEFAULT_BATCH_SIZE = 500
+
+# 列名の別名（スプレッドシートの日本語ヘッダー対応）
+COLUMN_ALIASES = {
+    'name': 'name', '店舗名': 'name',
+    'latitude': 'latitude', 'lat': 'latitude', '緯度': 'latitude',
+    'longitude': 'longitude', 'lng': 'longitude', 'lon': 'longitude', '経度': 'longitude',
+    'description': 'description', '説明': 'description', '店舗説明': 'description',
+    'products': 'products', '商品': 'products', '商品情報': 'products',
+}
+
+
+def _normalize_keys(row):
+    """行の列名を正規化（未知の列は無視）"""
+    normalized = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        column = COLUMN_ALIASES.get(key.strip().lower())
+        if column:
+            normalized[column] = value
+    return normalized
+
+
+def _parse_coordinate(value, label, minimum, maximum):
+    """座標値を検証して float に変換"""
+    try:
+        coordinate = float(str(value).strip())
+    except (TypeError, ValueError):
+        raise ValueError(f"{label}が数値ではありません: {value!r}")
+    if not (minimum <= coordinate <= maximum):
+        raise ValueError(f"{label}は{minimum}から{maximum}の間で入力してください: {coordinate}")
+    return coordinate
+
+
+def _parse_products(value, store_manager):
+    """商品欄を商品リストに変換（不正な商品があれば ValueError）"""
+    if value is None or value == "":
+        return []
+
+    if isinstance(value, list):
+        products = []
+        for item in value:
+            if isinstance(item, str):
+                products.append(store_manager.parse_product_line(item))
+                continue
+            if not isinstance(item, dict):
+                raise ValueError(f"商品の形式が不正です: {item!r}")
+            name = str(item.get('name', '')).strip()
+            if not name:
+                raise ValueError(f"商品名が空です: {item!r}")
+            try:
+                price = int(str(item.get('price')).strip().replace('円', ''))
+            except ValueError:
+                raise ValueError(f"価格が整数ではありません: {item!r}")
+            products.append({"name": name, "price": price})
+    else:
+        products = []
+        for line in str(value).replace(';', '\n').split('\n'):
+            if not line.strip():
+                continue
+            products.append(store_manager.parse_product_line(line))
+
+    for product in products:
+        if product['price'] < 0:
+            raise ValueError(f"価格が負の値です: {product['name']}")
+    return products
+
+
+def validate_row(row, store_manager=None):
+    """
+    1行分のデータを検証して店舗データに変換
+    不正な値がある場合は ValueError を送出
+    """
+    store_manager = store_manager or StoreManager()
+    row = _normalize_keys(row)
+
+    name = str(row.get('name') or '').strip()
+    if not name:
+        raise ValueError("店舗名が空です")
+
+    return {
+        'name': name,
+        'latitude': _parse_coordinate(row.get('latitude'), "緯度", -90, 90),
+        'longitude': _parse_coordinate(row.get('longitude'), "経度", -180, 180),
+        'description': str(row.get('description') or '').strip(),
+        'products': _parse_products(row.get('products'), store_manager),
+    }
+
+
+def iter_rows(file_path, encoding='utf-8-sig'):
+    """
+    ファイルから (行番号, 行データ) を順に読み出す
+    CSV と JSON Lines は1行ずつストリーミングで読み込む
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension == '.csv':
+        with open(file_path, newline='', encoding=encoding) as f:
+            # 行番号はスプレッドシート上の行（ヘッダーが1行目）
+            for row_number, row in enumerate(csv.DictReader(f), start=2):
+                yield row_number, row
+    elif extension in ('.jsonl', '.ndjson'):
+        with open(file_path, encoding=encoding) as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield line_number, e
+    elif extension == '.json':
+        with open(file_path, encoding=encoding) as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('stores', [])
+        if not isinstance(data, list):
+            raise ValueError('JSONファイルは店舗の配列、または {"stores": [...]} の形式にしてください')
+        for index, row in enumerate(data, start=1):
+            yield index, row
+    else:
+        raise ValueError(f"未対応のファイル形式です: {extension}（.csv / .json / .jsonl）")
+
+
+def _flush_batch(batch, result):
+    """バッチを1トランザクションで登録（失敗時は1件ずつ登録して原因行を特定）"""
+    if not batch:
+        return
+    try:
+        add_stores_bulk([store for _, store in batch])
+        result['imported'] += len(batch)
+    except sqlite3.Error:
+        for row_number, store in batch:
+            try:
+                add_store_with_products(
+                    store['name'], store['latitude'], store['longitude'],
+                    store['products'], store['description']
+                )
+                result['imported'] += 1
+            except sqlite3.Error as e:
+                result['errors'].append((row_number, f"データベースエラー: {e}"))
+    batch.clear()
+
+
+def import_stores(file_path, batch_size=DEFAULT_BATCH_SIZE, encoding='utf-8-sig', progress=None):
+    """
+    ファイルから店舗を一括インポート
+    不正な行はスキップしてエラーとして記録し、残りの行の取り込みを続ける
+
+    Args:
+        progress: バッチ登録ごとに呼ばれる関数 progress(processed, imported, error_count)
+
+    Returns:
+        dict: {'processed': 行数, 'imported': 登録件数, 'errors': [(行番号, メッセージ), ...]}
+    """
+    store_manager = StoreManager()
+    result = {'processed': 0, 'imported': 0, 'errors': []}
+    batch = []
+
+    for row_number, row in iter_rows(file_path, encoding):
+        result['processed'] += 1
+        try:
+            if isinstance(row, Exception):
+                raise ValueError(f"JSONの解析に失敗しました: {row}")
+            if not isinstance(row, dict):
+                raise ValueError("店舗データがオブジェクト形式ではありません")
+            batch.append((row_number, validate_row(row, store_manager)))
+        except ValueError as e:
+            result['errors'].append((row_number, str(e)))
+
+        if len(batch) >= batch_size:
+            _flush_batch(batch, result)
+            if progress:
+                progress(result['processed'], result['imported'], len(result['errors']))
+
+    _flush_batch(batch, result)
+    if progress:
+        progress(result['processed'], result['imported'], len(result['errors']))
+
+    return result
+
+
+def write_error_log(errors, log_path):
+    """行ごとのエラーをログファイルに書き出す"""
+    with open(log_path, 'w', encoding='utf-8') as f:
+        for row_number, message in errors:
+            f.write(f"{row_number}\t{message}\n")
+
+
+if __name__ == "__main__":
+    import sys
+    from database import init_database
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    init_database()
+    result = import_stores(
+        sys.argv[1],
+        progress=lambda processed, imported, errors: print(f"{processed} rows processed, {imported} imported, {errors} errors")
+    )
+    for row_number, message in result['errors']:
+        print(f"Row {row_number}: {message}")
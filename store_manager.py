@@ -1,4 +1,4 @@
-from database import add_store, add_product, get_all_stores, delete_store
+from database import add_store_with_products, update_store_with_products, get_all_stores, iter_stores, delete_store
 
 class StoreManager:
     """店舗管理クラス"""
@@ -12,41 +12,52 @@ class StoreManager:
         products_data: [{"name": "商品名", "price": 価格}, ...]
         """
         try:
-            # 店舗を追加
-            store_id = add_store(store_name, latitude, longitude, description)
-            
-            # 商品を追加
-            for product in products_data:
-                add_product(store_id, product["name"], product["price"])
+            # 店舗と商品を1トランザクションで追加
+            store_id = add_store_with_products(store_name, latitude, longitude, products_data, description)
             
             return store_id, "店舗が正常に登録されました"
         
         except Exception as e:
             return None, f"店舗登録中にエラーが発生しました: {str(e)}"
     
+    def update_store_with_products(self, store_id, store_name, latitude, longitude, products_data, description=""):
+        """
+        店舗情報と商品を一括で更新
+        products_data: [{"name": "商品名", "price": 価格}, ...]
+        """
+        try:
+            if update_store_with_products(store_id, store_name, latitude, longitude, products_data, description):
+                return True, f"店舗「{store_name}」の情報を更新しました"
+            return False, "店舗情報の更新に失敗しました"
+        
+        except Exception as e:
+            return False, f"更新中にエラーが発生しました: {str(e)}"
+    
     def get_stores_for_display(self):
         """表示用の店舗データを取得"""
-        stores = get_all_stores()
-        display_stores = []
-        
-        for store in stores:
-            # 商品リストを文字列形式に変換
-            products_text = []
-            for product in store['products']:
-                products_text.append(f"{product['name']}: {product['price']}円")
-            
-            display_store = {
-                'id': store['id'],
-                'name': store['name'],
-                'latitude': store['latitude'],
-                'longitude': store['longitude'],
-                'description': store['description'],
-                'products_text': "\n".join(products_text),
-                'products': store['products']
-            }
-            display_stores.append(display_store)
+        return [self._to_display_store(store) for store in get_all_stores()]
+    
+    def iter_stores_for_display(self):
+        """表示用の店舗データを1件ずつ取得（大量の店舗を順に書き出す場合用）"""
+        for store in iter_stores():
+            yield self._to_display_store(store)
+    
+    def _to_display_store(self, store):
+        """店舗データに表示用の商品リスト文字列を追加"""
+        # 商品リストを文字列形式に変換
+        products_text = []
+        for product in store['products']:
+            products_text.append(f"{product['name']}: {product['price']}円")
         
-        return display_stores
+        return {
+            'id': store['id'],
+            'name': store['name'],
+            'latitude': store['latitude'],
+            'longitude': store['longitude'],
+            'description': store['description'],
+            'products_text': "\n".join(products_text),
+            'products': store['products']
+        }
     
     def remove_store(self, store_id):
         """店舗を削除"""
@@ -56,6 +67,31 @@ class StoreManager:
         except Exception as e:
             return False, f"店舗削除中にエラーが発生しました: {str(e)}"
     
+    def parse_product_line(self, line):
+        """
+        「商品名:価格」形式の1行を商品データに変換
+        入力例: "クレープ:300" または "クレープ:300円"
+        形式が不正な場合は ValueError を送出
+        """
+        line = line.strip()
+        if ':' not in line:
+            raise ValueError(f"「商品名:価格」の形式ではありません: {line}")
+        
+        name, price_str = line.split(':', 1)
+        name = name.strip()
+        if not name:
+            raise ValueError(f"商品名が空です: {line}")
+        
+        try:
+            price = int(price_str.strip().replace('円', ''))
+        except ValueError:
+            raise ValueError(f"価格が整数ではありません: {line}")
+        
+        return {
+            "name": name,
+            "price": price
+        }
+    
     def parse_products_from_text(self, products_text):
         """
         テキストから商品データを解析
@@ -68,12 +104,7 @@ class StoreManager:
             line = line.strip()
             if ':' in line:
                 try:
-                    name, price_str = line.split(':', 1)
-                    price = int(price_str.strip().replace('円', ''))
-                    products.append({
-                        "name": name.strip(),
-                        "price": price
-                    })
+                    products.append(self.parse_product_line(line))
                 except ValueError:
                     continue  # 不正な形式の行は無視
         
@@ -0,0 +1,249 @@
+"""
+database.py のテスト
+
+使用方法:
+  python -m unittest test_database
+"""
+
+import sqlite3
+import unittest
+import contextlib
+import database
+from test_support import DatabaseTestCase
+
+
+class MigrationTest(DatabaseTestCase):
+    """マイグレーションの各ステップが user_version と一緒にコミット・ロールバックされることを確認"""
+
+    def setUp(self):
+        super().setUp()
+        self.original_migrations = list(database.MIGRATIONS)
+
+    def tearDown(self):
+        database.MIGRATIONS[:] = self.original_migrations
+        super().tearDown()
+
+    def _columns(self, table):
+        return [row[1] for row in database.get_connection().execute(f'PRAGMA table_info({table})')]
+
+    def test_failing_step_is_rolled_back(self):
+        self.migrate()
+        version = database.get_schema_version()
+
+        def failing_step(cursor):
+            """途中で失敗するステップ"""
+            cursor.execute('CREATE TABLE half_done (id INTEGER PRIMARY KEY)')
+            cursor.execute('ALTER TABLE stores ADD COLUMN category TEXT')
+            raise RuntimeError("migration failed")
+
+        database.MIGRATIONS.append(failing_step)
+        with self.assertRaises(RuntimeError):
+            self.migrate()
+
+        self.assertEqual(database.get_schema_version(), version)
+        self.assertEqual(self._columns('half_done'), [])
+        self.assertNotIn('category', self._columns('stores'))
+        self.assertFalse(database.get_connection().in_transaction)
+
+    def test_steps_can_be_run_again(self):
+        self.migrate()
+        with database.transaction() as cursor:
+            for step in database.MIGRATIONS:
+                with contextlib.redirect_stdout(None):
+                    step(cursor)
+        self.assertIn('position', self._columns('products'))
+
+    def test_step_can_be_retried_after_failure(self):
+        self.migrate()
+        version = database.get_schema_version()
+        attempts = []
+
+        def add_category(cursor):
+            """店舗にカテゴリ列を追加（初回のみ失敗）"""
+            cursor.execute('ALTER TABLE stores ADD COLUMN category TEXT')
+            attempts.append(True)
+            if len(attempts) == 1:
+                raise sqlite3.OperationalError("interrupted")
+
+        database.MIGRATIONS.append(add_category)
+        with self.assertRaises(sqlite3.OperationalError):
+            self.migrate()
+        self.assertEqual(self.migrate(), 1)
+
+        self.assertEqual(database.get_schema_version(), version + 1)
+        self.assertIn('category', self._columns('stores'))
+
+    def test_step_applied_by_another_process_is_skipped(self):
+        self.migrate()
+        version = database.get_schema_version()
+        attempts = []
+        database.MIGRATIONS.append(lambda cursor: attempts.append(True))
+        # 別のプロセスが先に適用した状態
+        other = sqlite3.connect(database.DATABASE_FILE)
+        other.execute(f'PRAGMA user_version = {version + 1}')
+        other.close()
+
+        original = database.get_schema_version
+        database.get_schema_version = lambda: version
+        try:
+            self.assertEqual(self.migrate(), 0)
+        finally:
+            database.get_schema_version = original
+        self.assertEqual(attempts, [])
+
+
+class TransactionTest(DatabaseTestCase):
+    """書き込み用のトランザクションが開始時に書き込みロックを取得することを確認"""
+
+    def _other_writer_is_blocked(self):
+        other = sqlite3.connect(database.DATABASE_FILE, timeout=0, isolation_level=None)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+            other.execute('ROLLBACK')
+            return False
+        except sqlite3.OperationalError:
+            return True
+        finally:
+            other.close()
+
+    def test_write_transaction_locks_at_begin(self):
+        with database.transaction(write=True):
+            self.assertTrue(self._other_writer_is_blocked())
+        self.assertFalse(self._other_writer_is_blocked())
+
+    def test_read_transaction_does_not_lock(self):
+        with database.transaction() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM stores').fetchone()
+            self.assertFalse(self._other_writer_is_blocked())
+
+
+class StorePageSearchTest(DatabaseTestCase):
+    """運営者画面の店舗一覧の検索が一致件数の上限で打ち切られることを確認"""
+
+    def setUp(self):
+        super().setUp()
+        self.original_max_hits = database.SEARCH_MAX_HITS
+        database.SEARCH_MAX_HITS = 2
+        self.store_ids = [
+            database.add_store_with_products(f"店{i}", 35.0, 135.0, [{'name': 'たこ焼き', 'price': 500}])
+            for i in range(3)
+        ]
+
+    def tearDown(self):
+        database.SEARCH_MAX_HITS = self.original_max_hits
+        super().tearDown()
+
+    def test_short_term_is_truncated(self):
+        page = database.get_store_page(query='焼き')
+        self.assertEqual(page['total'], 2)
+        self.assertTrue(page['truncated'])
+        self.assertEqual([store['id'] for store in page['stores']], self.store_ids[:2])
+
+    def test_long_term_is_truncated(self):
+        page = database.get_store_page(query='たこ焼き')
+        self.assertEqual(page['total'], 2)
+        self.assertTrue(page['truncated'])
+
+    def test_truncated_page_follows_sort(self):
+        for sort in ('id', 'name'):
+            with self.subTest(sort=sort):
+                page = database.get_store_page(query='焼き', sort=sort, descending=True)
+                self.assertTrue(page['truncated'])
+                self.assertEqual([store['id'] for store in page['stores']], self.store_ids[:0:-1])
+
+    def test_truncated_page_follows_product_count(self):
+        database.add_product(self.store_ids[2], 'ラーメン', 800)
+        page = database.get_store_page(query='たこ焼き', sort='product_count', descending=True)
+        self.assertEqual(page['stores'][0]['id'], self.store_ids[2])
+
+    def test_bbox_is_applied_before_truncation(self):
+        store_id = database.add_store_with_products("離れた店", 36.0, 136.0, [{'name': 'たこ焼き', 'price': 500}])
+        page = database.get_store_page(query='焼き', bbox=(35.9, 135.9, 36.1, 136.1))
+        self.assertEqual(page['total'], 1)
+        self.assertFalse(page['truncated'])
+        self.assertEqual([store['id'] for store in page['stores']], [store_id])
+
+    def test_within_limit_is_not_truncated(self):
+        database.delete_store(self.store_ids[0])
+        page = database.get_store_page(query='焼き')
+        self.assertEqual(page['total'], 2)
+        self.assertFalse(page['truncated'])
+
+
+class SyncProductsTest(DatabaseTestCase):
+    """商品の差分更新で商品リストの並び順が保たれることを確認"""
+
+    def setUp(self):
+        super().setUp()
+        self.store_id = database.add_store_with_products("店", 35.0, 135.0, self._products('A', 'B', 'C'))
+
+    def _products(self, *names):
+        return [{'name': name, 'price': 100} for name in names]
+
+    def _product_names(self):
+        return [product['name'] for product in database.get_all_stores()[0]['products']]
+
+    def test_reordered_products_keep_new_order(self):
+        result = database.sync_store_products(self.store_id, self._products('C', 'X', 'A'))
+        self.assertEqual(result, {'inserted': 1, 'updated': 2, 'deleted': 1})
+        self.assertEqual(self._product_names(), ['C', 'X', 'A'])
+
+    def test_unchanged_products_are_not_updated(self):
+        database.sync_store_products(self.store_id, self._products('C', 'X', 'A'))
+        result = database.sync_store_products(self.store_id, self._products('C', 'X', 'A'))
+        self.assertEqual(result, {'inserted': 0, 'updated': 0, 'deleted': 0})
+
+    def test_added_product_goes_last(self):
+        database.sync_store_products(self.store_id, self._products('C', 'A'))
+        database.add_product(self.store_id, 'D', 100)
+        self.assertEqual(self._product_names(), ['C', 'A', 'D'])
+
+
+class ChangeFeedTest(DatabaseTestCase):
+    """店舗の追加・変更・削除がリビジョンとして記録され、差分だけを取得できることを確認"""
+
+    def _add(self, name):
+        return database.add_store_with_products(name, 35.0, 135.0, [{'name': 'A', 'price': 100}])
+
+    def test_changes_since_revision(self):
+        self.assertEqual(database.get_current_revision(), 0)
+        first = self._add("店1")
+        second = self._add("店2")
+        revision = database.get_current_revision()
+        self.assertGreater(revision, 0)
+
+        changes = database.get_changes_since(0)
+        self.assertEqual(changes['revision'], revision)
+        self.assertEqual([store['id'] for store in changes['stores']], [first, second])
+        self.assertEqual(changes['stores'][0]['products'], [{'name': 'A', 'price': 100}])
+        self.assertEqual(changes['deleted'], [])
+
+        self.assertEqual(database.get_changes_since(revision), {'revision': revision, 'stores': [], 'deleted': []})
+
+    def test_only_changed_stores_are_returned(self):
+        first = self._add("店1")
+        self._add("店2")
+        revision = database.get_current_revision()
+
+        database.sync_store_products(first, [{'name': 'A', 'price': 150}])
+        changes = database.get_changes_since(revision)
+        self.assertEqual([store['id'] for store in changes['stores']], [first])
+        self.assertEqual(changes['stores'][0]['products'], [{'name': 'A', 'price': 150}])
+
+    def test_deleted_stores(self):
+        first = self._add("店1")
+        revision = database.get_current_revision()
+        database.delete_store(first)
+        changes = database.get_changes_since(revision)
+        self.assertEqual(changes['stores'], [])
+        self.assertEqual(changes['deleted'], [first])
+
+    def test_unchanged_products_do_not_advance_revision(self):
+        first = self._add("店1")
+        revision = database.get_current_revision()
+        database.sync_store_products(first, [{'name': 'A', 'price': 100}])
+        self.assertEqual(database.get_current_revision(), revision)
+
+
+if __name__ == "__main__":
+    unittest.main()
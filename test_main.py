@@ -0,0 +1,166 @@
+"""
+main.py のコマンドのテスト
+
+使用方法:
+  python -m unittest test_main
+"""
+
+import io
+import os
+import json
+import unittest
+import contextlib
+import database
+import main
+from test_support import DatabaseTestCase
+
+
+class BuildCommandTest(DatabaseTestCase):
+    """python main.py build がブラウザを開かずにマップを生成することを確認"""
+
+    def setUp(self):
+        super().setUp()
+        database.add_store_with_products("たこ焼き屋台", 39.7035, 141.1438, [{'name': 'たこ焼き', 'price': 400}])
+        self.output = self.temp_path('map.html')
+
+    def _build(self, *args):
+        """(戻り値, 出力) を返す"""
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            result = main.run_build(['--db', database.DATABASE_FILE, '--output', self.output, *args])
+        return result, out.getvalue()
+
+    def test_build_writes_map(self):
+        result, out = self._build()
+        self.assertTrue(result)
+        self.assertIn("with 1 stores", out)
+        with open(self.output, encoding='utf-8') as f:
+            self.assertIn("たこ焼き屋台", f.read())
+
+    def test_data_mode(self):
+        result, _ = self._build('--mode', 'data', '--center', '39.7,141.1', '--zoom', '17')
+        self.assertTrue(result)
+        with open(self.output, encoding='utf-8') as f:
+            self.assertIn('"たこ焼き屋台"', f.read())
+
+    def test_unchanged_map_is_skipped(self):
+        self._build()
+        result, out = self._build()
+        self.assertTrue(result)
+        self.assertIn("is up to date with 1 stores, skipped", out)
+        self.assertNotIn("Built", out)
+        # 設定が変われば生成する
+        result, out = self._build('--cluster')
+        self.assertIn("Built", out)
+
+    def test_force_rebuilds_unchanged_map(self):
+        self._build()
+        result, out = self._build('--force')
+        self.assertTrue(result)
+        self.assertIn("Built", out)
+
+    def test_stream(self):
+        result, out = self._build('--mode', 'data', '--stream')
+        self.assertTrue(result)
+        self.assertIn("with 1 stores", out)
+
+    def test_missing_database(self):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            result = main.run_build(['--db', self.temp_path('missing.db'), '--output', self.output])
+        self.assertFalse(result)
+        self.assertFalse(os.path.exists(self.output))
+
+    def test_variants_file(self):
+        variants_file = self.temp_path('variants.json')
+        with open(variants_file, 'w', encoding='utf-8') as f:
+            json.dump([
+                {'output': self.temp_path('a.html')},
+                {'output': self.temp_path('b.html'), 'keyword': "存在しない"},
+            ], f)
+        result, out = self._build('--variants', variants_file, '--workers', '1')
+        self.assertTrue(result)
+        self.assertIn("Built 2 maps from 1 stores", out)
+        self.assertTrue(os.path.exists(self.temp_path('b.html')))
+
+    def test_invalid_variants_file(self):
+        variants_file = self.temp_path('variants.json')
+        with open(variants_file, 'w', encoding='utf-8') as f:
+            f.write("[{")
+        result, out = self._build('--variants', variants_file)
+        self.assertFalse(result)
+        self.assertIn("could not read variants file", out)
+
+    def test_invalid_options_are_usage_errors(self):
+        for args in (['--lazy-popups'], ['--stream'], ['--center', 'abc'], ['--mode', 'unknown']):
+            with self.subTest(args=args):
+                with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                    self._build(*args)
+
+
+class ImportCommandTest(DatabaseTestCase):
+    """python main.py import が読み込みやデータベースのエラーで終了コード1を返すことを確認"""
+
+    def _import(self, path):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            result = main.run_import([path])
+        return result, out.getvalue()
+
+    def test_import_csv(self):
+        path = self.temp_path('stores.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("name,latitude,longitude\nたこ焼き屋台2,39.7035,141.1438\n")
+        result, out = self._import(path)
+        self.assertTrue(result)
+        self.assertIn("Imported 1 of 1 rows", out)
+
+    def test_malformed_csv(self):
+        path = self.temp_path('stores.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            # csv モジュールの1項目の上限を超える
+            f.write("name,latitude,longitude\n\"" + "x" * 200000 + "\",39.7,141.1\n")
+        result, out = self._import(path)
+        self.assertFalse(result)
+        self.assertIn("Error occurred while importing stores", out)
+
+    def test_broken_database(self):
+        path = self.temp_path('stores.csv')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write("name,latitude,longitude\n")
+        database.close_connection()
+        database.DATABASE_FILE = self.temp_path('broken.db')
+        with open(database.DATABASE_FILE, 'w') as f:
+            f.write("not a database" * 100)
+        result, out = self._import(path)
+        self.assertFalse(result)
+        self.assertIn("Error occurred while importing stores", out)
+
+
+class ServeCommandTest(DatabaseTestCase):
+    """python main.py serve がデータベースのエラーで終了コード1を返すことを確認"""
+
+    def test_broken_database(self):
+        broken = self.temp_path('broken.db')
+        with open(broken, 'w') as f:
+            f.write("not a database" * 100)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            result = main.run_serve(['--db', broken, '--site', self.temp_path('site')])
+        self.assertFalse(result)
+        self.assertIn("could not start server", out.getvalue())
+
+
+class TilesCommandTest(unittest.TestCase):
+    """python main.py tiles のオプション検査を確認"""
+
+    def test_invalid_options_are_usage_errors(self):
+        for args in (['--url', 'https://{s}.tile.example/{z}/{x}/{y}.png'], ['--url', 'https://tile.example/{0}.png'],
+                     ['--url', 'https://tile.example/{z'], ['--delay', '-1']):
+            with self.subTest(args=args):
+                with self.assertRaises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+                    main.run_tiles(args)
+
+
+if __name__ == "__main__":
+    unittest.main()
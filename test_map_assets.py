@@ -0,0 +1,96 @@
+"""
+map_assets.py のテスト（ダウンロードは偽の fetch で置き換える）
+
+使用方法:
+  python -m unittest test_map_assets
+"""
+
+import os
+import unittest
+import folium
+import map_assets
+from test_support import TemporaryDirectoryTestCase
+
+
+class FakeFetch:
+    """URL ごとの内容を返し、ダウンロードした URL を記録する"""
+
+    def __init__(self):
+        self.urls = []
+
+    def __call__(self, url):
+        self.urls.append(url)
+        if url.endswith('.css'):
+            return b'.a{background:url("data:image/png;base64,AAAA")}' \
+                   b'@font-face{src:url(../webfonts/fa.woff2?v=6.2.0#iefix),url(\'img/x.png\')}'
+        return f"/* {url} */".encode('utf-8')
+
+
+class BundleMapAssetsTest(TemporaryDirectoryTestCase):
+    """地図の JS/CSS がハッシュ値付きのファイル名で保存され、HTML から参照されることを確認"""
+
+    def setUp(self):
+        super().setUp()
+        self.asset_dir = self.temp_path('static')
+        self.fetch = FakeFetch()
+
+    def _map(self, popup=True):
+        m = folium.Map(location=[39.7, 141.1])
+        folium.Marker([39.7, 141.1], popup="会場" if popup else None,
+                      icon=folium.Icon(icon='star', prefix='fa')).add_to(m)
+        return m
+
+    def test_assets_are_saved_with_hashed_names(self):
+        m = self._map()
+        files = map_assets.bundle_map_assets(m, self.asset_dir, 'static', fetch=self.fetch)
+
+        self.assertTrue(files)
+        for filename in files:
+            self.assertRegex(filename, r'\.[0-9a-f]{12}\.(js|css)$')
+            self.assertTrue(os.path.exists(os.path.join(self.asset_dir, filename)))
+        manifest = map_assets.load_manifest(self.asset_dir)
+        self.assertEqual(sorted(set(manifest.values()) & set(files)), files)
+
+        html = m.get_root().render()
+        for filename in files:
+            self.assertIn(f'static/{filename}', html)
+        self.assertNotRegex(html, r'<(script|link)[^>]+https?://')
+
+    def test_unused_libraries_are_not_loaded(self):
+        map_assets.bundle_map_assets(self._map(), self.asset_dir, 'static', fetch=self.fetch)
+        self.assertFalse(any('bootstrap' in url for url in self.fetch.urls))
+        self.assertTrue(any('jquery' in url for url in self.fetch.urls))
+
+        # ポップアップがなければ jQuery も読み込まない
+        fetch = FakeFetch()
+        map_assets.bundle_map_assets(self._map(popup=False), self.temp_path('other'), 'other', fetch=fetch)
+        self.assertFalse(any('jquery' in url for url in fetch.urls))
+
+    def test_saved_assets_are_reused_offline(self):
+        map_assets.bundle_map_assets(self._map(), self.asset_dir, 'static', fetch=self.fetch)
+
+        def offline(url):
+            raise OSError(f"offline: {url}")
+
+        m = self._map()
+        map_assets.bundle_map_assets(m, self.asset_dir, 'static', fetch=offline)
+        self.assertNotRegex(m.get_root().render(), r'<(script|link)[^>]+https?://')
+
+    def test_css_references_are_saved_and_rewritten(self):
+        os.makedirs(self.asset_dir)
+        manifest = {}
+        url = 'https://cdn.example.com/pkg/css/all.min.css'
+        filename = map_assets.vendor_asset(url, self.asset_dir, manifest, self.fetch)
+        with open(os.path.join(self.asset_dir, filename), encoding='utf-8') as f:
+            css = f.read()
+
+        font = manifest['https://cdn.example.com/pkg/webfonts/fa.woff2']
+        image = manifest['https://cdn.example.com/pkg/css/img/x.png']
+        self.assertIn(f'url("{font}#iefix")', css)
+        self.assertIn(f'url("{image}")', css)
+        self.assertIn('url("data:image/png;base64,AAAA")', css)
+        self.assertTrue(os.path.exists(os.path.join(self.asset_dir, font)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+"""
+map_server.py のテスト
+
+使用方法:
+  python -m unittest test_map_server
+"""
+
+import os
+import gzip
+import json
+import threading
+import unittest
+import http.client
+import database
+import map_server
+from test_support import DatabaseTestCase
+
+
+class MapServerTestCase(DatabaseTestCase):
+    """公開用フォルダを一時フォルダに作成し、サーバーを別スレッドで起動する（変更フィードは一時データベースを使う）"""
+
+    def setUp(self):
+        super().setUp()
+        self.server = None
+        self.site_dir = self.temp_path('public')
+        os.makedirs(self.site_dir)
+        self._write('index.html', b'<html>map</html>')
+
+    def tearDown(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        super().tearDown()
+
+    def _write(self, name, body):
+        with open(os.path.join(self.site_dir, name), 'wb') as f:
+            f.write(body)
+
+    def _start(self, site_dir=None):
+        self.server = map_server.MapServer(('127.0.0.1', 0), site_dir or self.site_dir)
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def _get(self, path, headers=None, method='GET'):
+        """(ステータス, ヘッダー, 内容) を返す"""
+        conn = http.client.HTTPConnection('127.0.0.1', self.server.server_address[1], timeout=5)
+        try:
+            conn.request(method, path, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            conn.close()
+
+
+class PathResolutionTest(MapServerTestCase):
+    """公開用フォルダ外・非公開のファイルを返さないことを確認"""
+
+    def test_index_is_served(self):
+        self._start()
+        status, _, body = self._get('/')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'<html>map</html>')
+
+    @unittest.skipUnless(hasattr(os, 'symlink'), "symlinks are not supported")
+    def test_site_dir_behind_symlink(self):
+        link = os.path.join(self.temp_dir.name, 'link')
+        try:
+            os.symlink(self.site_dir, link)
+        except OSError:
+            self.skipTest("cannot create symlinks")
+        self._start(link)
+        status, _, body = self._get('/index.html')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, b'<html>map</html>')
+
+    def test_parent_directory_is_not_served(self):
+        with open(os.path.join(self.temp_dir.name, 'secret.txt'), 'wb') as f:
+            f.write(b'secret')
+        self._start()
+        for path in ('/../secret.txt', '/%2e%2e/secret.txt', '/static/..%2f..%2fsecret.txt'):
+            with self.subTest(path=path):
+                self.assertEqual(self._get(path)[0], 404)
+
+    def test_null_byte_is_not_found(self):
+        self._start()
+        self.assertEqual(self._get('/%00')[0], 404)
+        self.assertEqual(self._get('/index.html%00.txt')[0], 404)
+
+    def test_hidden_files_are_not_served(self):
+        self._write('index.html.fingerprint', b'abc')
+        self._start()
+        self.assertEqual(self._get('/index.html.fingerprint')[0], 404)
+
+
+class CachingTest(MapServerTestCase):
+    """ETag・圧縮・Cache-Control の付け方を確認"""
+
+    def setUp(self):
+        super().setUp()
+        self.large = ("<p>店舗</p>\n" * 500).encode('utf-8')
+        self._write('large.html', self.large)
+        self._start()
+
+    def test_not_modified(self):
+        status, headers, _ = self._get('/')
+        self.assertEqual(status, 200)
+        etag = headers['ETag']
+
+        status, headers, body = self._get('/', {'If-None-Match': etag})
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b'')
+        self.assertEqual(headers['ETag'], etag)
+
+        self._write('index.html', b'<html>updated</html>')
+        status, headers, body = self._get('/', {'If-None-Match': etag})
+        self.assertEqual(status, 200)
+        self.assertNotEqual(headers['ETag'], etag)
+        self.assertEqual(body, b'<html>updated</html>')
+
+    def test_gzip(self):
+        status, headers, body = self._get('/large.html', {'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(gzip.decompress(body), self.large)
+        self.assertEqual(int(headers['Content-Length']), len(body))
+
+        _, identity_headers, identity_body = self._get('/large.html')
+        self.assertNotIn('Content-Encoding', identity_headers)
+        self.assertEqual(identity_body, self.large)
+        # エンコーディングごとに別の ETag
+        self.assertNotEqual(identity_headers['ETag'], headers['ETag'])
+
+    def test_small_files_are_not_compressed(self):
+        _, headers, body = self._get('/', {'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertNotIn('Vary', headers)
+        self.assertEqual(body, b'<html>map</html>')
+
+    def test_head_has_no_body(self):
+        status, headers, body = self._get('/large.html', method='HEAD')
+        self.assertEqual(status, 200)
+        self.assertEqual(int(headers['Content-Length']), len(self.large))
+        self.assertEqual(body, b'')
+
+    def test_cache_control(self):
+        for directory in ('static', 'tiles'):
+            os.makedirs(os.path.join(self.site_dir, directory))
+        self._write(os.path.join('static', 'leaflet.0123456789ab.js'), b'js')
+        self._write(os.path.join('tiles', '1.png'), b'png')
+        self.assertEqual(self._get('/')[1]['Cache-Control'], map_server.CACHE_REVALIDATE)
+        self.assertEqual(self._get('/static/leaflet.0123456789ab.js')[1]['Cache-Control'], map_server.CACHE_IMMUTABLE)
+        self.assertEqual(self._get('/tiles/1.png')[1]['Cache-Control'], map_server.CACHE_TILES)
+
+
+class ChangesTest(MapServerTestCase):
+    """変更フィード /changes の応答を確認"""
+
+    def setUp(self):
+        super().setUp()
+        self.store_id = database.add_store_with_products(
+            "たこ焼き屋台", 39.7035, 141.1438, [{'name': 'たこ焼き', 'price': 400}], "大阪風"
+        )
+        self._start()
+        # 監視スレッドの代わりにリビジョンを設定
+        self.server.revision = database.get_current_revision()
+
+    def _changes(self, since):
+        status, headers, body = self._get(f'/changes?since={since}')
+        self.assertEqual(status, 200)
+        self.assertEqual(headers['Cache-Control'], 'no-store')
+        return json.loads(body)
+
+    def test_changes_since_revision(self):
+        changes = self._changes(0)
+        self.assertEqual(changes['revision'], self.server.revision)
+        self.assertEqual(changes['stores'], [[self.store_id, "たこ焼き屋台", 39.7035, 141.1438, "大阪風", [["たこ焼き", 400]]]])
+        self.assertEqual(changes['deleted'], [])
+        self.assertEqual(self._changes(self.server.revision), {'revision': self.server.revision, 'stores': [], 'deleted': []})
+
+    def test_cached_response_follows_new_revision(self):
+        self._changes(0)
+        database.delete_store(self.store_id)
+        self.server.revision = database.get_current_revision()
+        changes = self._changes(0)
+        self.assertEqual(changes['stores'], [])
+        self.assertEqual(changes['deleted'], [self.store_id])
+
+    def test_invalid_since(self):
+        self.assertEqual(self._get('/changes?since=abc')[0], 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
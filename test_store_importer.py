@@ -0,0 +1,116 @@
+"""
+store_importer.py のテスト
+
+使用方法:
+  python -m unittest test_store_importer
+"""
+
+import json
+import unittest
+import database
+from store_importer import import_stores, iter_rows, validate_row
+from test_support import DatabaseTestCase
+
+
+class ImportStoresTest(DatabaseTestCase):
+    """CSV / JSON Lines / JSON からの一括インポートと不正な行の扱いを確認"""
+
+    def _write(self, name, text):
+        path = self.temp_path(name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        return path
+
+    def _stores(self):
+        return {store['name']: store for store in database.get_all_stores()}
+
+    def test_csv_with_japanese_headers(self):
+        path = self._write('stores.csv', (
+            "店舗名,緯度,経度,説明,商品\n"
+            "たこ焼き屋台,39.7035,141.1438,大阪風,たこ焼き:400;イカ焼き:300円\n"
+            "クレープ店,39.7036,141.1439,,\n"
+        ))
+        result = import_stores(path)
+
+        self.assertEqual(result, {'processed': 2, 'imported': 2, 'errors': []})
+        stores = self._stores()
+        self.assertEqual(stores['たこ焼き屋台']['description'], "大阪風")
+        self.assertEqual(
+            stores['たこ焼き屋台']['products'],
+            [{'name': 'たこ焼き', 'price': 400}, {'name': 'イカ焼き', 'price': 300}]
+        )
+        self.assertEqual(stores['クレープ店']['products'], [])
+
+    def test_bad_rows_are_skipped_and_reported(self):
+        path = self._write('stores.csv', (
+            "name,latitude,longitude,products\n"
+            "正しい店,39.7,141.1,A:100\n"
+            "緯度が不正,abc,141.1,A:100\n"
+            ",39.7,141.1,A:100\n"
+            "範囲外,95,141.1,A:100\n"
+            "価格が不正,39.7,141.1,A:百円\n"
+            "負の価格,39.7,141.1,A:-1\n"
+        ))
+        result = import_stores(path, batch_size=2)
+
+        self.assertEqual(result['processed'], 6)
+        self.assertEqual(result['imported'], 1)
+        self.assertEqual([row_number for row_number, _ in result['errors']], [3, 4, 5, 6, 7])
+        self.assertEqual(list(self._stores()), ['正しい店'])
+
+    def test_jsonl_with_broken_lines(self):
+        path = self._write('stores.jsonl', "\n".join([
+            json.dumps({'name': '一行目', 'lat': 39.7, 'lng': 141.1, 'products': [{'name': 'A', 'price': 100}]}),
+            '{"name": "壊れた行"',
+            '',
+            '["配列"]',
+            json.dumps({'name': '五行目', 'latitude': 39.8, 'longitude': 141.2, 'products': 'B:200'}),
+        ]))
+        result = import_stores(path)
+
+        self.assertEqual(result['imported'], 2)
+        self.assertEqual([row_number for row_number, _ in result['errors']], [2, 4])
+        self.assertEqual(self._stores()['五行目']['products'], [{'name': 'B', 'price': 200}])
+
+    def test_json_array_and_object(self):
+        store = {'name': '店', 'latitude': 39.7, 'longitude': 141.1, 'products': []}
+        for name, data in (('array.json', [store]), ('object.json', {'stores': [store]})):
+            with self.subTest(name=name):
+                path = self._write(name, json.dumps(data))
+                self.assertEqual(import_stores(path)['imported'], 1)
+
+    def test_json_without_store_array_is_rejected(self):
+        for data in (1, "stores", None, {'stores': None}, {'stores': {'name': '店'}}):
+            with self.subTest(data=data):
+                path = self._write('stores.json', json.dumps(data))
+                with self.assertRaises(ValueError):
+                    import_stores(path)
+
+    def test_unknown_extension_is_rejected(self):
+        path = self._write('stores.txt', "")
+        with self.assertRaises(ValueError):
+            list(iter_rows(path))
+
+
+class ValidateRowTest(unittest.TestCase):
+    """1行分のデータの検証"""
+
+    def test_aliases_and_product_formats(self):
+        store = validate_row({
+            ' Name ': ' 店 ', 'LAT': '39.7', 'lon': 141.1, 'unknown': 'x',
+            'products': ['A:100', {'name': 'B', 'price': '200円'}],
+        })
+        self.assertEqual(store, {
+            'name': '店', 'latitude': 39.7, 'longitude': 141.1, 'description': '',
+            'products': [{'name': 'A', 'price': 100}, {'name': 'B', 'price': 200}],
+        })
+
+    def test_invalid_products(self):
+        for products in ([{'name': '', 'price': 1}], [{'name': 'A', 'price': 'x'}], [1], "A100"):
+            with self.subTest(products=products):
+                with self.assertRaises(ValueError):
+                    validate_row({'name': '店', 'latitude': 0, 'longitude': 0, 'products': products})
+
+
+if __name__ == "__main__":
+    unittest.main()
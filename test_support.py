@@ -0,0 +1,43 @@
+"""
+テスト共通の基底クラス
+"""
+
+import os
+import tempfile
+import unittest
+import contextlib
+import database
+
+
+class TemporaryDirectoryTestCase(unittest.TestCase):
+    """テストごとに一時フォルダを作成して破棄する"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def temp_path(self, *names):
+        """一時フォルダ内のパス"""
+        return os.path.join(self.temp_dir.name, *names)
+
+
+class DatabaseTestCase(TemporaryDirectoryTestCase):
+    """一時フォルダにマイグレーション済みのデータベースを作成し、テストごとに破棄する"""
+
+    def setUp(self):
+        super().setUp()
+        self.original_file = database.DATABASE_FILE
+        database.DATABASE_FILE = self.temp_path('test.db')
+        self.migrate()
+
+    def tearDown(self):
+        database.close_connection()
+        database.DATABASE_FILE = self.original_file
+        super().tearDown()
+
+    def migrate(self):
+        """マイグレーションを適用（適用したステップ数を返す）"""
+        with contextlib.redirect_stdout(None):
+            return database.migrate_database()
@@ -0,0 +1,178 @@
+"""
+tile_cache.py のテスト（ダウンロードは偽の fetch で置き換える）
+
+使用方法:
+  python -m unittest test_tile_cache
+"""
+
+import os
+import sys
+import sqlite3
+import subprocess
+import unittest
+from unittest import mock
+import tile_cache
+from test_support import TemporaryDirectoryTestCase
+
+# 会場付近の2タイル（ズーム15）
+BBOX = (39.7005, 141.1412, 39.7064, 141.1471)
+
+
+class TileNumberTest(unittest.TestCase):
+    """緯度・経度からタイル番号への変換"""
+
+    def test_tile_xy(self):
+        self.assertEqual(tile_cache.tile_xy(0, 0, 1), (1, 1))
+        self.assertEqual(tile_cache.tile_xy(51.5074, -0.1278, 10), (511, 340))
+        # 範囲外の緯度はタイルの端に収める
+        self.assertEqual(tile_cache.tile_xy(89.9, 180, 2), (3, 0))
+
+    def test_tiles_in_bbox(self):
+        self.assertEqual(list(tile_cache.tiles_in_bbox(*BBOX, zooms=[15])), [(15, 29230, 12440), (15, 29231, 12440)])
+        self.assertEqual(len(list(tile_cache.tiles_in_bbox(*BBOX, zooms=range(15, 17)))), 8)
+
+    def test_import_does_not_load_map_stack(self):
+        # タイルの保存だけなら folium やデータベースを読み込まない
+        code = "import sys, tile_cache; print(sorted({'visitor_map', 'folium', 'database'} & set(sys.modules)))"
+        output = subprocess.check_output([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), text=True)
+        self.assertEqual(output.strip(), "[]")
+
+
+class TileCacheTestCase(TemporaryDirectoryTestCase):
+    """一時フォルダの tiles/ をキャッシュとして使う"""
+
+    def setUp(self):
+        super().setUp()
+        self.tile_dir = self.temp_path('tiles')
+
+    def read_tile(self, zoom, x, y):
+        with open(tile_cache.tile_path(self.tile_dir, zoom, x, y), 'rb') as f:
+            return f.read()
+
+
+class SeedTilesTest(TileCacheTestCase):
+    """範囲内のタイルをダウンロードし、保存済みのタイルは再取得しないことを確認"""
+
+    def test_tiles_are_downloaded_once(self):
+        urls = []
+
+        def fetch(url):
+            urls.append(url)
+            return url.encode('utf-8')
+
+        result = tile_cache.seed_tiles(BBOX, [15], self.tile_dir, "https://tiles.example/{z}/{x}/{y}.png", fetch=fetch, delay=0)
+        self.assertEqual(result, {'downloaded': 2, 'skipped': 0, 'errors': []})
+        self.assertEqual(self.read_tile(15, 29231, 12440), b"https://tiles.example/15/29231/12440.png")
+        self.assertTrue(tile_cache.has_tiles(self.tile_dir))
+
+        result = tile_cache.seed_tiles(BBOX, [15], self.tile_dir, "https://tiles.example/{z}/{x}/{y}.png", fetch=fetch, delay=0)
+        self.assertEqual(result, {'downloaded': 0, 'skipped': 2, 'errors': []})
+        self.assertEqual(len(urls), 2)
+
+    def test_failed_tiles_are_reported(self):
+        def fetch(url):
+            if '29230' in url:
+                raise OSError("connection refused")
+            return b"tile"
+
+        progress = []
+        result = tile_cache.seed_tiles(BBOX, [15], self.tile_dir, fetch=fetch, delay=0,
+                                       progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(result['downloaded'], 1)
+        self.assertEqual(result['errors'], [(15, 29230, 12440, "connection refused")])
+        self.assertEqual(progress, [(1, 2), (2, 2)])
+        self.assertFalse(os.path.exists(tile_cache.tile_path(self.tile_dir, 15, 29230, 12440)))
+
+
+@mock.patch('tile_cache.time.sleep')
+class RateLimitTest(TileCacheTestCase):
+    """ダウンロードの間隔を空け、制限された場合は Retry-After の時間だけ待つことを確認"""
+
+    def test_delay_between_downloads(self, sleep):
+        tile_cache.seed_tiles(BBOX, range(15, 17), self.tile_dir, fetch=lambda url: b"tile", delay=0.5)
+        # 最初のダウンロードの前は待たない
+        self.assertEqual(sleep.call_args_list, [mock.call(0.5)] * 7)
+
+    def test_cached_tiles_are_not_delayed(self, sleep):
+        tile_cache.seed_tiles(BBOX, [15], self.tile_dir, fetch=lambda url: b"tile", delay=0.5)
+        sleep.reset_mock()
+        tile_cache.seed_tiles(BBOX, [15], self.tile_dir, fetch=lambda url: b"tile", delay=0.5)
+        sleep.assert_not_called()
+
+    def test_retry_after_rate_limit(self, sleep):
+        responses = [tile_cache.RateLimited(30), b"west", b"east"]
+
+        def fetch(url):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        result = tile_cache.seed_tiles(BBOX, [15], self.tile_dir, fetch=fetch, delay=0.5)
+        self.assertEqual(result, {'downloaded': 2, 'skipped': 0, 'errors': []})
+        self.assertEqual(sleep.call_args_list, [mock.call(30), mock.call(0.5), mock.call(0.5)])
+        self.assertEqual(self.read_tile(15, 29230, 12440), b"west")
+
+    def test_repeated_rate_limit_stops_seeding(self, sleep):
+        urls = []
+
+        def fetch(url):
+            urls.append(url)
+            raise tile_cache.RateLimited(10)
+
+        result = tile_cache.seed_tiles(BBOX, [15], self.tile_dir, fetch=fetch, delay=0)
+        self.assertEqual(len(urls), tile_cache.RATE_LIMIT_RETRIES + 1)
+        self.assertEqual(result['downloaded'], 0)
+        self.assertEqual([error[:3] for error in result['errors']], [(15, 29230, 12440)])
+
+    def test_retry_after_header(self, sleep):
+        self.assertEqual(tile_cache._retry_after_seconds("120"), 120)
+        self.assertEqual(tile_cache._retry_after_seconds("99999"), tile_cache.MAX_RETRY_AFTER)
+        self.assertEqual(tile_cache._retry_after_seconds(None), tile_cache.DEFAULT_RETRY_AFTER)
+        self.assertEqual(tile_cache._retry_after_seconds("Wed, 21 Oct 2015 07:28:00 GMT"), 0)
+
+
+class ImportMbtilesTest(TileCacheTestCase):
+    """MBTiles（TMS 方式）のタイルが XYZ 方式の番号で保存されることを確認"""
+
+    def setUp(self):
+        super().setUp()
+        self.mbtiles = self.temp_path('area.mbtiles')
+        conn = sqlite3.connect(self.mbtiles)
+        conn.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+        # TMS の行番号 = 2^zoom - 1 - y
+        conn.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", [
+            (15, 29230, 2 ** 15 - 1 - 12440, b"west"),
+            (15, 29231, 2 ** 15 - 1 - 12440, b"east"),
+            (15, 0, 0, b"outside"),
+            (1, 1, 0, b"low zoom"),
+        ])
+        conn.commit()
+        conn.close()
+
+    def test_all_tiles_are_imported(self):
+        self.assertEqual(tile_cache.import_mbtiles(self.mbtiles, self.tile_dir), 4)
+        self.assertEqual(self.read_tile(15, 29230, 12440), b"west")
+        self.assertEqual(self.read_tile(15, 0, 2 ** 15 - 1), b"outside")
+        self.assertEqual(self.read_tile(1, 1, 1), b"low zoom")
+
+    def test_bbox_and_zooms_filter(self):
+        self.assertEqual(tile_cache.import_mbtiles(self.mbtiles, self.tile_dir, BBOX, range(15, 16)), 2)
+        self.assertEqual(self.read_tile(15, 29231, 12440), b"east")
+        self.assertFalse(os.path.exists(tile_cache.tile_path(self.tile_dir, 1, 1, 1)))
+
+
+class TileUrlTest(TileCacheTestCase):
+    """生成するマップからキャッシュのタイルを参照する URL"""
+
+    def test_local_tile_url(self):
+        self.assertEqual(tile_cache.local_tile_url(self.tile_dir, relative_to=self.temp_dir.name), "tiles/{z}/{x}/{y}.png")
+        self.assertTrue(tile_cache.local_tile_url(self.tile_dir).startswith("file://"))
+
+    def test_tile_layer_url_falls_back_to_osm(self):
+        self.assertFalse(tile_cache.has_tiles(self.tile_dir))
+        self.assertEqual(tile_cache.tile_layer_url(self.tile_dir), tile_cache.OSM_TILE_URL)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,311 @@
+"""
+visitor_map.py のテスト
+
+使用方法:
+  python -m unittest test_visitor_map
+"""
+
+import io
+import os
+import re
+import json
+import unittest
+import contextlib
+import database
+import visitor_map
+from test_support import DatabaseTestCase
+
+
+def sample_stores():
+    return [
+        {
+            'id': 1, 'name': "たこ焼き屋台", 'latitude': 39.7035, 'longitude': 141.1438, 'description': "大阪風",
+            'products': [{'name': "たこ焼き", 'price': 400}, {'name': "イカ焼き", 'price': 300}],
+        },
+        {
+            'id': 2, 'name': "クレープ</script>", 'latitude': 39.7031, 'longitude': 141.1434, 'description': "",
+            'products': [],
+        },
+    ]
+
+
+class VisitorMapTestCase(DatabaseTestCase):
+    """一時フォルダにマップを生成する"""
+
+    def setUp(self):
+        super().setUp()
+        self.output = self.temp_path('map.html')
+
+    def build(self, stores=None, **options):
+        """マップを生成して表示されたメッセージを返す"""
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            visitor_map.create_visitor_map(self.output, stores=sample_stores() if stores is None else stores, **options)
+        return out.getvalue()
+
+    def read(self, path=None):
+        with open(path or self.output, encoding='utf-8') as f:
+            return f.read()
+
+    def records(self):
+        """データ駆動モードのマップに埋め込まれた店舗レコード"""
+        match = re.search(r'var stores = (.*?);\n', self.read())
+        self.assertIsNotNone(match, "store records not found")
+        return json.loads(match.group(1))
+
+
+class FingerprintTest(VisitorMapTestCase):
+    """店舗データと設定に変更がなければ再生成しないことを確認"""
+
+    def assertSkipped(self, message):
+        self.assertIn("再生成をスキップしました", message)
+
+    def assertBuilt(self, message):
+        self.assertNotIn("再生成をスキップしました", message)
+        self.assertIn("保存されました", message)
+
+    def test_unchanged_map_is_skipped(self):
+        self.assertBuilt(self.build())
+        self.assertSkipped(self.build())
+
+    def test_changed_stores_are_rebuilt(self):
+        self.build()
+        stores = sample_stores()
+        stores[0]['products'][0]['price'] = 450
+        self.assertBuilt(self.build(stores))
+
+    def test_changed_settings_are_rebuilt(self):
+        self.build()
+        self.assertBuilt(self.build(cluster=True))
+        self.assertBuilt(self.build(cluster=True, zoom_start=17))
+        self.assertSkipped(self.build(cluster=True, zoom_start=17))
+
+    def test_force_and_missing_output_are_rebuilt(self):
+        self.build()
+        self.assertBuilt(self.build(force=True))
+        os.remove(self.output)
+        self.assertBuilt(self.build())
+        self.assertTrue(os.path.exists(self.output))
+
+    def test_fingerprint_depends_on_generator_version(self):
+        fingerprint = visitor_map.map_fingerprint(sample_stores(), mode="markers")
+        self.assertEqual(fingerprint, visitor_map.map_fingerprint(sample_stores(), mode="markers"))
+        self.assertNotEqual(fingerprint, visitor_map.map_fingerprint(sample_stores(), mode="data"))
+        original = visitor_map.MAP_GENERATOR_VERSION
+        visitor_map.MAP_GENERATOR_VERSION = original + 1
+        try:
+            self.assertNotEqual(fingerprint, visitor_map.map_fingerprint(sample_stores(), mode="markers"))
+        finally:
+            visitor_map.MAP_GENERATOR_VERSION = original
+
+    def test_fingerprint_depends_on_data_layer_template(self):
+        fingerprint = visitor_map.map_fingerprint(sample_stores(), mode="data")
+        original = visitor_map.STORE_DATA_LAYER_TEMPLATE
+        visitor_map.STORE_DATA_LAYER_TEMPLATE = original + "\n"
+        try:
+            self.assertNotEqual(fingerprint, visitor_map.map_fingerprint(sample_stores(), mode="data"))
+        finally:
+            visitor_map.STORE_DATA_LAYER_TEMPLATE = original
+
+
+class DataModeTest(VisitorMapTestCase):
+    """データ駆動モードで店舗データが1つの配列として埋め込まれることを確認"""
+
+    def test_records_are_embedded(self):
+        self.build(mode="data")
+        self.assertEqual(self.records(), [
+            [1, "たこ焼き屋台", 39.7035, 141.1438, "大阪風", [["たこ焼き", 400], ["イカ焼き", 300]]],
+            [2, "クレープ</script>", 39.7031, 141.1434, "", []],
+        ])
+
+    def test_records_cannot_close_the_script(self):
+        self.build(mode="data")
+        self.assertNotIn("クレープ</script>", self.read())
+
+    def test_markers_mode_has_no_records(self):
+        self.build()
+        self.assertNotIn("var stores = ", self.read())
+
+    def test_store_records_round_coordinates(self):
+        store = dict(sample_stores()[0], latitude=39.703512345678, description=None)
+        self.assertEqual(
+            visitor_map.store_records([store], include_products=False),
+            [[1, "たこ焼き屋台", 39.7035123, 141.1438, ""]]
+        )
+
+    def test_data_only_options_require_data_mode(self):
+        for options in ({'mode': "unknown"}, {'lazy_popups': True}, {'changes_url': "changes"}, {'stream': True}):
+            with self.subTest(options=options):
+                with self.assertRaises(ValueError):
+                    self.build(**options)
+
+
+class ClusterTest(VisitorMapTestCase):
+    """クラスタ表示で店舗マーカーがクラスタレイヤーに追加されることを確認"""
+
+    def _cluster_name(self, html):
+        match = re.search(r'var (marker_cluster_\w+) = L\.markerClusterGroup\(', html)
+        return match.group(1) if match else None
+
+    def test_markers_are_added_to_cluster(self):
+        self.build(cluster=True)
+        html = self.read()
+        cluster = self._cluster_name(html)
+        self.assertIsNotNone(cluster)
+        self.assertIn('chunkedLoading', html)
+        # 店舗マーカー2件はクラスタ、会場のマーカーは地図に追加
+        self.assertEqual(html.count(f').addTo({cluster});'), len(sample_stores()))
+
+    def test_data_layer_targets_cluster(self):
+        self.build(mode="data", cluster=True)
+        html = self.read()
+        self.assertIn(f'var target = {self._cluster_name(html)};', html)
+
+    def test_no_cluster_by_default(self):
+        for mode in visitor_map.MAP_MODES:
+            with self.subTest(mode=mode):
+                self.build(mode=mode)
+                html = self.read()
+                self.assertIsNone(self._cluster_name(html))
+                self.assertNotIn('markercluster', html)
+
+
+class LazyPopupsTest(VisitorMapTestCase):
+    """商品データがマップとは別のファイルに書き出されることを確認"""
+
+    def products(self):
+        with open(visitor_map.products_file_path(self.output), encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_products_are_written_to_sidecar(self):
+        self.build(mode="data", lazy_popups=True)
+        self.assertEqual(visitor_map.products_file_path(self.output), self.temp_path('map.products.json'))
+        self.assertEqual(self.products(), {'1': [["たこ焼き", 400], ["イカ焼き", 300]], '2': []})
+
+    def test_records_have_no_products(self):
+        self.build(mode="data", lazy_popups=True)
+        self.assertEqual([len(record) for record in self.records()], [5, 5])
+        self.assertIn('var productsUrl = "map.products.json";', self.read())
+
+    def test_sidecar_follows_changes(self):
+        self.build(mode="data", lazy_popups=True)
+        stores = sample_stores()
+        stores[1]['products'].append({'name': "チョコクレープ", 'price': 350})
+        self.build(stores, mode="data", lazy_popups=True)
+        self.assertEqual(self.products()['2'], [["チョコクレープ", 350]])
+
+    def test_without_lazy_popups_products_are_embedded(self):
+        self.build(mode="data")
+        self.assertIn('var productsUrl = null;', self.read())
+        self.assertFalse(os.path.exists(visitor_map.products_file_path(self.output)))
+
+
+class ChangeFeedMapTest(VisitorMapTestCase):
+    """変更フィードの URL と取得時点のリビジョンがマップに埋め込まれることを確認"""
+
+    def test_changes_url_and_revision(self):
+        self.build(mode="data", changes_url="changes", revision=42)
+        html = self.read()
+        self.assertIn('var changesUrl = "changes";', html)
+        self.assertIn('var revision = 42;', html)
+
+    def test_no_polling_without_changes_url(self):
+        self.build(mode="data")
+        self.assertIn('var changesUrl = null;', self.read())
+
+
+class MapVariantsTest(VisitorMapTestCase):
+    """複数のバリエーションのマップを、それぞれの絞り込み条件で生成することを確認"""
+
+    def _variants(self):
+        return [
+            {'output': self.temp_path('all.html'), 'mode': "data"},
+            {'output': self.temp_path('north.html'), 'mode': "data", 'bbox': (39.7033, 141.0, 39.8, 141.2)},
+            {'output': self.temp_path('squid.html'), 'keyword': "イカ", 'cluster': True},
+        ]
+
+    def _build_variants(self, **options):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return visitor_map.create_map_variants(self._variants(), stores=sample_stores(), **options)
+
+    def test_filter_stores(self):
+        stores = sample_stores()
+        self.assertEqual([store['id'] for store in visitor_map.filter_stores(stores, bbox=(39.7033, 141.0, 39.8, 141.2))], [1])
+        for keyword, expected in (("たこ", [1]), ("大阪", [1]), ("イカ焼き", [1]), ("クレープ", [2]), ("なし", [])):
+            with self.subTest(keyword=keyword):
+                self.assertEqual([store['id'] for store in visitor_map.filter_stores(stores, keyword=keyword)], expected)
+
+    def test_variants_in_one_process(self):
+        results = self._build_variants(max_workers=1)
+        self.assertEqual([(output, count) for output, count, _ in results], [
+            (self.temp_path('all.html'), 2), (self.temp_path('north.html'), 1), (self.temp_path('squid.html'), 1),
+        ])
+        self.output = self.temp_path('north.html')
+        self.assertEqual([record[0] for record in self.records()], [1])
+
+    def test_variants_in_process_pool(self):
+        results = self._build_variants(max_workers=2)
+        self.assertEqual([count for _, count, _ in results], [2, 1, 1])
+        for output, _, _ in results:
+            self.assertTrue(os.path.exists(output))
+
+    def test_invalid_variants(self):
+        for variant in ({'mode': "data"}, {'output': self.output, 'colour': "red"}):
+            with self.subTest(variant=variant):
+                with self.assertRaises(ValueError):
+                    visitor_map.create_map_variants([variant], stores=sample_stores())
+
+
+class StreamingTest(VisitorMapTestCase):
+    """データベースから1件ずつ書き出したマップが、まとめて生成したものと同じ内容になることを確認"""
+
+    def setUp(self):
+        super().setUp()
+        for store in sample_stores():
+            database.add_store_with_products(store['name'], store['latitude'], store['longitude'],
+                                             store['products'], store['description'])
+        self.original_chunk_size = visitor_map.STREAM_CHUNK_SIZE
+        # 店舗ごとに書き出して区切り位置を確認する
+        visitor_map.STREAM_CHUNK_SIZE = 1
+
+    def tearDown(self):
+        visitor_map.STREAM_CHUNK_SIZE = self.original_chunk_size
+        super().tearDown()
+
+    def build_from_database(self, **options):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            visitor_map.create_visitor_map(self.output, mode="data", **options)
+        return out.getvalue()
+
+    def test_stream_matches_regular_build(self):
+        self.build_from_database()
+        expected = self.records()
+        self.assertIn("店舗数: 2 店舗", self.build_from_database(stream=True))
+        self.assertEqual(self.records(), expected)
+
+    def test_stream_writes_products_sidecar(self):
+        products_file = visitor_map.products_file_path(self.output)
+        self.build_from_database(lazy_popups=True)
+        with open(products_file, encoding='utf-8') as f:
+            expected = json.load(f)
+        self.build_from_database(lazy_popups=True, stream=True)
+        with open(products_file, encoding='utf-8') as f:
+            self.assertEqual(json.load(f), expected)
+        self.assertEqual([len(record) for record in self.records()], [5, 5])
+
+    def test_empty_database(self):
+        for store in database.get_all_stores():
+            database.delete_store(store['id'])
+        self.build_from_database(stream=True)
+        self.assertEqual(self.records(), [])
+
+    def test_stream_drops_previous_fingerprint(self):
+        self.build_from_database()
+        self.build_from_database(stream=True)
+        # 次のまとめて生成する場合はスキップしない
+        self.assertNotIn("再生成をスキップしました", self.build_from_database())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,216 @@
+"""
+地図タイルのローカルキャッシュ
+
+会場周辺の OpenStreetMap タイルを事前にダウンロード（または MBTiles ファイルから取り込み）して
+tiles/{z}/{x}/{y}.png に保存し、生成するマップがそこからタイルを読み込めるようにします。
+来場者が一斉にマップを開いても外部のタイルサーバーへのアクセスが発生しません。
+
+タイルのダウンロードは OpenStreetMap のタイル利用規約に従い、必要な範囲だけを1枚ずつ間隔を空けて取得し、
+サーバーから制限された場合（HTTP 429）は Retry-After の時間だけ待ってから再開します。
+"""
+
+import os
+import math
+import time
+import sqlite3
+from pathlib import Path
+from locations import DEFAULT_CENTER
+
+DEFAULT_TILE_DIR = "tiles"
+OSM_TILE_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+OSM_ATTRIBUTION = '&copy; <a href="https://www.openstreetmap.org/copyright">OpenStreetMap</a> contributors'
+USER_AGENT = "school-festival-map tile seeder"
+
+# 会場周辺（中心から約300m四方）と事前に保存するズームレベル
+VENUE_MARGIN = 0.003
+VENUE_BBOX = (
+    DEFAULT_CENTER[0] - VENUE_MARGIN, DEFAULT_CENTER[1] - VENUE_MARGIN,
+    DEFAULT_CENTER[0] + VENUE_MARGIN, DEFAULT_CENTER[1] + VENUE_MARGIN
+)
+SEED_ZOOMS = range(15, 20)
+
+# ダウンロードの間隔（秒）と、制限された場合に同じタイルを再試行する回数
+REQUEST_INTERVAL = 1.0
+RATE_LIMIT_RETRIES = 3
+# Retry-After がない場合に待つ時間と、待つ時間の上限（秒）
+DEFAULT_RETRY_AFTER = 60
+MAX_RETRY_AFTER = 600
+
+
+class RateLimited(OSError):
+    """タイルサーバーからダウンロードを制限された（HTTP 429）"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"rate limited by tile server (retry after {retry_after}s)")
+        self.retry_after = retry_after
+
+
+def tile_xy(lat, lng, zoom):
+    """緯度・経度を含むタイルの番号 (x, y) を計算（Web メルカトル図法）"""
+    n = 2 ** zoom
+    x = int((lng + 180) / 360 * n)
+    lat_rad = math.radians(lat)
+    y = int((1 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_in_bbox(south, west, north, east, zooms=SEED_ZOOMS):
+    """範囲に含まれるタイル (z, x, y) を順に返す"""
+    for zoom in zooms:
+        min_x, min_y = tile_xy(north, west, zoom)
+        max_x, max_y = tile_xy(south, east, zoom)
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                yield zoom, x, y
+
+
+def tile_path(tile_dir, zoom, x, y):
+    """タイルの保存先パス"""
+    return os.path.join(tile_dir, str(zoom), str(x), f"{y}.png")
+
+
+def _save_tile(tile_dir, zoom, x, y, data):
+    path = tile_path(tile_dir, zoom, x, y)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _retry_after_seconds(value):
+    """Retry-After ヘッダー（秒数 または HTTP の日時）を待つ秒数に変換"""
+    from email.utils import parsedate_to_datetime
+    if value:
+        try:
+            return min(max(float(value), 0), MAX_RETRY_AFTER)
+        except ValueError:
+            pass
+        try:
+            return min(max(parsedate_to_datetime(value).timestamp() - time.time(), 0), MAX_RETRY_AFTER)
+        except (TypeError, ValueError):
+            pass
+    return DEFAULT_RETRY_AFTER
+
+
+def _fetch_tile(url):
+    """タイルをダウンロード（タイルサーバーの規約により User-Agent を付ける）"""
+    from urllib.error import HTTPError
+    from urllib.request import Request, urlopen
+    try:
+        with urlopen(Request(url, headers={'User-Agent': USER_AGENT}), timeout=30) as response:
+            return response.read()
+    except HTTPError as e:
+        if e.code == 429:
+            raise RateLimited(_retry_after_seconds(e.headers.get('Retry-After')))
+        raise
+
+
+def seed_tiles(bbox=VENUE_BBOX, zooms=SEED_ZOOMS, tile_dir=DEFAULT_TILE_DIR, url_template=OSM_TILE_URL,
+               fetch=None, progress=None, delay=REQUEST_INTERVAL):
+    """
+    範囲内のタイルをダウンロードしてキャッシュに保存（保存済みのタイルはダウンロードしない）
+    サーバーから制限された場合は Retry-After の時間だけ待って再試行し、
+    RATE_LIMIT_RETRIES 回続けて制限された場合は残りのダウンロードを中止する
+
+    Args:
+        bbox: (south, west, north, east)
+        url_template: タイルサーバーのURL（{z} {x} {y} を含む）
+        fetch: URL の内容を返す関数（省略時は urllib でダウンロード、制限された場合は RateLimited を送出）
+        progress: タイルごとに呼ばれる関数 progress(done, total)
+        delay: ダウンロードの間隔（秒）
+
+    Returns:
+        dict: {'downloaded': 件数, 'skipped': 件数, 'errors': [(z, x, y, メッセージ), ...]}
+    """
+    fetch = fetch or _fetch_tile
+    tiles = list(tiles_in_bbox(*bbox, zooms=zooms))
+    result = {'downloaded': 0, 'skipped': 0, 'errors': []}
+    requested = False
+
+    for done, (zoom, x, y) in enumerate(tiles, start=1):
+        if os.path.exists(tile_path(tile_dir, zoom, x, y)):
+            result['skipped'] += 1
+        else:
+            for attempt in range(RATE_LIMIT_RETRIES + 1):
+                if requested:
+                    time.sleep(delay)
+                requested = True
+                try:
+                    _save_tile(tile_dir, zoom, x, y, fetch(url_template.format(z=zoom, x=x, y=y)))
+                    result['downloaded'] += 1
+                    break
+                except RateLimited as e:
+                    if attempt == RATE_LIMIT_RETRIES:
+                        result['errors'].append((zoom, x, y, str(e)))
+                        return result
+                    time.sleep(e.retry_after)
+                except OSError as e:
+                    result['errors'].append((zoom, x, y, str(e)))
+                    break
+        if progress:
+            progress(done, len(tiles))
+
+    return result
+
+
+def import_mbtiles(mbtiles_file, tile_dir=DEFAULT_TILE_DIR, bbox=None, zooms=None):
+    """
+    MBTiles ファイルからタイルを取り込む
+
+    Args:
+        bbox: 指定した場合は範囲内のタイルのみ取り込む
+        zooms: 指定した場合はそのズームレベルのみ取り込む
+
+    Returns:
+        int: 取り込んだタイル数
+    """
+    wanted = set(tiles_in_bbox(*bbox, zooms=zooms or range(0, 23))) if bbox else None
+
+    conn = sqlite3.connect(f"file:{mbtiles_file}?mode=ro", uri=True)
+    try:
+        count = 0
+        for zoom, column, row, data in conn.execute(
+            "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles"
+        ):
+            # MBTiles は TMS 方式（y 軸が南から北）で保存されている
+            y = 2 ** zoom - 1 - row
+            if zooms is not None and zoom not in zooms:
+                continue
+            if wanted is not None and (zoom, column, y) not in wanted:
+                continue
+            _save_tile(tile_dir, zoom, column, y, data)
+            count += 1
+        return count
+    finally:
+        conn.close()
+
+
+def has_tiles(tile_dir=DEFAULT_TILE_DIR):
+    """キャッシュにタイルが保存されているか"""
+    return os.path.isdir(tile_dir) and any(name.isdigit() for name in os.listdir(tile_dir))
+
+
+def local_tile_url(tile_dir=DEFAULT_TILE_DIR, relative_to=None):
+    """
+    キャッシュのタイルを読み込むURL（{z} {x} {y} を含む）
+
+    Args:
+        relative_to: HTML を保存するフォルダ（指定した場合は相対パス、省略時は file:// のURL）
+    """
+    if relative_to is not None:
+        base = os.path.relpath(os.path.abspath(tile_dir), os.path.abspath(relative_to)).replace(os.sep, '/')
+    else:
+        base = Path(os.path.abspath(tile_dir)).as_uri()
+    return base + "/{z}/{x}/{y}.png"
+
+
+def tile_layer_url(tile_dir=DEFAULT_TILE_DIR):
+    """キャッシュがあればキャッシュの、なければ OpenStreetMap のタイルURL（ローカルで開く画面用）"""
+    if has_tiles(tile_dir):
+        return local_tile_url(tile_dir)
+    return OSM_TILE_URL
+
+
+if __name__ == "__main__":
+    result = seed_tiles(progress=lambda done, total: print(f"\r{done}/{total} tiles", end=""))
+    print()
+    print(f"{result['downloaded']} downloaded, {result['skipped']} already cached, {len(result['errors'])} errors")
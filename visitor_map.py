@@ -1,25 +1,258 @@
-import folium
 from store_manager import StoreManager
 import os
+import json
+import hashlib
+import contextlib
+from locations import DEFAULT_CENTER, DEFAULT_ZOOM
 
-def create_visitor_map(output_file="festival_visitor_map.html"):
-    """来場者向けの学園祭マップを作成"""
-    
-    # 盛岡市大通を中心に設定
-    center_lat, center_lng = 39.703483, 141.144167
-    
-    # 地図を作成
-    m = folium.Map(
-        location=[center_lat, center_lng],
-        zoom_start=19,
-        tiles='OpenStreetMap'
+# マップの生成内容（HTMLやマーカーの作り方）を変えたら更新する
+# （STORE_DATA_LAYER_TEMPLATE はハッシュ値に含めるので、テンプレートだけの変更では不要）
+MAP_GENERATOR_VERSION = 2
+
+# 店舗マーカーの出力方式
+MAP_MODES = ("markers", "data")
+
+# 変更フィードを確認する間隔（ミリ秒）
+CHANGE_POLL_INTERVAL_MS = 5000
+
+# ストリーミング出力: 店舗データを差し込む位置の目印と、まとめて書き出す件数
+STREAM_PLACEHOLDER = "__STORE_RECORDS__"
+STREAM_CHUNK_SIZE = 1000
+
+def map_fingerprint(stores, **settings):
+    """店舗データと生成設定から、マップの内容を表すハッシュ値を計算"""
+    payload = json.dumps(
+        {'version': MAP_GENERATOR_VERSION, 'template': STORE_DATA_LAYER_TEMPLATE, 'settings': settings, 'stores': stores},
+        ensure_ascii=False, sort_keys=True, default=str
     )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def visitor_map_fingerprint(stores, center=DEFAULT_CENTER, zoom_start=DEFAULT_ZOOM, mode="markers", cluster=False, lazy_popups=False, asset_dir=None, tile_dir=None, changes_url=None):
+    """create_visitor_map に同じ引数を渡したときに生成されるマップのハッシュ値"""
+    return map_fingerprint(stores, center=list(center), zoom_start=zoom_start, mode=mode, cluster=cluster, lazy_popups=lazy_popups, asset_dir=asset_dir, tile_dir=tile_dir, changes_url=changes_url)
+
+def _fingerprint_path(output_file):
+    """出力ファイルと並べて保存するハッシュ値ファイルのパス"""
+    return output_file + '.fingerprint'
+
+def is_map_up_to_date(output_file, fingerprint):
+    """出力ファイルが存在し、前回生成時のハッシュ値と一致するか"""
+    try:
+        with open(_fingerprint_path(output_file), encoding='utf-8') as f:
+            return f.read().strip() == fingerprint and os.path.exists(output_file)
+    except OSError:
+        return False
+
+# データ駆動モードで店舗データからマーカーとポップアップをブラウザ側で作成するスクリプト
+# 店舗レコード: [id, 店舗名, 緯度, 経度, 説明, [[商品名, 価格], ...]]
+# 商品を別ファイルにする場合、レコードに商品は含めず products_url から
+# {店舗ID: [[商品名, 価格], ...]} を最初にポップアップを開いたときに読み込む
+# 変更フィード（changes_url）は {revision, stores: [商品を含むレコード], deleted: [店舗ID]} を返す
+STORE_DATA_LAYER_TEMPLATE = """
+{% macro script(this, kwargs) %}
+    (function() {
+        // 追加先（地図 またはクラスタレイヤー）
+        var target = {{ this.target_name }};
+        var stores = {{ this.records_json }};
+        var productsUrl = {{ this.products_url_json }};
+        var productsRequest = null;
+
+        function loadProducts() {
+            if (!productsRequest) {
+                productsRequest = fetch(productsUrl).then(function(response) {
+                    if (!response.ok) {
+                        throw new Error(response.status);
+                    }
+                    return response.json();
+                });
+                // 失敗した場合は次にポップアップを開いたときに再取得
+                productsRequest.catch(function() { productsRequest = null; });
+            }
+            return productsRequest;
+        }
+
+        function escapeHtml(text) {
+            return String(text).replace(/[&<>"']/g, function(c) {
+                return {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c];
+            });
+        }
+
+        // products: 商品リスト / null: 読み込み中 / false: 読み込み失敗
+        function popupHtml(store, products) {
+            var html = '<div style="width: 250px; font-family: Arial, sans-serif;">'
+                + '<h3 style="color: #2E8B57; margin-bottom: 10px;">' + escapeHtml(store[1]) + '</h3>';
+            if (store[4]) {
+                html += '<p style="color: #666; margin-bottom: 8px;"><em>' + escapeHtml(store[4]) + '</em></p>';
+            }
+            html += '<div style="background-color: #f8f9fa; padding: 8px; border-radius: 5px;">'
+                + '<h4 style="color: #495057; margin-top: 0; margin-bottom: 8px;">商品・価格</h4>';
+            if (products === null) {
+                html += '<div style="color: #999;">読み込み中...</div>';
+            } else if (products === false) {
+                html += '<div style="color: #999;">商品情報を読み込めませんでした</div>';
+            } else if (products.length) {
+                products.forEach(function(product) {
+                    html += '<div style="margin-bottom: 3px;">• ' + escapeHtml(product[0])
+                        + ': <span style="font-weight: bold; color: #dc3545;">' + product[1] + '円</span></div>';
+                });
+            } else {
+                html += '<div style="color: #999;">商品情報なし</div>';
+            }
+            return html + '</div></div>';
+        }
+
+        var icon = L.AwesomeMarkers.icon({
+            icon: 'cutlery', prefix: 'fa', markerColor: 'green', iconColor: 'white', extraClasses: 'fa-rotate-0'
+        });
+
+        // 店舗IDごとのマーカー（変更の反映に使用）
+        var markersById = {};
+
+        function createMarker(store) {
+            var marker = L.marker([store[2], store[3]], {icon: icon})
+                .bindTooltip(escapeHtml(store[1]), {sticky: true});
+            // marker.store は常に最新の店舗データ（変更の反映で置き換える）
+            marker.store = store;
+
+            // ポップアップのHTMLは開いたときに作成
+            // 商品を含まないレコード（別ファイルから読み込む場合）は読み込み中として表示
+            marker.bindPopup(function() {
+                return popupHtml(marker.store, marker.store.length > 5 ? marker.store[5] : null);
+            }, {maxWidth: 280});
+
+            if (productsUrl) {
+                // 商品は開いたときに別ファイルから読み込む
+                marker.on('popupopen', function(e) {
+                    var store = marker.store;
+                    if (store.length > 5) {
+                        return;
+                    }
+                    loadProducts().then(function(products) {
+                        e.popup.setContent(popupHtml(store, products[store[0]] || []));
+                    }, function() {
+                        e.popup.setContent(popupHtml(store, false));
+                    });
+                });
+            }
+
+            markersById[store[0]] = marker;
+            return marker;
+        }
+
+        function updateMarker(marker, store) {
+            var moved = marker.store[2] !== store[2] || marker.store[3] !== store[3];
+            marker.store = store;
+            marker.setTooltipContent(escapeHtml(store[1]));
+            if (moved) {
+                // クラスタレイヤーでは位置を変えるときに追加し直す
+                target.removeLayer(marker);
+                marker.setLatLng([store[2], store[3]]);
+                target.addLayer(marker);
+            } else if (marker.isPopupOpen()) {
+                marker.getPopup().setContent(popupHtml(store, store[5]));
+            }
+        }
+
+        var markers = stores.map(createMarker);
+
+        if (target.addLayers) {
+            // クラスタレイヤーにはまとめて追加
+            target.addLayers(markers);
+        } else {
+            markers.forEach(function(marker) { marker.addTo(target); });
+        }
+
+        // 変更フィード: 追加・変更・削除された店舗だけを定期的に取得してマーカーに反映
+        var changesUrl = {{ this.changes_url_json }};
+        var revision = {{ this.revision }};
+
+        function applyChanges(changes) {
+            changes.stores.forEach(function(store) {
+                var marker = markersById[store[0]];
+                if (marker) {
+                    updateMarker(marker, store);
+                } else {
+                    target.addLayer(createMarker(store));
+                }
+            });
+            changes.deleted.forEach(function(storeId) {
+                var marker = markersById[storeId];
+                if (marker) {
+                    target.removeLayer(marker);
+                    delete markersById[storeId];
+                }
+            });
+            revision = changes.revision;
+        }
+
+        function pollChanges() {
+            fetch(changesUrl + '?since=' + revision, {cache: 'no-store'})
+                .then(function(response) {
+                    if (!response.ok) {
+                        throw new Error(response.status);
+                    }
+                    return response.json();
+                })
+                .then(applyChanges)
+                // 取得に失敗した場合は次回に再取得
+                .catch(function() {})
+                .then(function() { setTimeout(pollChanges, {{ this.poll_interval }}); });
+        }
+
+        if (changesUrl) {
+            setTimeout(pollChanges, {{ this.poll_interval }});
+        }
+    })();
+{% endmacro %}
+"""
+
+def store_records(stores, include_products=True):
+    """店舗データをデータ駆動モード用のコンパクトなレコードに変換"""
+    records = []
+    for store in stores:
+        record = [
+            store['id'],
+            store['name'],
+            round(store['latitude'], 7),
+            round(store['longitude'], 7),
+            store['description'] or ""
+        ]
+        if include_products:
+            record.append(_product_records(store))
+        records.append(record)
+    return records
+
+def _product_records(store):
+    """店舗の商品リストを [[商品名, 価格], ...] に変換"""
+    return [[product['name'], product['price']] for product in store['products']]
+
+def products_file_path(output_file):
+    """ポップアップ用の商品データを書き出すファイルのパス（マップと同じフォルダ）"""
+    return os.path.splitext(output_file)[0] + '.products.json'
+
+def _write_products_file(path, stores):
+    """店舗IDごとの商品リストを JSON ファイルに書き出す"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {store['id']: _product_records(store) for store in stores},
+            f, ensure_ascii=False, separators=(',', ':')
+        )
+    os.replace(temp_path, path)
+
+def _to_script_json(data):
+    """<script> 内に埋め込んでも安全な JSON 文字列に変換"""
+    return (
+        json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        .replace('<', '\\u003c')
+        .replace('>', '\\u003e')
+        .replace('&', '\\u0026')
+    )
+
+def _add_store_markers(target, stores):
+    """店舗ごとに folium のマーカーとポップアップを追加（従来方式）"""
+    import folium
     
-    # 店舗管理クラスから店舗データを取得
-    store_manager = StoreManager()
-    stores = store_manager.get_stores_for_display()
-    
-    # 各店舗をマーカーで表示
     for store in stores:
         # ポップアップ用のHTML作成
         popup_html = f"""
@@ -52,7 +285,107 @@ def create_visitor_map(output_file="festival_visitor_map.html"):
                 icon='cutlery',
                 prefix='fa'
             )
-        ).add_to(m)
+        ).add_to(target)
+
+def create_marker_cluster():
+    """店舗マーカーをズームに応じてまとめるクラスタレイヤーを作成"""
+    from folium.plugins import MarkerCluster
+    
+    # chunkedLoading: 大量のマーカーを分割して追加し、読み込み中も操作できるようにする
+    return MarkerCluster(name="店舗", chunked_loading=True)
+
+def create_visitor_map(output_file="festival_visitor_map.html", center=DEFAULT_CENTER, zoom_start=DEFAULT_ZOOM, stores=None, force=False, mode="markers", cluster=False, lazy_popups=False, asset_dir=None, tile_dir=None, changes_url=None, revision=0, stream=False):
+    """
+    来場者向けの学園祭マップを作成
+    店舗データと設定が前回の生成時から変わっていなければ再生成しない
+    
+    Args:
+        center: 地図の中心 (緯度, 経度)
+        zoom_start: 初期ズームレベル
+        stores: 表示する店舗データ（省略時はデータベースから取得）
+        force: True の場合は変更がなくても再生成する
+        mode: "markers" は店舗ごとにマーカーのスクリプトを出力（従来方式）
+              "data" は店舗データを1つの配列で出力し、ブラウザ側でマーカーを作成
+        cluster: True の場合は近くの店舗マーカーをズームに応じてまとめて表示
+        lazy_popups: True の場合は商品データを別ファイル（products_file_path）に書き出し、
+                     ポップアップを開いたときに読み込む（"data" モードのみ、HTTP経由での表示が必要）
+        asset_dir: 指定した場合は CDN の JS/CSS をこのフォルダに保存して読み込む（map_assets を参照）
+        tile_dir: 指定した場合は地図タイルをこのフォルダのキャッシュから読み込む（tile_cache を参照）
+        changes_url: 指定した場合はこのURLの変更フィードを定期的に取得してマーカーを更新する（"data" モードのみ）
+        revision: stores を取得した時点のリビジョン（database.get_current_revision()）
+        stream: True の場合は店舗データをデータベースから1件ずつ読み込んでファイルに書き出し、
+                店舗数によらずメモリ使用量を一定に保つ（"data" モードのみ、変更の有無にかかわらず毎回生成）
+    """
+    if mode not in MAP_MODES:
+        raise ValueError(f"Unknown map mode: {mode}")
+    if lazy_popups and mode != "data":
+        raise ValueError("lazy_popups requires mode='data'")
+    if changes_url and mode != "data":
+        raise ValueError("changes_url requires mode='data'")
+    if stream and mode != "data":
+        raise ValueError("stream requires mode='data'")
+    
+    # 店舗管理クラスから店舗データを取得
+    if stores is None:
+        store_manager = StoreManager()
+        stores = store_manager.iter_stores_for_display() if stream else store_manager.get_stores_for_display()
+    
+    fingerprint = None
+    if not stream:
+        fingerprint = visitor_map_fingerprint(stores, center, zoom_start, mode, cluster, lazy_popups, asset_dir, tile_dir, changes_url)
+        if not force and is_map_up_to_date(output_file, fingerprint):
+            print(f"来場者用マップ '{output_file}' は最新です（再生成をスキップしました）")
+            return output_file
+    
+    import folium  # 地図を作成しないコマンドの起動を速くするため必要時に読み込む
+    from folium.template import Template
+    
+    center_lat, center_lng = center
+    output_dir = os.path.dirname(os.path.abspath(output_file))
+    
+    # 地図タイル（キャッシュを使う場合は HTML からの相対パスで読み込む）
+    tiles, attr = 'OpenStreetMap', None
+    if tile_dir:
+        from tile_cache import local_tile_url, OSM_ATTRIBUTION
+        tiles, attr = local_tile_url(tile_dir, relative_to=output_dir), OSM_ATTRIBUTION
+    
+    # 地図を作成
+    m = folium.Map(
+        location=[center_lat, center_lng],
+        zoom_start=zoom_start,
+        tiles=tiles,
+        attr=attr
+    )
+    
+    # 各店舗をマーカーで表示（クラスタ表示の場合はクラスタレイヤーに追加）
+    target = m
+    if cluster:
+        target = create_marker_cluster().add_to(m)
+    
+    if mode == "data":
+        # 店舗データを1つの配列として埋め込み、マーカーはブラウザ側で作成
+        # （AwesomeMarkers のスクリプトは folium.Map が読み込む）
+        layer = folium.MacroElement()
+        layer._template = Template(STORE_DATA_LAYER_TEMPLATE)
+        if stream:
+            # 店舗データは保存時に差し込む
+            layer.records_json = STREAM_PLACEHOLDER
+        else:
+            layer.records_json = _to_script_json(store_records(stores, include_products=not lazy_popups))
+        layer.products_url_json = "null"
+        if lazy_popups:
+            products_file = products_file_path(output_file)
+            if not stream:
+                _write_products_file(products_file, stores)
+            # マップと同じフォルダに置くため、ファイル名だけを相対URLとして渡す
+            layer.products_url_json = _to_script_json(os.path.basename(products_file))
+        layer.target_name = target.get_name()
+        layer.changes_url_json = _to_script_json(changes_url)
+        layer.revision = int(revision)
+        layer.poll_interval = CHANGE_POLL_INTERVAL_MS
+        layer.add_to(m)
+    else:
+        _add_store_markers(target, stores)
     
     # 中心地にタイトル用のマーカーを追加
     folium.Marker(
@@ -69,18 +402,152 @@ def create_visitor_map(output_file="festival_visitor_map.html"):
         )
     ).add_to(m)
     
-    # HTMLファイルに保存
-    m.save(output_file)
+    if asset_dir:
+        # CDN の代わりにローカルに保存した JS/CSS を読み込む
+        from map_assets import bundle_map_assets
+        asset_url = os.path.relpath(os.path.abspath(asset_dir), output_dir).replace(os.sep, '/')
+        bundle_map_assets(m, asset_dir, asset_url)
+    
+    # HTMLファイルに保存（配信中のファイルが書きかけの状態で読まれないよう、一時ファイルから置き換える）
+    temp_file = output_file + '.tmp'
+    if stream:
+        store_count = _save_streaming(m, temp_file, stores, products_file_path(output_file) if lazy_popups else None)
+    else:
+        m.save(temp_file)
+        store_count = len(stores)
+    os.replace(temp_file, output_file)
+    
+    if fingerprint:
+        with open(_fingerprint_path(output_file), 'w', encoding='utf-8') as f:
+            f.write(fingerprint)
+    elif os.path.exists(_fingerprint_path(output_file)):
+        # 前回のハッシュ値は今回の内容と対応しないため削除
+        os.remove(_fingerprint_path(output_file))
     
     print(f"来場者用マップが '{output_file}' として保存されました")
-    print(f"店舗数: {len(stores)} 店舗")
+    print(f"店舗数: {store_count} 店舗")
     
     return output_file
 
+def _save_streaming(m, path, stores, products_path=None, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    地図のHTMLを店舗データの前後で分けて書き出し、間に店舗レコードを chunk_size 件ずつ書き出す
+    products_path を指定した場合は商品データを同時にそのファイルへ書き出す
+    
+    Returns:
+        int: 書き出した店舗数
+    """
+    header, footer = m.get_root().render().split(STREAM_PLACEHOLDER)
+    
+    count = 0
+    products_temp = products_path + '.tmp' if products_path else None
+    with open(path, 'w', encoding='utf-8') as f, \
+            (open(products_temp, 'w', encoding='utf-8') if products_temp else contextlib.nullcontext()) as products_f:
+        f.write(header + '[')
+        if products_f:
+            products_f.write('{')
+        
+        records, products = [], []
+        for store in stores:
+            separator = ',' if count else ''
+            count += 1
+            records.append(separator + _to_script_json(store_records([store], include_products=not products_f)[0]))
+            if products_f:
+                products.append(f'{separator}"{store["id"]}":'
+                                + json.dumps(_product_records(store), ensure_ascii=False, separators=(',', ':')))
+            if len(records) >= chunk_size:
+                f.write(''.join(records))
+                if products_f:
+                    products_f.write(''.join(products))
+                records, products = [], []
+        
+        f.write(''.join(records) + ']' + footer)
+        if products_f:
+            products_f.write(''.join(products) + '}')
+    
+    if products_temp:
+        os.replace(products_temp, products_path)
+    return count
+
+# バリエーション指定で使えるキー（create_visitor_map の設定と店舗の絞り込み条件）
+VARIANT_OPTIONS = ('center', 'zoom_start', 'mode', 'cluster', 'lazy_popups', 'asset_dir', 'tile_dir', 'force')
+VARIANT_FILTERS = ('bbox', 'keyword')
+
+def filter_stores(stores, bbox=None, keyword=None):
+    """
+    店舗データを絞り込む
+    
+    Args:
+        bbox: (south, west, north, east) の範囲内の店舗
+        keyword: 店舗名・説明・商品名のいずれかに含む店舗
+    """
+    if bbox:
+        south, west, north, east = bbox
+        stores = [store for store in stores
+                  if south <= store['latitude'] <= north and west <= store['longitude'] <= east]
+    if keyword:
+        stores = [store for store in stores
+                  if keyword in store['name'] or keyword in (store['description'] or "")
+                  or any(keyword in product['name'] for product in store['products'])]
+    return stores
+
+# ワーカープロセスごとに1回だけ受け取る店舗データ
+_variant_stores = None
+
+def _init_variant_worker(stores):
+    global _variant_stores
+    _variant_stores = stores
+
+def _build_variant(variant):
+    """1つのバリエーションを生成し (出力ファイル, 店舗数, 生成時間[秒]) を返す"""
+    import time
+    
+    options = dict(variant)
+    output_file = options.pop('output')
+    stores = filter_stores(_variant_stores, options.pop('bbox', None), options.pop('keyword', None))
+    start = time.perf_counter()
+    create_visitor_map(output_file, stores=stores, **options)
+    return output_file, len(stores), time.perf_counter() - start
+
+def create_map_variants(variants, stores=None, max_workers=None):
+    """
+    複数のバリエーション（エリア別・キーワード別・表示設定別など）のマップをプロセスプールで並列に生成
+    店舗データは1回だけ読み込み、各ワーカープロセスには起動時に1回だけ渡す
+    
+    Args:
+        variants: [{'output': 出力ファイル, 'bbox': ..., 'keyword': ..., 'mode': ..., ...}, ...]
+                  output 以外は VARIANT_OPTIONS と VARIANT_FILTERS のキーを指定できる
+        stores: 店舗データ（省略時はデータベースから取得）
+        max_workers: ワーカープロセス数（省略時は CPU コア数）
+    
+    Returns:
+        list: バリエーションごとの (出力ファイル, 店舗数, 生成時間[秒])
+    """
+    for variant in variants:
+        if 'output' not in variant:
+            raise ValueError(f"Variant has no output file: {variant}")
+        unknown = set(variant) - {'output'} - set(VARIANT_OPTIONS) - set(VARIANT_FILTERS)
+        if unknown:
+            raise ValueError(f"Unknown variant options: {', '.join(sorted(unknown))}")
+    
+    if stores is None:
+        stores = StoreManager().get_stores_for_display()
+    
+    max_workers = min(max_workers or os.cpu_count() or 1, len(variants))
+    if max_workers <= 1:
+        _init_variant_worker(stores)
+        return [_build_variant(variant) for variant in variants]
+    
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers, initializer=_init_variant_worker, initargs=(stores,)) as executor:
+        return list(executor.map(_build_variant, variants))
+
 def open_visitor_map():
     """来場者用マップを作成してブラウザで開く"""
     import webbrowser
-    map_file = create_visitor_map()
+    from tile_cache import has_tiles, DEFAULT_TILE_DIR
+    # 地図タイルのキャッシュがあれば使う
+    map_file = create_visitor_map(tile_dir=DEFAULT_TILE_DIR if has_tiles() else None)
     webbrowser.open(f'file:///{os.path.abspath(map_file)}')
 
 if __name__ == "__main__":